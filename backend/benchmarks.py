@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the course recommender backend.
+Runs each benchmark on synthetic data and prints throughput figures.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# Make the backend package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import ibm_course_recommender as recommender
+
+
+def benchmark_xp_ledger_replay(num_users=1000, events_per_user=500):
+    """Compare rebuilding XP by replaying the whole ledger file vs. the tail after the latest snapshot"""
+    import tempfile
+
+    # Work on an empty ledger so earlier events don't skew the numbers
+    recommender.xp_ledger.clear()
+    recommender.xp_snapshots.clear()
+
+    user_ids = [f"bench_user_{i}" for i in range(num_users)]
+    event_types = list(recommender.XP_EVENT_NAMES.keys())
+
+    with tempfile.TemporaryDirectory() as ledger_dir:
+        ledger_path = os.path.join(ledger_dir, "xp_ledger.csv")
+        original_ledger_file = recommender.XP_LEDGER_FILE
+        recommender.XP_LEDGER_FILE = ledger_path
+        try:
+            start = time.perf_counter()
+            for _ in range(events_per_user):
+                for user_id in user_ids:
+                    recommender.record_xp_event(user_id, random.choice(event_types), random.randint(5, 150))
+            record_time = time.perf_counter() - start
+        finally:
+            recommender.XP_LEDGER_FILE = original_ledger_file
+            recommender.xp_ledger_file.close()
+            recommender.xp_ledger_file = None
+        total_events = num_users * events_per_user
+
+        start = time.perf_counter()
+        full_totals = dict.fromkeys(user_ids, 0)
+        with open(ledger_path, encoding="utf-8") as ledger_file:
+            for line in ledger_file:
+                user_id, _, amount, _ = line.rsplit(",", 3)
+                full_totals[user_id] += int(amount)
+        full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tail_totals = [recommender.rebuild_xp_from_ledger(user_id) for user_id in user_ids]
+    tail_time = time.perf_counter() - start
+
+    assert list(full_totals.values()) == tail_totals, "Snapshot rebuild disagrees with full replay"
+    events_in_memory = sum(len(events) for events in recommender.xp_ledger.values())
+
+    print(f"XP ledger: {num_users} users x {events_per_user} events ({total_events} events)")
+    print(f"  Append:       {total_events / record_time:,.0f} events/s (written and flushed to the ledger file)")
+    print(f"  Full replay:  {total_events / full_time:,.0f} events/s ({full_time * 1000:.1f} ms, from the file)")
+    print(f"  Tail replay:  {num_users / tail_time:,.0f} users/s ({tail_time * 1000:.1f} ms, "
+          f"snapshot every {recommender.XP_SNAPSHOT_INTERVAL} events)")
+    print(f"  In memory:    {events_in_memory:,} events not yet covered by a snapshot")
+
+
+def benchmark_prerequisite_plan(num_courses=5000, max_prerequisites=4, num_plans=200):
+    """Time compiling a large synthetic prerequisite DAG and planning paths through it"""
+    original_prerequisites = dict(recommender.COURSE_PREREQUISITES)
+    courses = [f"Bench Course {i}" for i in range(num_courses)]
+    synthetic = {
+        course: random.sample(courses[max(0, i - 200):i], min(i, random.randint(0, max_prerequisites)))
+        for i, course in enumerate(courses)
+    }
+
+    try:
+        recommender.COURSE_PREREQUISITES.clear()
+        recommender.COURSE_PREREQUISITES.update(synthetic)
+
+        start = time.perf_counter()
+        recommender.compile_prerequisite_graph()
+        compile_time = time.perf_counter() - start
+
+        user_state = {"completed_courses": random.sample(courses, num_courses // 4)}
+        targets = [random.sample(courses[num_courses // 2:], 10) for _ in range(num_plans)]
+        start = time.perf_counter()
+        plan_lengths = [len(recommender.plan_remaining_courses(user_state, target)) for target in targets]
+        plan_time = time.perf_counter() - start
+    finally:
+        recommender.COURSE_PREREQUISITES.clear()
+        recommender.COURSE_PREREQUISITES.update(original_prerequisites)
+        recommender.compile_prerequisite_graph()
+
+    edges = sum(len(prerequisites) for prerequisites in synthetic.values())
+    print(f"Prerequisite DAG: {num_courses} courses, {edges} edges")
+    print(f"  Compile:  {compile_time * 1000:.1f} ms")
+    print(f"  Plan:     {num_plans / plan_time:,.0f} plans/s "
+          f"(avg {sum(plan_lengths) / num_plans:.0f} courses per plan)")
+
+
+def benchmark_keyword_matching(num_messages=2000, words_per_message=300):
+    """Compare one automaton pass per message vs. a substring check per synonym list"""
+    keyword_lists = recommender.COMMAND_KEYWORD_LISTS
+    keywords = [keyword for keywords in keyword_lists for keyword in keywords]
+    # Long free-text messages: mostly filler with the odd command keyword, so the chain
+    # can rarely stop early on a hit
+    filler = ["please", "could", "you", "the", "about", "learning", "something", "today", "for", "we", "need"]
+    messages = [
+        " ".join(random.choice(keywords) if random.random() < 0.02 else random.choice(filler)
+                 for _ in range(words_per_message))
+        for _ in range(num_messages)
+    ]
+
+    start = time.perf_counter()
+    chain_results = [
+        [any(keyword in message for keyword in keywords) for keywords in keyword_lists]
+        for message in messages
+    ]
+    chain_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    automaton_results = []
+    for message in messages:
+        hits = recommender.find_command_keywords(message)
+        automaton_results.append([recommender.hits_any(hits, keywords) for keywords in keyword_lists])
+    automaton_time = time.perf_counter() - start
+
+    assert chain_results == automaton_results, "Automaton disagrees with the keyword chain"
+
+    average_length = sum(len(message) for message in messages) / num_messages
+    print(f"Command keywords: {num_messages} messages, avg {average_length:,.0f} chars, {len(keyword_lists)} synonym lists")
+    print(f"  Keyword chain:  {num_messages / chain_time:,.0f} messages/s")
+    print(f"  Automaton:      {num_messages / automaton_time:,.0f} messages/s ({chain_time / automaton_time:.1f}x)")
+
+
+BENCHMARKS = {
+    "xp_ledger": benchmark_xp_ledger_replay,
+    "prerequisite_plan": benchmark_prerequisite_plan,
+    "keyword_matching": benchmark_keyword_matching,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run backend micro-benchmarks")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run (default: all). Choices: {', '.join(BENCHMARKS)}")
+    args = parser.parse_args()
+
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name]()
+        print()
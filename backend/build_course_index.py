@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Offline build of the random-projection LSH index used for approximate
+similar-course lookups. Indexes the course content vectors (or a synthetic
+catalog for scale tests), saves it for memory-mapped loading, and reports
+recall and latency against exact search and the cost of incremental adds
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Make the backend package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.ibm_course_recommender import (
+    COURSE_LSH_INDEX_DIR, LSH_TABLES, LSH_BITS, LSH_MIN_CATALOG_SIZE, course_content_model,
+    build_lsh_index, add_to_lsh_index, query_lsh_index, save_lsh_index, load_lsh_index
+)
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "course_lsh_index")
+
+
+def synthetic_catalog(num_courses, dim, num_topics=None, seed=0):
+    """Unit vectors scattered around random topic centres, roughly 50 courses per topic"""
+    rng = np.random.default_rng(seed)
+    num_topics = num_topics or max(1, num_courses // 50)
+    centres = rng.standard_normal((num_topics, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, num_topics, num_courses)]
+    vectors += 0.5 * rng.standard_normal((num_courses, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, [f"Synthetic Course {i}" for i in range(num_courses)]
+
+
+def update_catalog_index(directory, vectors, names, num_tables, num_bits, terms=None, idf=None):
+    """
+    Add the courses missing from the index in `directory`, or build it from scratch
+    when there is none or the vector space changed. `terms` and `idf` describe the
+    space of TF-IDF vectors; the catalog's idf moves with every course added, so its
+    existing vectors are stale and the index is rebuilt. Returns (index, courses added).
+    """
+    index = load_lsh_index(directory, mmap_mode=None)
+    if (index is None or index["vectors"].shape[1] != vectors.shape[1]
+            or index["planes"].shape[1] != num_tables * num_bits
+            or index.get("terms") != terms
+            or (idf is not None and not np.array_equal(index["idf"], idf))):
+        index = build_lsh_index(vectors, names, num_tables, num_bits)
+        if terms is not None:
+            index.update(terms=list(terms), idf=np.asarray(idf, dtype=np.float32))
+        return index, len(names)
+
+    missing = [idx for idx, name in enumerate(names) if name not in index["ids"]]
+    if missing:
+        add_to_lsh_index(index, vectors[missing], [names[idx] for idx in missing])
+    return index, len(missing)
+
+
+def evaluate(index, num_queries=200, top_k=10, seed=0):
+    """Recall@k of the LSH index against exact search, with the per-query latency of each"""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(index["vectors"])
+    queries = vectors[rng.integers(0, len(vectors), num_queries)]
+    k = min(top_k, len(vectors))
+
+    exact_time = lsh_time = 0.0
+    hits = 0
+    for query in queries:
+        start = time.perf_counter()
+        scores = index["vectors"] @ query
+        exact = {index["names"][idx] for idx in np.argpartition(-scores, k - 1)[:k]}
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        approximate = query_lsh_index(index, query, k)
+        lsh_time += time.perf_counter() - start
+
+        hits += len(exact & {name for name, _ in approximate})
+
+    return hits / (num_queries * k), exact_time / num_queries * 1e3, lsh_time / num_queries * 1e3
+
+
+def measure_incremental_add(index, vectors, names, num_tables, num_bits):
+    """Seconds to add `vectors` to `index` vs rebuilding everything from scratch"""
+    all_vectors = np.concatenate([np.asarray(index["vectors"]), vectors])
+    all_names = index["names"] + names
+
+    start = time.perf_counter()
+    build_lsh_index(all_vectors, all_names, num_tables, num_bits)
+    rebuild_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    add_to_lsh_index(index, vectors, names)
+    add_time = time.perf_counter() - start
+    return add_time, rebuild_time
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the similar-course LSH index and measure it against exact search")
+    parser.add_argument("--output", default=COURSE_LSH_INDEX_DIR or DEFAULT_INDEX_DIR,
+                        help="Index directory (default: $COURSE_LSH_INDEX_DIR or data/course_lsh_index)")
+    parser.add_argument("--tables", type=int, default=LSH_TABLES, help="Hash tables")
+    parser.add_argument("--bits", type=int, default=LSH_BITS, help="Hash bits per table (at most 32)")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Index this many synthetic courses instead of the course catalog")
+    parser.add_argument("--dim", type=int, default=256, help="Vector size of the synthetic catalog")
+    parser.add_argument("--add", type=int, default=0,
+                        help="Also time adding this many synthetic courses vs a full rebuild (not saved)")
+    parser.add_argument("--queries", type=int, default=200, help="Queries for the recall/latency report")
+    parser.add_argument("--top-k", type=int, default=10, help="Neighbours per query for recall@k")
+    args = parser.parse_args()
+
+    terms = idf = None
+    if args.synthetic:
+        vectors, names = synthetic_catalog(args.synthetic, args.dim)
+    else:
+        vectors, names = course_content_model["matrix"], course_content_model["courses"]
+        terms, idf = course_content_model["terms"], course_content_model["idf"]
+        if len(names) < LSH_MIN_CATALOG_SIZE:
+            parser.error(f"The catalog has {len(names):,} courses; below {LSH_MIN_CATALOG_SIZE:,} it is scored exactly, "
+                         "so an index would never be queried. Use --synthetic to measure the index at scale")
+
+    start = time.perf_counter()
+    index, added = update_catalog_index(args.output, vectors, names, args.tables, args.bits, terms, idf)
+    save_lsh_index(index, args.output)
+    build_time = time.perf_counter() - start
+
+    index = load_lsh_index(args.output)
+    recall, exact_ms, lsh_ms = evaluate(index, args.queries, args.top_k)
+
+    size = sum(os.path.getsize(os.path.join(args.output, name)) for name in os.listdir(args.output))
+    print(f"Indexed {len(index['names']):,} courses ({added:,} added) in {build_time:.2f}s: "
+          f"{args.tables} tables x {args.bits} bits, {size / 1e6:.1f} MB in {args.output}")
+    print(f"Recall@{args.top_k}: {recall:.1%}")
+    print(f"Latency per query: exact {exact_ms:.2f} ms, LSH {lsh_ms:.2f} ms ({exact_ms / lsh_ms:.1f}x)")
+
+    if args.add:
+        new_vectors, new_names = synthetic_catalog(args.add, index["vectors"].shape[1], seed=1)
+        new_names = [f"Added {name}" for name in new_names]
+        add_time, rebuild_time = measure_incremental_add(
+            load_lsh_index(args.output, mmap_mode=None), new_vectors, new_names, args.tables, args.bits
+        )
+        print(f"Adding {args.add:,} courses: incremental {add_time * 1e3:.1f} ms, full rebuild {rebuild_time * 1e3:.1f} ms")
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the course recommenders. Replays completion histories
+with the last courses of each held out, then reports precision@k, recall@k,
+catalog coverage and list diversity, plus p50/p95/p99 latency and peak
+memory per recommender
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+import numpy as np
+
+# Make the backend package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import ibm_course_recommender as recommender
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "completion_histories.jsonl")
+# Shorter histories leave too little to learn from once the held-out courses are removed
+MIN_HISTORY_LENGTH = 3
+
+# Course names are bolded in the formatted responses, e.g. "1. **CIA Triad** (Cybersecurity)" or "**'CIA Triad'**"
+BOLD_COURSE_PATTERN = re.compile(r"\*\*'?(.+?)'?\*\*")
+
+
+def load_histories(path):
+    """Completion histories (lists of course names, oldest first) from a JSON-lines file"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["completed_courses"] for line in f if line.strip()]
+
+
+def split_histories(histories, holdout=0.3, min_length=MIN_HISTORY_LENGTH):
+    """Hold out the most recent `holdout` share (at least one) of each history long enough to split"""
+    splits = []
+    for history in histories:
+        if len(history) < min_length:
+            continue
+        held_out = max(1, round(len(history) * holdout))
+        splits.append((history[:-held_out], history[-held_out:]))
+    return splits
+
+
+def courses_in_response(response):
+    """Catalog courses named in bold in a formatted response, in order of appearance"""
+    catalog = recommender.course_content_model["course_index"]
+    return list(dict.fromkeys(name for name in BOLD_COURSE_PATTERN.findall(response) if name in catalog))
+
+
+def popularity_recommender(train_histories):
+    """Baseline: the most completed courses the user hasn't completed yet"""
+    ranked = [course for course, _ in Counter(c for history in train_histories for c in history).most_common()]
+
+    def recommend(completed, k):
+        seen = set(completed)
+        return [course for course in ranked if course not in seen][:k]
+    return recommend
+
+
+def intent_recommender(completed, k):
+    """get_recommendation() asked about the category of the user's latest course"""
+    category = recommender.course_content_model["categories"].get(completed[-1], "") if completed else ""
+    seen = set(completed)
+    response = recommender.get_recommendation(f"I want to learn more about {category}")
+    return [course for course in courses_in_response(response) if course not in seen][:k]
+
+
+def trending_recommender(completed, k):
+    seen = set(completed)
+    return [course for course in courses_in_response(recommender.get_trending_courses()) if course not in seen][:k]
+
+
+RECOMMENDERS = {
+    "popularity": None,   # built from the training histories
+    "trending": trending_recommender,
+    "intent": intent_recommender,
+    "content": lambda completed, k: [course for course, _ in recommender.recommend_similar_courses(completed, k)],
+    "co_completion": lambda completed, k: [course for course, _ in recommender.recommend_co_completed_courses(completed, k)],
+}
+
+
+def intra_list_diversity(courses):
+    """1 - mean pairwise cosine similarity of the courses' content vectors"""
+    course_index = recommender.course_content_model["course_index"]
+    rows = [course_index[course] for course in courses if course in course_index]
+    if len(rows) < 2:
+        return None
+    vectors = recommender.course_content_model["matrix"][rows]
+    similarity = vectors @ vectors.T
+    pairs = len(rows) * (len(rows) - 1)
+    return 1 - (similarity.sum() - np.trace(similarity)) / pairs
+
+
+def evaluate_recommender(recommend, splits, k=5, catalog_size=None):
+    """Accuracy, coverage and diversity of `recommend(completed, k)` over the (train, held out) splits"""
+    precisions, recalls, diversities = [], [], []
+    recommended = set()
+    for train, held_out in splits:
+        picks = recommend(train, k)[:k]
+        hits = len(set(picks) & set(held_out))
+        precisions.append(hits / k)
+        recalls.append(hits / len(held_out))
+        recommended.update(picks)
+        diversity = intra_list_diversity(picks)
+        if diversity is not None:
+            diversities.append(diversity)
+
+    catalog_size = catalog_size or len(recommender.course_content_model["courses"])
+    return {
+        "precision": float(np.mean(precisions)) if precisions else 0.0,
+        "recall": float(np.mean(recalls)) if recalls else 0.0,
+        "coverage": len(recommended) / catalog_size,
+        "diversity": float(np.mean(diversities)) if diversities else 0.0,
+    }
+
+
+def measure_latency(recommend, splits, k=5, repeats=3):
+    """p50/p95/p99 milliseconds per call"""
+    timings = []
+    for _ in range(repeats):
+        for train, _ in splits:
+            start = time.perf_counter()
+            recommend(train, k)
+            timings.append(time.perf_counter() - start)
+    return dict(zip(("p50", "p95", "p99"), (float(ms) for ms in np.percentile(timings, [50, 95, 99]) * 1e3)))
+
+
+def measure_memory(recommend, splits, k=5):
+    """Peak KiB allocated while answering every split once (traced separately, as tracing slows calls down)"""
+    tracemalloc.start()
+    try:
+        for train, _ in splits:
+            recommend(train, k)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def evaluate(histories, names=None, k=5, holdout=0.3, repeats=3, seed=0):
+    """Replay the histories against each recommender. Returns ({name: metrics}, number of histories replayed)"""
+    random.seed(seed)
+    splits = split_histories(histories, holdout)
+
+    # Co-completion counts never see the held-out courses: only the training part of
+    # each split history is counted, plus the histories too short to split
+    recommender.clear_co_completion()
+    for train, _ in splits:
+        recommender.record_user_completions(train)
+    for history in histories:
+        if len(history) < MIN_HISTORY_LENGTH:
+            recommender.record_user_completions(history)
+
+    recommenders = dict(RECOMMENDERS, popularity=popularity_recommender([train for train, _ in splits]))
+    report = {}
+    try:
+        for name in names or recommenders:
+            recommend = recommenders[name]
+            report[name] = evaluate_recommender(recommend, splits, k)
+            report[name].update(measure_latency(recommend, splits, k, repeats))
+            report[name]["memory_kib"] = measure_memory(recommend, splits, k)
+    finally:
+        recommender.clear_co_completion()
+    return report, len(splits)
+
+
+def print_report(report, num_users, k):
+    print(f"Replayed {num_users} held-out histories, k={k}")
+    print(f"{'recommender':<14} {'P@k':>6} {'R@k':>6} {'cover':>6} {'divers':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak KiB':>9}")
+    for name, metrics in report.items():
+        print(f"{name:<14} {metrics['precision']:>6.3f} {metrics['recall']:>6.3f} {metrics['coverage']:>6.2f} "
+              f"{metrics['diversity']:>6.2f} {metrics['p50']:>8.3f} {metrics['p95']:>8.3f} {metrics['p99']:>8.3f} "
+              f"{metrics['memory_kib']:>9.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Evaluate the course recommenders on held-out completion histories")
+    parser.add_argument("names", nargs="*", help=f"Recommenders to evaluate (default: all). Choices: {', '.join(RECOMMENDERS)}")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="Completion histories (JSON lines of user_id/completed_courses)")
+    parser.add_argument("-k", type=int, default=5, help="Recommendations per user")
+    parser.add_argument("--holdout", type=float, default=0.3, help="Share of each history held out")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing passes over the histories")
+    args = parser.parse_args()
+
+    report, num_users = evaluate(load_histories(args.data), args.names, args.k, args.holdout, args.repeats)
+    print_report(report, num_users, args.k)
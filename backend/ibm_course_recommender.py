@@ -1,10 +1,24 @@
 import gradio as gr
+import numpy as np
+import base64
+import json
+import os
+import sys
 import time
 import uuid
-from datetime import date
+import threading
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import random
 import re
+import math
+from bisect import bisect_right
+import heapq
+from itertools import count
+from collections import OrderedDict, deque
 from typing import Tuple, Optional
+from dataclasses import dataclass
+from functools import cached_property
 
 
 #########################################
@@ -245,6 +259,62 @@ LEARNING_PATHS = {
 
 }
 
+# Direct prerequisites of each course; must form a DAG
+COURSE_PREREQUISITES = {
+    # Cybersecurity
+    "CIA Triad": ["Intro to Cybersecurity"],
+    "Basic Terminologies": ["Intro to Cybersecurity"],
+    "Common Types of Attacks": ["CIA Triad", "Basic Terminologies"],
+    "Offensive Security Intro": ["Common Types of Attacks"],
+    "Defensive Security Intro": ["Common Types of Attacks"],
+    "Linux Fundamentals - Part 2": ["Linux Fundamentals - Part 1"],
+    "Linux Fundamentals - Part 3": ["Linux Fundamentals - Part 2"],
+    "IP Addressing & Subnetting": ["Networking Fundamentals"],
+    "Core Networking Protocols": ["IP Addressing & Subnetting"],
+    "Network Security Essentials": ["Core Networking Protocols", "Defensive Security Intro"],
+    "Network Analysis with Wireshark & Nmap": ["Network Security Essentials", "Linux Fundamentals - Part 3"],
+    "Symmetric Encryption": ["Introduction to Cryptography"],
+    "Asymmetric Encryption & PKI": ["Symmetric Encryption"],
+    "Hash Functions & Data Integrity": ["Introduction to Cryptography"],
+    "Cryptographic Attacks & Weaknesses": ["Asymmetric Encryption & PKI", "Hash Functions & Data Integrity"],
+    "Information Gathering & Reconnaissance": ["Introduction to Web Applications", "Network Analysis with Wireshark & Nmap"],
+    "Common Web Vulnerabilities": ["Information Gathering & Reconnaissance"],
+    "Authentication & Session Attacks": ["Common Web Vulnerabilities", "Hash Functions & Data Integrity"],
+    "Exploitation & Post-Exploitation": ["Authentication & Session Attacks", "Offensive Security Intro"],
+    "Common Vulnerability Scanning Tools": ["Introduction to Vulnerabilities and CVEs", "Network Analysis with Wireshark & Nmap"],
+    "Basics of Exploit Development": ["Common Vulnerability Scanning Tools", "Exploitation & Post-Exploitation"],
+    "Patch Management & Remediation Strategies": ["Introduction to Vulnerabilities and CVEs"],
+    "First Responder Actions": ["Introduction to Incident Response"],
+    "Basics of Log Analysis": ["Introduction to Incident Response", "Linux Fundamentals - Part 3"],
+    "Digital Forensics Fundamentals": ["First Responder Actions", "Basics of Log Analysis"],
+    # Data Science
+    "Intro to Data Science": ["Python for Everybody"],
+    "Machine Learning Basics": ["Intro to Data Science"],
+    # Web Development
+    "How Browsers and Servers Communicate": ["What is the Web?"],
+    "Basic Web Terminologies": ["What is the Web?"],
+    "Introduction to HTML": ["Basic Web Terminologies"],
+    "HTML Tags and Elements": ["Introduction to HTML"],
+    "Building Your First Web Page": ["HTML Tags and Elements"],
+    "Introduction to CSS": ["Introduction to HTML"],
+    "Selectors and Properties": ["Introduction to CSS"],
+    "Basic Page Styling": ["Selectors and Properties", "Building Your First Web Page"],
+    "Introduction to JavaScript": ["Introduction to HTML"],
+    "Variables, Functions, and Events": ["Introduction to JavaScript"],
+    "Making Websites Interactive": ["Variables, Functions, and Events", "Basic Page Styling"],
+    "How to Buy a Domain": ["What is Web Hosting?"],
+    "Deploying a Website": ["How to Buy a Domain", "Building Your First Web Page", "How Browsers and Servers Communicate"],
+    # Business Management
+    "Business Structures and Types": ["Introduction to Business"],
+    "Key Business Functions": ["Introduction to Business"],
+    "Introduction to Management": ["Key Business Functions"],
+    "Leadership and Decision-Making": ["Introduction to Management"],
+    "Planning and Organizational Structure": ["Introduction to Management", "Business Structures and Types"],
+    "Introduction to Business Strategy": ["Introduction to Management"],
+    "Market Analysis Basics": ["Introduction to Business Strategy"],
+    "Growth and Innovation Strategies": ["Market Analysis Basics", "Leadership and Decision-Making"],
+}
+
 COURSE_LINKS = {
     # Cyber Security 101 - Chapter 1: Begin Your Cybersecurity Journey
     "Intro to Cybersecurity": "https://example.com/intro-cybersecurity",
@@ -407,6 +477,8 @@ leaderboard = []
 
 # Initialize empty course ratings dictionary
 course_ratings = {}
+# Bumped on every new rating, so lists ranked by rating know when to re-rank
+course_ratings_version = 0
 
 # Initialize with dummy data
 initialize_course_ratings()
@@ -415,12 +487,47 @@ initialize_course_ratings()
 # 2. LEVEL & PROGRESSION LOGIC
 #########################################
 
+# Level thresholds precompiled for binary search (list) and bulk lookups (NumPy).
+# Call compile_level_thresholds() again whenever TEN_LEVELS changes.
+LEVEL_THRESHOLDS = []
+LEVEL_THRESHOLDS_ARRAY = np.zeros(0, dtype=np.int64)
+
+def compile_level_thresholds():
+    global LEVEL_THRESHOLDS, LEVEL_THRESHOLDS_ARRAY
+    LEVEL_THRESHOLDS = [lvl["xp_needed"] for lvl in TEN_LEVELS]
+    LEVEL_THRESHOLDS_ARRAY = np.array(LEVEL_THRESHOLDS, dtype=np.int64)
+
+compile_level_thresholds()
+
+def get_level_index(xp: int) -> int:
+    """Return the index in TEN_LEVELS of the highest level reached with `xp`."""
+    return max(bisect_right(LEVEL_THRESHOLDS, xp) - 1, 0)
+
+def compute_levels_bulk(xp_values):
+    """
+    Map an array of XP values to level indices and progress fractions (0-1)
+    towards the next level in one vectorized call. Users at the maximum level
+    have a progress of 1.0.
+    
+    Returns:
+        Tuple of (level_indices, progress_fractions) NumPy arrays
+    """
+    xp = np.asarray(xp_values, dtype=np.int64)
+    thresholds = LEVEL_THRESHOLDS_ARRAY
+    max_idx = len(thresholds) - 1
+    
+    level_indices = np.clip(np.searchsorted(thresholds, xp, side="right") - 1, 0, max_idx)
+    current_xp_needed = thresholds[level_indices]
+    next_xp_needed = thresholds[np.minimum(level_indices + 1, max_idx)]
+    
+    span = next_xp_needed - current_xp_needed
+    safe_span = np.where(span > 0, span, 1)
+    progress = np.where(span > 0, (xp - current_xp_needed) / safe_span, 1.0)
+    return level_indices, np.clip(progress, 0.0, 1.0)
+
 def determine_custom_level(xp: int) -> str:
-    qualifying = [lvl for lvl in TEN_LEVELS if xp >= lvl["xp_needed"]]
-    if not qualifying:
-        return "0x1 [Initiate]"
-    highest = qualifying[-1]
-    return f"{highest['hex_code']} [{highest['title']}]"
+    level = TEN_LEVELS[get_level_index(xp)]
+    return f"{level['hex_code']} [{level['title']}]"
 
 def check_level_up(user_state):
     old_level = user_state["level"]
@@ -430,22 +537,203 @@ def check_level_up(user_state):
         return f"\n\n👏 Congratulations! You've advanced to **{new_level}**! 🚀\n\n "
     return ""
 
+#########################################
+# XP LEDGER (EVENT SOURCING)
+#########################################
+
+# Compact event type codes, stored in the ledger instead of strings
+XP_EVENT_COURSE_COMPLETION = 1
+XP_EVENT_QUEST_REWARD = 2
+XP_EVENT_DAILY_CHALLENGE = 3
+XP_EVENT_COURSE_RATING = 4
+XP_EVENT_CHAPTER_COMPLETION = 5
+XP_EVENT_PATH_COMPLETION = 6
+
+XP_EVENT_NAMES = {
+    XP_EVENT_COURSE_COMPLETION: "course_completion",
+    XP_EVENT_QUEST_REWARD: "quest_reward",
+    XP_EVENT_DAILY_CHALLENGE: "daily_challenge",
+    XP_EVENT_COURSE_RATING: "course_rating",
+    XP_EVENT_CHAPTER_COMPLETION: "chapter_completion",
+    XP_EVENT_PATH_COMPLETION: "path_completion",
+}
+
+# A snapshot of each user's XP is taken every N of their events,
+# so rebuilding state only has to replay the events after it
+XP_SNAPSHOT_INTERVAL = 50
+
+# Optional file the ledger is appended to (one "user_id,type,amount,timestamp" line per event).
+# The file keeps every event; memory only keeps each user's events since their latest snapshot.
+XP_LEDGER_FILE = os.environ.get("XP_LEDGER_FILE")
+
+# Events not yet covered by a snapshot: {user_id: [(event_type, amount, timestamp), ...]}
+xp_ledger = {}
+# Latest snapshot per user: {"event_count": events covered, "xp": XP after those events}
+xp_snapshots = {}
+# Append handle for XP_LEDGER_FILE, opened on first use and flushed after every event
+xp_ledger_file = None
+xp_ledger_file_lock = threading.Lock()
+
+def get_xp_ledger_file():
+    """Return the append handle for XP_LEDGER_FILE, reopening it if the path changed."""
+    global xp_ledger_file
+    if xp_ledger_file is None or xp_ledger_file.name != XP_LEDGER_FILE:
+        if xp_ledger_file is not None:
+            xp_ledger_file.close()
+        xp_ledger_file = open(XP_LEDGER_FILE, "a", encoding="utf-8")
+    return xp_ledger_file
+
+def xp_ledger_line(user_id, event_type, amount, timestamp):
+    return f"{user_id},{event_type},{amount},{timestamp}\n"
+
+def record_xp_event(user_id, event_type, amount, timestamp=None, persist=True):
+    """
+    Append an XP event to the ledger and snapshot the user's XP every
+    XP_SNAPSHOT_INTERVAL events, dropping the snapshotted events from memory.
+    """
+    if timestamp is None:
+        timestamp = int(time.time())
+    
+    events = xp_ledger.setdefault(user_id, [])
+    events.append((event_type, amount, timestamp))
+    
+    if persist and XP_LEDGER_FILE:
+        with xp_ledger_file_lock:
+            ledger_file = get_xp_ledger_file()
+            ledger_file.write(xp_ledger_line(user_id, event_type, amount, timestamp))
+            ledger_file.flush()
+    
+    if len(events) == XP_SNAPSHOT_INTERVAL:
+        snapshot = xp_snapshots.get(user_id, {"event_count": 0, "xp": 0})
+        xp_snapshots[user_id] = {
+            "event_count": snapshot["event_count"] + len(events),
+            "xp": snapshot["xp"] + replay_xp_events(user_id),
+        }
+        events.clear()
+
+def grant_xp(user_state, amount, event_type):
+    """Add XP to the user and record the grant in the ledger."""
+    user_state["xp"] += amount
+    record_fact_change(user_state, "xp")
+    # Every user counts towards the XP distribution, even off the public leaderboard
+    record_xp_in_histogram(user_state)
+    if user_state.get("user_id") is not None:
+        record_xp_event(user_state["user_id"], event_type, amount)
+
+def replay_xp_events(user_id):
+    """Sum the XP of a user's ledger events since their latest snapshot."""
+    return sum(amount for _, amount, _ in xp_ledger.get(user_id, []))
+
+def rebuild_xp_from_ledger(user_id):
+    """Rebuild a user's total XP from their latest snapshot plus the events after it."""
+    snapshot = xp_snapshots.get(user_id, {"event_count": 0, "xp": 0})
+    return snapshot["xp"] + replay_xp_events(user_id)
+
+def rebuild_user_xp(user_state):
+    """Restore a user's XP and level from the ledger, e.g. after a bug corrupted them."""
+    user_state["xp"] = rebuild_xp_from_ledger(user_state["user_id"])
+    user_state["level"] = determine_custom_level(user_state["xp"])
+    return user_state["xp"]
+
+def get_xp_history(user_id):
+    """
+    Return a user's XP events since their latest snapshot as readable dictionaries,
+    oldest first. Older events are only kept in XP_LEDGER_FILE.
+    """
+    history = []
+    for event_type, amount, timestamp in xp_ledger.get(user_id, []):
+        history.append({
+            "event": XP_EVENT_NAMES.get(event_type, "unknown"),
+            "amount": amount,
+            "timestamp": timestamp
+        })
+    return history
+
+def load_xp_ledger(path):
+    """Load events written to an XP ledger file back into memory."""
+    with open(path, encoding="utf-8") as ledger_file:
+        for line in ledger_file:
+            if not line.strip():
+                continue
+            user_id, event_type, amount, timestamp = line.rstrip("\n").rsplit(",", 3)
+            record_xp_event(user_id, int(event_type), int(amount), int(timestamp), persist=False)
+
 #########################################
 # 3. STREAK TRACKING
 #########################################
 
+# Users bucketed by the date (ISO string) they were last active on, so the
+# nightly expiry pass only visits buckets old enough to hold lapsed streaks
+streak_activity_index = {}
+# Live user states by user_id, for the nightly expiry pass. Users leave it (and the
+# index) once their streak expires, so it only holds users active in the last few days
+streak_user_states = {}
+# Held while the index or a streak changes, since the nightly pass runs on a timer thread
+streak_lock = threading.RLock()
+
+def get_user_today(user_state, now=None):
+    """
+    Return today's date in the user's timezone (user_state["timezone"], an IANA
+    name such as "Europe/London"), falling back to the server's local date.
+    `now` is an aware datetime to evaluate at instead of the current time.
+    """
+    tz_name = user_state.get("timezone")
+    if tz_name:
+        try:
+            user_tz = ZoneInfo(tz_name)
+            return (now or datetime.now(timezone.utc)).astimezone(user_tz).date()
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    if now is None:
+        return date.today()
+    return now.astimezone().date()
+
+def set_user_timezone(user_state, tz_name):
+    tz_name = tz_name.strip()
+    try:
+        ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return (
+            f"❌ **'{tz_name}'** is not a timezone I recognise.\n"
+            "Please use a name like `Europe/London`, `America/New_York` or `Asia/Singapore`."
+        )
+    user_state["timezone"] = tz_name
+    local_today = get_user_today(user_state)
+    return f"🕒 Your timezone is now **{tz_name}**. Your streak days follow your local date ({local_today.isoformat()})."
+
+def index_streak_activity(user_state, old_active_date):
+    """Move the user from their previous last-active bucket to the current one."""
+    user_id = user_state.get("user_id")
+    if user_id is None:
+        return
+    streak_user_states[user_id] = user_state
+    
+    if old_active_date in streak_activity_index:
+        streak_activity_index[old_active_date].discard(user_id)
+        if not streak_activity_index[old_active_date]:
+            del streak_activity_index[old_active_date]
+    streak_activity_index.setdefault(user_state["last_active_date"], set()).add(user_id)
+
 def update_streak(user_state):
-    today = date.today()
+    with streak_lock:
+        update_streak_locked(user_state)
+
+def update_streak_locked(user_state):
+    today = get_user_today(user_state)
+    mark_active_day(user_state, today)
     last_active_str = user_state.get("last_active_date")
     
     if last_active_str is None:
         user_state["current_streak"] = 1
         user_state["longest_streak"] = 1
         user_state["last_active_date"] = today.isoformat()
+        index_streak_activity(user_state, None)
         return
     
     last_active = date.fromisoformat(last_active_str)
-    if today == last_active:
+    # Same day (or an earlier local date after moving to a timezone further west)
+    if today <= last_active:
+        index_streak_activity(user_state, last_active_str)
         return
 
     diff = (today - last_active).days
@@ -458,34 +746,359 @@ def update_streak(user_state):
         user_state["current_streak"] = 1
     
     user_state["last_active_date"] = today.isoformat()
+    index_streak_activity(user_state, last_active_str)
+
+#########################################
+# ACTIVITY CALENDAR BITMAP
+#########################################
+
+# Each user's activity is a packed bitmap with one bit per day, starting at
+# user_state["activity_start_date"] (~46 bytes per user per year)
+ACTIVITY_HEATMAP_DAYS = 365
+
+def mark_active_day(user_state, day):
+    """Set the bit for `day` in the user's activity bitmap, growing it as needed."""
+    bitmap = user_state.get("activity_bitmap")
+    if bitmap is None:
+        bitmap = user_state["activity_bitmap"] = bytearray()
+        user_state["activity_start_date"] = day.isoformat()
+    
+    start = date.fromisoformat(user_state["activity_start_date"])
+    if day < start:
+        # Prepend whole bytes so existing bits keep their positions
+        pad_bytes = math.ceil((start - day).days / 8)
+        bitmap[0:0] = bytes(pad_bytes)
+        start -= timedelta(days=pad_bytes * 8)
+        user_state["activity_start_date"] = start.isoformat()
+    
+    offset = (day - start).days
+    byte_idx = offset // 8
+    if byte_idx >= len(bitmap):
+        bitmap.extend(bytes(byte_idx + 1 - len(bitmap)))
+    bitmap[byte_idx] |= 1 << (offset % 8)
+
+def was_active_on(user_state, day):
+    """O(1) check of whether the user was active on `day`."""
+    bitmap = user_state.get("activity_bitmap")
+    if not bitmap:
+        return False
+    offset = (day - date.fromisoformat(user_state["activity_start_date"])).days
+    if offset < 0 or offset // 8 >= len(bitmap):
+        return False
+    return bool(bitmap[offset // 8] & (1 << (offset % 8)))
+
+def count_active_days(user_state, first_day, last_day):
+    """Count active days between `first_day` and `last_day` (inclusive)."""
+    bitmap = user_state.get("activity_bitmap")
+    if not bitmap:
+        return 0
+    start = date.fromisoformat(user_state["activity_start_date"])
+    first = max((first_day - start).days, 0)
+    last = min((last_day - start).days, len(bitmap) * 8 - 1)
+    if last < first:
+        return 0
+    bits = int.from_bytes(bitmap, "little") >> first
+    return (bits & ((1 << (last - first + 1)) - 1)).bit_count()
+
+def render_activity_heatmap(user_state, today, days=ACTIVITY_HEATMAP_DAYS):
+    """
+    Render the last `days` days as a GitHub-style heatmap: one row per weekday,
+    one column per week, '█' for active days and '░' for inactive ones.
+    """
+    first_day = today - timedelta(days=days - 1)
+    # Align the grid to the Monday of the first week
+    grid_start = first_day - timedelta(days=first_day.weekday())
+    num_weeks = (today - grid_start).days // 7 + 1
+    
+    rows = []
+    for weekday, label in enumerate(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]):
+        cells = []
+        for week in range(num_weeks):
+            day = grid_start + timedelta(days=week * 7 + weekday)
+            if day < first_day or day > today:
+                cells.append(" ")
+            else:
+                cells.append("█" if was_active_on(user_state, day) else "░")
+        rows.append(f"{label} {''.join(cells)}")
+    return "\n".join(rows)
+
+def expire_lapsed_streaks(now=None):
+    """
+    Nightly bulk pass that resets the current streak of every user who missed
+    a whole local day, and updates their leaderboard entry to match.
+    Only buckets of users last active before yesterday (UTC) are visited.
+    
+    Returns:
+        Number of streaks expired
+    """
+    with streak_lock:
+        return expire_lapsed_streaks_locked(now or datetime.now(timezone.utc))
+
+def expire_lapsed_streaks_locked(now):
+    utc_today = now.astimezone(timezone.utc).date()
+    
+    # Local dates are at most one day either side of the UTC date, so users last
+    # active 3+ days ago have lapsed everywhere; the two newer buckets are checked per user
+    lapsed_everywhere = (utc_today - timedelta(days=3)).isoformat()
+    newest_candidate = (utc_today - timedelta(days=1)).isoformat()
+    
+    expired = 0
+    for active_date in sorted(streak_activity_index):
+        if active_date > newest_candidate:
+            break
+        
+        bucket = streak_activity_index[active_date]
+        for user_id in list(bucket):
+            user_state = streak_user_states.get(user_id)
+            if user_state is not None and active_date > lapsed_everywhere:
+                days_inactive = (get_user_today(user_state, now) - date.fromisoformat(active_date)).days
+                if days_inactive < 2:
+                    continue
+            
+            bucket.discard(user_id)
+            streak_user_states.pop(user_id, None)
+            if user_state is None:
+                continue
+            user_state["current_streak"] = 0
+            leaderboard_entry = find_user_in_leaderboard(user_id)
+            if leaderboard_entry:
+                leaderboard_entry["current_streak"] = 0
+            expired += 1
+        
+        if not bucket:
+            del streak_activity_index[active_date]
+    
+    return expired
+
+def schedule_nightly_streak_expiry():
+    """Run expire_lapsed_streaks() at every UTC midnight in a background thread."""
+    now = datetime.now(timezone.utc)
+    next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    
+    def run_and_reschedule():
+        expire_lapsed_streaks()
+        schedule_nightly_streak_expiry()
+    
+    timer = threading.Timer((next_midnight - now).total_seconds(), run_and_reschedule)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+#########################################
+# RULE ENGINE
+#########################################
+
+# Badges and quests may define a declarative "rule"; without one, a badge needs all
+# of its courses_needed plus min_xp and a quest needs all of its courses_required.
+# Rule syntax:
+#   "Course Name"                         - the course has been completed
+#   {"all": [rule, ...]}                  - every sub-rule holds
+#   {"any": [rule, ...]}                  - at least one sub-rule holds
+#   {"count": n, "of": [rule, ...]}       - at least n sub-rules hold
+#   {"min_xp": n}                         - the user has at least n XP
+#   {"path_completed": "Path Name"}       - the learning path has been completed
+#
+# Rules are compiled into a DAG of nodes shared between definitions, plus an
+# index from facts ("course:<name>", "xp", "path:<name>") to the rules that read them.
+# Starting a quest changes "quest:<name>", which only that quest's rule reads.
+
+RULE_NODE_COURSE = "course"
+RULE_NODE_MIN_XP = "min_xp"
+RULE_NODE_PATH = "path"
+RULE_NODE_ALL = "all"
+RULE_NODE_ANY = "any"
+RULE_NODE_COUNT = "count"
+
+rule_nodes = []        # node id -> (kind, argument, child ids)
+rule_node_ids = {}     # (kind, argument, child ids) -> node id, for deduplication
+rule_roots = {"badge": {}, "quest": {}}    # kind -> {name: root node id}
+rule_fact_index = {}   # fact -> {kind: set of names}
+rule_order = {"badge": {}, "quest": {}}    # kind -> {name: definition order}
+
+def badge_rule(req):
+    """Return the declarative rule of a skill badge definition."""
+    return req.get("rule") or {"all": list(req["courses_needed"]) + [{"min_xp": req["min_xp"]}]}
+
+def quest_rule(quest_data):
+    """Return the declarative rule of a quest definition."""
+    return quest_data.get("rule") or {"all": list(quest_data["courses_required"])}
+
+def add_rule_node(kind, argument=None, children=()):
+    """Intern a rule node so identical sub-rules share a single node."""
+    key = (kind, argument, children)
+    if key not in rule_node_ids:
+        rule_node_ids[key] = len(rule_nodes)
+        rule_nodes.append(key)
+    return rule_node_ids[key]
+
+def compile_rule(rule):
+    """Compile a declarative rule into the shared DAG and return its node id."""
+    if isinstance(rule, str):
+        return add_rule_node(RULE_NODE_COURSE, rule)
+    if "min_xp" in rule:
+        return add_rule_node(RULE_NODE_MIN_XP, rule["min_xp"])
+    if "path_completed" in rule:
+        return add_rule_node(RULE_NODE_PATH, rule["path_completed"])
+    
+    if "count" in rule:
+        kind, argument, sub_rules = RULE_NODE_COUNT, rule["count"], rule["of"]
+    elif "all" in rule:
+        kind, argument, sub_rules = RULE_NODE_ALL, None, rule["all"]
+    elif "any" in rule:
+        kind, argument, sub_rules = RULE_NODE_ANY, None, rule["any"]
+    else:
+        raise ValueError(f"Unknown rule: {rule!r}")
+    
+    # Sort children so the same set of sub-rules always maps to the same node
+    children = tuple(sorted(set(compile_rule(sub_rule) for sub_rule in sub_rules)))
+    if kind != RULE_NODE_COUNT and len(children) == 1:
+        return children[0]
+    return add_rule_node(kind, argument, children)
+
+def rule_facts(node_id):
+    """Return the facts a rule node depends on."""
+    kind, argument, children = rule_nodes[node_id]
+    if kind == RULE_NODE_COURSE:
+        return {f"course:{argument}"}
+    if kind == RULE_NODE_MIN_XP:
+        return {"xp"}
+    if kind == RULE_NODE_PATH:
+        return {f"path:{argument}"}
+    return set().union(*(rule_facts(child) for child in children))
+
+def compile_rule_graph():
+    """(Re)compile every badge and quest rule. Call after editing their definitions."""
+    rule_nodes.clear()
+    rule_node_ids.clear()
+    rule_fact_index.clear()
+    
+    definitions = {
+        "badge": {name: badge_rule(req) for name, req in SKILL_BADGE_REQUIREMENTS.items()},
+        "quest": {name: quest_rule(data) for name, data in QUESTS.items()},
+    }
+    for kind, rules in definitions.items():
+        rule_roots[kind] = {}
+        rule_order[kind] = {}
+        for order, (name, rule) in enumerate(rules.items()):
+            root = compile_rule(rule)
+            rule_roots[kind][name] = root
+            rule_order[kind][name] = order
+            for fact in rule_facts(root):
+                rule_fact_index.setdefault(fact, {}).setdefault(kind, set()).add(name)
+    for name in rule_roots["quest"]:
+        rule_fact_index.setdefault(f"quest:{name}", {}).setdefault("quest", set()).add(name)
+
+def record_fact_change(user_state, fact):
+    """Note that a fact changed so the next rule check re-evaluates the rules reading it."""
+    changed = user_state.setdefault("changed_facts", [])
+    if fact not in changed:
+        changed.append(fact)
+
+# Versions come from one process-wide counter, so a user whose state is reset never
+# reuses a version that results were cached under for their old state
+state_versions = count(1)
+
+def bump_state_version(user_state):
+    """Note that completions, quests or learning paths changed, so cached recommendations are stale."""
+    user_state["state_version"] = next(state_versions)
+
+def get_state_version(user_state):
+    if "state_version" not in user_state:
+        bump_state_version(user_state)
+    return user_state["state_version"]
+
+def pop_changed_facts(user_state):
+    """Return and clear the facts changed since the last rule check."""
+    return set(user_state.pop("changed_facts", []))
+
+def rules_to_check(kind, changed_facts):
+    """Names of `kind` rules to evaluate, in definition order. None means all of them."""
+    if changed_facts is None:
+        return list(rule_roots[kind])
+    names = set()
+    for fact in changed_facts:
+        names |= rule_fact_index.get(fact, {}).get(kind, set())
+    return sorted(names, key=rule_order[kind].get)
+
+def build_rule_context(user_state):
+    """Snapshot the facts rules read from a user state."""
+    return {
+        "courses": set(user_state["completed_courses"]),
+        "xp": user_state["xp"],
+        "paths": {path for path, status in user_state.get("learning_paths_progress", {}).items()
+                  if status.get("completed")},
+    }
+
+def evaluate_rule(node_id, context, memo):
+    """Evaluate a rule node; `memo` caches shared nodes within one check."""
+    if node_id in memo:
+        return memo[node_id]
+    
+    kind, argument, children = rule_nodes[node_id]
+    if kind == RULE_NODE_COURSE:
+        result = argument in context["courses"]
+    elif kind == RULE_NODE_MIN_XP:
+        result = context["xp"] >= argument
+    elif kind == RULE_NODE_PATH:
+        result = argument in context["paths"]
+    elif kind == RULE_NODE_ALL:
+        result = all(evaluate_rule(child, context, memo) for child in children)
+    elif kind == RULE_NODE_ANY:
+        result = any(evaluate_rule(child, context, memo) for child in children)
+    else:
+        result = sum(evaluate_rule(child, context, memo) for child in children) >= argument
+    
+    memo[node_id] = result
+    return result
+
+compile_rule_graph()
 
 #########################################
 # 4. SKILL BADGES & QUEST CHECKS
 #########################################
 
-def check_skill_badges(user_state):
+def check_skill_badges(user_state, changed_facts=None):
+    """
+    Award every skill badge whose rule now holds.
+    With `changed_facts`, only badges reading one of those facts are re-checked.
+    """
     newly_awarded = []
-    for badge_name, req in SKILL_BADGE_REQUIREMENTS.items():
+    context = build_rule_context(user_state)
+    memo = {}
+    for badge_name in rules_to_check("badge", changed_facts):
         if badge_name in user_state["badges"]:
             continue
-        if all(course in user_state["completed_courses"] for course in req["courses_needed"]) \
-           and user_state["xp"] >= req["min_xp"]:
+        if evaluate_rule(rule_roots["badge"][badge_name], context, memo):
             user_state["badges"].append(badge_name)
             newly_awarded.append(badge_name)
     return newly_awarded
 
-def check_quests(user_state):
+def check_quests(user_state, changed_facts=None):
+    """
+    Complete every active quest whose rule now holds.
+    With `changed_facts`, only quests reading one of those facts are re-checked.
+    """
     messages = []
-    for quest_name, quest_data in QUESTS.items():
+    sync_quest_counters(user_state)
+    context = build_rule_context(user_state)
+    memo = {}
+    for quest_name in rules_to_check("quest", changed_facts):
+        quest_data = QUESTS[quest_name]
         if quest_name not in user_state["active_quests"]:
             continue
-        if user_state["active_quests"][quest_name]["completed"]:
+        quest_status = user_state["active_quests"][quest_name]
+        if quest_status["completed"]:
             continue
 
-        required_courses = quest_data["courses_required"]
-        if all(c in user_state["completed_courses"] for c in required_courses):
+        # Quests without a custom rule are done once no required course remains
+        if "rule" in quest_data:
+            done = evaluate_rule(rule_roots["quest"][quest_name], context, memo)
+        else:
+            done = quest_status["remaining_count"] == 0
+        if done:
             user_state["active_quests"][quest_name]["completed"] = True
-            user_state["xp"] += quest_data["reward_xp"]
+            bump_state_version(user_state)
+            grant_xp(user_state, quest_data["reward_xp"], XP_EVENT_QUEST_REWARD)
             user_state["badges"].append(quest_data["reward_badge"])
             msg = (
                 f"\n\n\n\n🎉 You have completed the **'{quest_name}'** Quest!"
@@ -625,6 +1238,70 @@ def leave_leaderboard(user_state):
     user_state["leaderboard_nickname"] = None
     return f"You have been **removed from** the leaderboard. (Nickname was: **{nickname}**)"
 
+#########################################
+# XP HISTOGRAM (APPROXIMATE PERCENTILE RANK)
+#########################################
+
+# Fixed log-scale buckets: bucket 0 holds users with 0 XP, and every later
+# bucket spans a quarter of a doubling (x2^(1/4)), so 80 buckets reach ~740k XP.
+XP_HISTOGRAM_NUM_BUCKETS = 80
+XP_HISTOGRAM_BUCKETS_PER_DOUBLING = 4
+XP_HISTOGRAM_BOUNDS = [0] + [
+    2 ** (i / XP_HISTOGRAM_BUCKETS_PER_DOUBLING) for i in range(XP_HISTOGRAM_NUM_BUCKETS - 1)
+]
+
+# Number of users per bucket, and the bucket each user (by per-session user_id) was
+# last counted in. Users are (re)counted whenever grant_xp() changes their XP.
+xp_histogram = [0] * XP_HISTOGRAM_NUM_BUCKETS
+xp_histogram_user_buckets = {}
+
+def xp_histogram_bucket(xp):
+    """Return the histogram bucket index for an XP value."""
+    return max(bisect_right(XP_HISTOGRAM_BOUNDS, xp) - 1, 0)
+
+def record_xp_in_histogram(user_state):
+    """
+    Count the user's current XP in the histogram, moving them out of the
+    bucket they were previously counted in.
+    """
+    user_id = user_state.get("user_id")
+    if user_id is None:
+        return
+    
+    new_bucket = xp_histogram_bucket(user_state.get("xp", 0))
+    old_bucket = xp_histogram_user_buckets.get(user_id)
+    if old_bucket == new_bucket:
+        return
+    
+    if old_bucket is not None:
+        xp_histogram[old_bucket] -= 1
+    xp_histogram[new_bucket] += 1
+    xp_histogram_user_buckets[user_id] = new_bucket
+
+def get_xp_percentile_rank(xp):
+    """
+    Approximate the percentage of learners with at least `xp` XP.
+    Runs in O(buckets), assuming users are spread evenly inside a bucket.
+    Returns None if nobody has been counted yet.
+    """
+    total_users = sum(xp_histogram)
+    if total_users == 0:
+        return None
+    
+    bucket = xp_histogram_bucket(xp)
+    users_above = sum(xp_histogram[bucket + 1:])
+    
+    # Share of the user's own bucket that sits at or above their XP
+    if bucket + 1 < XP_HISTOGRAM_NUM_BUCKETS:
+        lower = XP_HISTOGRAM_BOUNDS[bucket]
+        upper = XP_HISTOGRAM_BOUNDS[bucket + 1]
+        share_at_or_above = (upper - max(xp, lower)) / (upper - lower)
+    else:
+        share_at_or_above = 0.5  # Open-ended top bucket
+    
+    users_at_or_above = users_above + xp_histogram[bucket] * share_at_or_above
+    return min(100.0, (users_at_or_above / total_users) * 100)
+
 #########################################
 # 6. DAILY CHALLENGES (UPDATED)
 #########################################
@@ -634,7 +1311,7 @@ def present_daily_challenge(user_state):
     Assign a new challenge to user_state["current_challenge"] if they haven't done today's.
     Return the question, instructing them to simply type their guess.
     """
-    today = date.today().isoformat()
+    today = get_user_today(user_state).isoformat()
     if user_state["daily_challenge_date"] == today and user_state["daily_challenge_done"]:
         return "You've already completed today's challenge!"
     
@@ -667,7 +1344,7 @@ def check_daily_challenge_answer(user_state, user_message):
     if user_answer == correct_answer:
         user_state["daily_challenge_done"] = True
         reward = challenge["reward_xp"]
-        user_state["xp"] += reward
+        grant_xp(user_state, reward, XP_EVENT_DAILY_CHALLENGE)
         # Reset current_challenge so it won't re-check
         user_state["current_challenge"] = None
         return f"✅ Correct! You earned **{reward} XP** for today's challenge!"
@@ -677,6 +1354,68 @@ def check_daily_challenge_answer(user_state, user_message):
 #########################################
 # 7. QUESTS
 #########################################
+
+# Each active quest entry keeps "remaining_courses" (set) and "remaining_count",
+# decremented as courses are completed.
+quest_course_index = {}    # course -> names of quests requiring it
+
+def take_new_completions(user_state, cursor_key):
+    """
+    Return the courses appended to completed_courses since the cursor stored under
+    `cursor_key` last advanced, and advance it. Returns None if completed_courses was
+    replaced or shrank in the meantime, in which case counters must be recounted.
+    """
+    completed_courses = user_state["completed_courses"]
+    seen, last_course = user_state.get(cursor_key) or (0, None)
+    user_state[cursor_key] = [len(completed_courses), completed_courses[-1] if completed_courses else None]
+    if seen > len(completed_courses) or (seen and completed_courses[seen - 1] != last_course):
+        return None
+    return completed_courses[seen:]
+
+def compile_quest_course_index():
+    """(Re)build the course -> quests index. Call after editing QUESTS."""
+    quest_course_index.clear()
+    for quest_name, quest_data in QUESTS.items():
+        for course in quest_data["courses_required"]:
+            quest_course_index.setdefault(course, []).append(quest_name)
+
+def init_quest_counters(user_state, quest_name, completed=None):
+    """Compute the remaining courses of one active quest from scratch."""
+    if completed is None:
+        completed = set(user_state["completed_courses"])
+    entry = user_state["active_quests"][quest_name]
+    entry["remaining_courses"] = {
+        course for course in QUESTS[quest_name]["courses_required"] if course not in completed
+    }
+    entry["remaining_count"] = len(entry["remaining_courses"])
+
+def sync_quest_counters(user_state):
+    """
+    Apply courses completed since the last sync to the active quests' counters.
+    Falls back to a full recount if completed_courses was replaced or shrank.
+    """
+    active_quests = user_state["active_quests"]
+    new_courses = take_new_completions(user_state, "quest_counters_cursor")
+    
+    if new_courses is None:
+        completed = set(user_state["completed_courses"])
+        for quest_name in active_quests:
+            if QUESTS.get(quest_name):
+                init_quest_counters(user_state, quest_name, completed)
+    else:
+        for course in new_courses:
+            for quest_name in quest_course_index.get(course, ()):
+                entry = active_quests.get(quest_name)
+                if entry and course in entry.get("remaining_courses", ()):
+                    entry["remaining_courses"].discard(course)
+                    entry["remaining_count"] -= 1
+        # Quests started without going through start_quest() have no counters yet
+        for quest_name, entry in active_quests.items():
+            if "remaining_courses" not in entry and QUESTS.get(quest_name):
+                init_quest_counters(user_state, quest_name)
+
+compile_quest_course_index()
+
 def start_quest(user_state, quest_name):
     # 1) Case-insensitive lookup for the quest
     quest_name_lower = quest_name.lower()
@@ -745,14 +1484,10 @@ def start_quest(user_state, quest_name):
     # 3) In Progress
     if existing_status and existing_status.get("completed") is False:
         # Let's show the user which courses remain
-        quest_data = QUESTS[quest_matched]
-        required_courses = quest_data["courses_required"]
-        
-        # Build a list of courses that the user has NOT yet completed
-        # (We assume user_state["completed_courses"] tracks fully completed courses.)
+        sync_quest_counters(user_state)
+        remaining = existing_status["remaining_courses"]
         incomplete_courses = [
-            course for course in required_courses
-            if course not in user_state["completed_courses"]
+            course for course in QUESTS[quest_matched]["courses_required"] if course in remaining
         ]
         
         if incomplete_courses:
@@ -774,8 +1509,8 @@ def start_quest(user_state, quest_name):
         else:
             # Edge case: The user might have completed all the courses 
             # but the quest hasn't been marked "completed" yet for some reason.
-            # Typically your check_quests() function handles awarding XP 
-            # once they've done all courses. You can handle it here or prompt them.
+            # Flag the quest so the next check_quests() awards it.
+            record_fact_change(user_state, f"quest:{quest_matched}")
             return (
                 f"⏳ You're already in the middle of **'{quest_matched}'**, and you've finished all "
                 "required courses. Use `show quest progress` to see your progress. "
@@ -787,6 +1522,11 @@ def start_quest(user_state, quest_name):
         "started": True,
         "completed": False,
     }
+    bump_state_version(user_state)
+    sync_quest_counters(user_state)
+    init_quest_counters(user_state, quest_matched)
+    # Its courses may already be done, and no course fact will change to re-check it
+    record_fact_change(user_state, f"quest:{quest_matched}")
 
     quest_data = QUESTS[quest_matched]
     required_courses = quest_data["courses_required"]
@@ -935,6 +1675,58 @@ def list_available_quests(user_state) -> str:
     
     return "\n".join(lines)
 
+def render_quest_blocks():
+    """Prerender each quest's course links and reward lines for the quest overview."""
+    blocks = {}
+    for quest_name, quest_data in QUESTS.items():
+        blocks[quest_name] = {
+            "courses": [
+                (course, f"[{course}]({COURSE_LINKS.get(course, 'https://example.com/courses')})")
+                for course in quest_data["courses_required"]
+            ],
+            "rewards": f"\n**Reward XP:** {quest_data['reward_xp']} XP\n**Reward Badge:** {quest_data['reward_badge']}",
+        }
+    return blocks
+
+def render_quest_overview(active_quests, completed_courses):
+    """
+    List every quest with its status, required courses and rewards, overlaying the
+    user's quest statuses and completed courses on the prerendered quest blocks.
+    """
+    completed_courses = set(completed_courses)
+    response_parts = ["## Quest Details\n"]
+    
+    for quest_name, block in prerendered["quest_blocks"].items():
+        # Check if user has started or completed this quest
+        quest_status = active_quests.get(quest_name)
+        status_text = "Not Started"
+        if quest_status:
+            if quest_status.get("completed", False): # pragma: no cover
+                status_text = "✅ Completed" # pragma: no cover
+            else:
+                status_text = "⏳ In Progress" # pragma: no cover
+        
+        # Add section for this quest
+        response_parts.append(f"### {quest_name} ({status_text})\n")
+        
+        # Add required courses with links, ticking the ones the user has completed
+        response_parts.append("**Required Courses:**")
+        for course, course_link in block["courses"]:
+            status_icon = "✅ " if course in completed_courses else ""
+            response_parts.append(f"- {status_icon}{course_link}")
+        
+        response_parts.append(block["rewards"])
+        
+        # Add dynamic note based on quest status
+        if status_text == "Not Started":
+            response_parts.append(f"***Note**: Use `start quest {quest_name}` to start this quest*\n")
+        elif status_text == "⏳ In Progress": # pragma: no cover
+            response_parts.append(f"***Note**: Use `show quest progress` to track your current progress*\n") # pragma: no cover
+        else:  # Completed
+            response_parts.append(f"***Note**: Use `show quests` to see all available quests*\n") # pragma: no cover
+    
+    return "\n".join(response_parts)
+
 def show_quest_details(user_state, quest_name=None):
     """
     Shows detailed information about a specific quest or all quests if no name provided.
@@ -947,45 +1739,12 @@ def show_quest_details(user_state, quest_name=None):
     Returns:
         A formatted string with detailed information about quest(s)
     """
-    # If no specific quest requested, list all quests with details
+    # If no specific quest requested, list all quests with details. A user who
+    # hasn't started a quest or finished a course gets the prerendered overview.
     if not quest_name:
-        response_parts = ["## Quest Details\n"]
-        
-        for quest_name, quest_data in QUESTS.items():
-            # Check if user has started or completed this quest
-            quest_status = user_state["active_quests"].get(quest_name)
-            status_text = "Not Started"
-            if quest_status:
-                if quest_status.get("completed", False): # pragma: no cover
-                    status_text = "✅ Completed" # pragma: no cover
-                else:
-                    status_text = "⏳ In Progress" # pragma: no cover
-            
-            # Add section for this quest
-            response_parts.append(f"### {quest_name} ({status_text})\n")
-            
-            # Add required courses with links
-            response_parts.append("**Required Courses:**")
-            for course in quest_data["courses_required"]:
-                link = COURSE_LINKS.get(course, "https://example.com/courses")
-                # Check if user has completed this course
-                completed = course in user_state["completed_courses"]
-                status_icon = "✅ " if completed else ""
-                response_parts.append(f"- {status_icon}[{course}]({link})")
-            
-            # Add rewards info
-            response_parts.append(f"\n**Reward XP:** {quest_data['reward_xp']} XP")
-            response_parts.append(f"**Reward Badge:** {quest_data['reward_badge']}")
-            
-            # Add dynamic note based on quest status
-            if status_text == "Not Started":
-                response_parts.append(f"***Note**: Use `start quest {quest_name}` to start this quest*\n")
-            elif status_text == "⏳ In Progress": # pragma: no cover
-                response_parts.append(f"***Note**: Use `show quest progress` to track your current progress*\n") # pragma: no cover
-            else:  # Completed
-                response_parts.append(f"***Note**: Use `show quests` to see all available quests*\n") # pragma: no cover
-            
-        return "\n".join(response_parts)
+        if not user_state["active_quests"] and not user_state["completed_courses"]:
+            return prerendered["quest_overview"]
+        return render_quest_overview(user_state["active_quests"], user_state["completed_courses"])
     
     # Case-insensitive lookup for a specific quest name
     quest_name_lower = quest_name.lower()
@@ -1015,13 +1774,16 @@ def show_quest_details(user_state, quest_name=None):
     response_parts = [f"# {quest_matched} - Quest Details\n"]
     response_parts.append(f"**Status:** {status_text}")
     
-    # Count completed courses
-    courses_completed = 0
-    for course in quest_data["courses_required"]:
-        if course in user_state["completed_courses"]:
-            courses_completed += 1
+    # Started quests keep their remaining courses up to date; others are counted once here
+    if quest_status:
+        sync_quest_counters(user_state)
+        remaining = quest_status["remaining_courses"]
+    else:
+        completed = set(user_state["completed_courses"])
+        remaining = {course for course in quest_data["courses_required"] if course not in completed}
     
     total_courses = len(quest_data["courses_required"])
+    courses_completed = total_courses - len(remaining)
     progress_percent = (courses_completed / total_courses) * 100 if total_courses > 0 else 0
     
     # Add progress bar
@@ -1046,8 +1808,7 @@ def show_quest_details(user_state, quest_name=None):
     response_parts.append("## Required Courses\n")
     for course in quest_data["courses_required"]:
         link = COURSE_LINKS.get(course, "https://example.com/courses")
-        completed = course in user_state["completed_courses"]
-        status_icon = "✅ " if completed else "⏳ "
+        status_icon = "⏳ " if course in remaining else "✅ "
         response_parts.append(f"- {status_icon}[{course}]({link})")
     
     # Add call to action based on status
@@ -1055,9 +1816,7 @@ def show_quest_details(user_state, quest_name=None):
         response_parts.append(f"\n## 🚀 Ready to begin?")
         response_parts.append(f"Use the command: `start quest {quest_matched}`")
     elif status_text == "⏳ In Progress":
-        remaining_courses = [course for course in quest_data["courses_required"] 
-                            if course not in user_state["completed_courses"]]
-        if remaining_courses:
+        if remaining:
             response_parts.append(f"\n## ⏩ Continue your progress!")
             response_parts.append(f"Complete the remaining courses to finish this quest.")
     else:  # Completed
@@ -1102,6 +1861,7 @@ def show_quest_progress(user_state):
         )
     
     # Build the response showing progress for each in-progress quest
+    sync_quest_counters(user_state)
     response_parts = ["## 📈 Your Quest Progress"]
 
     for quest_name, status in in_progress_quests.items():
@@ -1116,15 +1876,10 @@ def show_quest_progress(user_state):
         # Get required courses for this quest
         required_courses = quest_data["courses_required"]
         
-        # Track completed and remaining courses
-        completed_courses = []
-        remaining_courses = []
-        
-        for course in required_courses:
-            if course in user_state["completed_courses"]:
-                completed_courses.append(course)
-            else:
-                remaining_courses.append(course)
+        # Split required courses using the quest's remaining set
+        remaining = status["remaining_courses"]
+        completed_courses = [course for course in required_courses if course not in remaining]
+        remaining_courses = [course for course in required_courses if course in remaining]
         
         # Calculate progress percentage
         progress_percent = (len(completed_courses) / len(required_courses)) * 100 if required_courses else 0
@@ -1426,142 +2181,254 @@ def show_completed_courses(user_state):
 # 8. COURSE RECOMMENDATION LOGIC
 #########################################
 
+# Canned recommendation per interest; "general" is the catch-all
+RECOMMENDATION_RESPONSES = {
+    "data_science": (
+        f"I see you're interested in Data Science! 🔢\n\n"
+        f"I'd recommend our 🛤️ **'Data Science Fundamentals'** learning path which includes:\n"
+        f"- **'Python for Everybody'** - A perfect starting point for data analysis\n"
+        f"- **'Intro to Data Science'** - Learn essential data concepts\n"
+        f"- **'Machine Learning Basics'** - Explore AI fundamentals\n\n"
+        f"You might also enjoy our 🎯 **'Machine Learning Apprentice'** quest which rewards you with XP and a special badge upon completion!\n\n"
+        f"**Helpful commands:**\n"
+        f"- Use `show learning path details Data Science Fundamentals` for the **full curriculum**\n"
+        f"- Use `start learning path Data Science Fundamentals` to begin **right away**\n"
+        f"- Use `show quests` to see **related data science quests**\n\n"
+        f"Would you like to start one of these courses or see more options?"
+    ),
+    "cybersecurity": (
+        f"Great choice! Cybersecurity is an exciting field! 🔐\n\n"
+        f"I recommend our **'Cyber Security 101'** learning path which includes:\n"
+        f"- **'Intro to Cybersecurity'** - Learn fundamental concepts\n"
+        f"- **'CIA Triad'** - Understand the core principles of information security\n"
+        f"- **'Network Security Essentials'** - Protect systems from threats\n\n"
+        f"We also have specialized paths like **'Cryptography Explorer'** and **'Web Hacking Initiate'** quests that can earn you badges and XP!\n\n"
+        f"**Helpful commands:**\n"
+        f"- Use `show learning path details Cyber Security 101` to see **all chapters**\n"
+        f"- Use `start learning path Cyber Security 101` to begin your **security journey**\n"
+        f"- Use `show cybersecurity courses` for **all security-related courses**\n\n"
+        f"Would you like to explore any of these options, or would you prefer something more advanced?"
+    ),
+    "web_development": (
+        f"Web development is a fantastic choice! 💻\n\n"
+        f"Our **'Web Fundamentals'** learning path is perfect for you with courses like:\n"
+        f"- **'Introduction to HTML'** - Build the structure of websites\n"
+        f"- **'Introduction to CSS'** - Create beautiful designs\n"
+        f"- **'Introduction to JavaScript'** - Add interactivity to your sites\n\n"
+        f"The **'Web Developer Starter'** quest is also great for beginners and rewards you with a special badge!\n\n"
+        f"**Helpful commands:**\n"
+        f"- Use `show learning path details Web Fundamentals` to explore the **full curriculum**\n" 
+        f"- Use `start learning path Web Fundamentals` to begin coding **right away**\n"
+        f"- Use `start quest Web Developer Starter` to earn your **first web development badge**\n\n"
+        f"Ready to start building awesome websites? Which of these interests you most?"
+    ),
+    "business": (
+        f"Business and management skills are always valuable! 📊\n\n"
+        f"I recommend our **'Management 101'** learning path which covers:\n"
+        f"- **'Introduction to Business'** - Understand core business concepts\n"
+        f"- **'Introduction to Management'** - Learn effective leadership skills\n"
+        f"- **'Introduction to Business Strategy'** - Develop strategic thinking\n\n"
+        f"The **'Business Management Foundation'** quest can help you earn extra XP and a professional badge!\n\n"
+        f"**Helpful commands:**\n"
+        f"- Use `show learning path details Management 101` to see the **full curriculum**\n"
+        f"- Use `start learning path Management 101` to begin your **management journey**\n"
+        f"- Use `show business management courses` for **all related courses**\n\n"
+        f"Would you like to focus on a specific aspect of business management?"
+    ),
+    "linux": (
+        f"Linux skills are highly sought after! 🐧\n\n"
+        f"Check out these courses from our **'Cyber Security 101'** path:\n"
+        f"- **'Linux Fundamentals - Part 1'** - Learn basic commands\n"
+        f"- **'Linux Fundamentals - Part 2'** - Explore system management\n"
+        f"- **'Linux Fundamentals - Part 3'** - Master advanced techniques\n\n"
+        f"These skills will give you a solid foundation for many tech careers!\n\n"
+        f"**Helpful commands:**\n"
+        f"- Use `show learning path details Cyber Security 101` to see the **full curriculum**\n"
+        f"- Use `start learning path Cyber Security 101` to begin **learning Linux**\n"
+        f"- Use `completed course 'Linux Fundamentals - Part 1'` after finishing a course\n\n"
+        f"Would you like to start with Linux basics or do you have some experience already?"
+    ),
+    "networking": (
+        f"Networking is a critical field in IT! 🌐\n\n"
+        f"From our **'Cyber Security 101'** path, I recommend:\n"
+        f"- **'Networking Fundamentals'** - Understand how networks function\n"
+        f"- **'IP Addressing & Subnetting'** - Master IP management\n"
+        f"- **'Core Networking Protocols'** - Learn how devices communicate\n\n"
+        f"The **'Network Security Novice'** quest would be perfect for building your skills!\n\n"
+        f"**Helpful commands:**\n"
+        f"- Use `show learning path details Cyber Security 101` to explore **networking modules**\n"
+        f"- Use `start quest Network Security Novice` to begin the **networking quest**\n"
+        f"- Use `show trending courses` to see **popular networking courses**\n\n"
+        f"Would you like to focus on basic networking or network security aspects?"
+    ),
+    "beginner": (
+        f"Exciting to see you starting a new journey in tech! 🤖\n\n"
+        f"For beginners, I recommend:\n"
+        f"- **'Web Fundamentals'** learning path - Friendly introduction to web technologies\n"
+        f"- **'Cyber Security 101'** - Start with 'Basic Terminologies' course\n"
+        f"- **'Python for Everybody'** - Great first programming language\n\n"
+        f"All these paths are marked as beginner-friendly and will help you build confidence!\n\n"
+        f"**Helpful commands:**\n"
+        f"- Use `list learning paths` to see **all available learning journeys**\n"
+        f"- Use `show profile` to **track your progress** as you learn\n"
+        f"- Use `daily challenge` for a quick way to **earn XP every day**\n\n"
+        f"Do any of these areas spark your interest? I can recommend specific starting points."
+    ),
+    "general": (
+        f"I'd love to help you find the perfect courses! 😊\n\n"
+        f"We have several popular learning paths 🛤️:\n"
+        f"- **'Cyber Security 101'** - Explore the world of digital security\n"
+        f"- **'Data Science Fundamentals'** - Learn to analyze data and build models\n"
+        f"- **'Web Fundamentals'** - Create websites and web applications\n"
+        f"- **'Management 101'** - Develop essential business leadership skills\n\n"
+        f"**Helpful commands:**\n"
+        f"- Use `list learning paths` to see **all learning paths with details**\n"
+        f"- Use `show courses` to browse **all available courses**\n"
+        f"- Use `show trending courses` to see **what's popular right now**\n"
+        f"- Use `help all` for a list of **all available commands** for **every feature**\n\n"
+        f"What topics are you most interested in exploring today?"
+    ),
+}
+
+# The original keyword rules, checked in order (single words as whole words, see
+# any_keyword_in_text()). Kept as the fallback when no intent model is available and
+# as the baseline it is measured against.
+KEYWORD_INTENT_RULES = [
+    ("data_science", ["data science", "machine learning", "ai"]),
+    ("cybersecurity", ["cybersecurity", "security", "hacking", "network security"]),
+    ("web_development", ["web", "website", "websites", "html", "css", "javascript", "web development"]),
+    ("business", ["business", "management", "leadership", "strategy"]),
+    ("linux", ["linux", "operating system", "os"]),
+    ("networking", ["network", "networks", "networking", "cisco", "routing"]),
+    ("beginner", ["career change", "beginner", "beginners", "starting out", "new to"]),
+]
+
+def classify_intent_by_keywords(user_message):
+    message = parse_message(user_message)
+    for intent, keywords in KEYWORD_INTENT_RULES:
+        if any_keyword_in_text(message, keywords):
+            return intent
+    return "general"
+
+# TF-IDF + multinomial logistic regression over the intents above, trained offline by
+# train_intent_model.py and stored as a NumPy .npz file. Loaded on first use; if it
+# is missing, get_recommendation() falls back to KEYWORD_INTENT_RULES.
+INTENT_MODEL_PATH = os.environ.get(
+    "INTENT_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_model.npz")
+)
+# Messages the model isn't this sure about get the catch-all reply
+INTENT_MIN_CONFIDENCE = 0.25
+
+intent_model = None
+intent_model_loaded = False
+
+def intent_terms(user_message):
+    """
+    Terms of a message as used by the intent model's vocabulary: words, word
+    bigrams and the 3-5 character n-grams of each word (so "network" and
+    "networking" share evidence).
+    """
+    tokens = [token for token, _, _ in parse_message(user_message).tokens]
+    terms = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f"<{token}>"
+        for size in range(3, 6):
+            terms.extend(padded[i:i + size] for i in range(len(padded) - size + 1))
+    return terms
+
+def intent_tfidf_entries(vocabulary, idf, messages):
+    """
+    Sparse L2-normalized TF-IDF of `messages` with sublinear term frequencies, as
+    (rows, cols, values) arrays sorted by row. Terms outside the vocabulary are ignored.
+    """
+    flat = []
+    for row, message in enumerate(messages):
+        offset = row * len(vocabulary)
+        for term in intent_terms(message):
+            col = vocabulary.get(term)
+            if col is not None:
+                flat.append(offset + col)
+    
+    # Count each (row, col) pair once; np.unique also sorts the entries by row
+    positions, counts = np.unique(np.asarray(flat, dtype=np.int64), return_counts=True)
+    rows, cols = np.divmod(positions, len(vocabulary))
+    values = np.log1p(counts).astype(np.float32) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=len(messages)))
+    return rows, cols, (values / norms[rows]).astype(np.float32)
+
+def vectorize_intent_messages(vocabulary, idf, messages):
+    """Dense (messages x vocabulary) TF-IDF matrix of `messages`, e.g. for training."""
+    rows, cols, values = intent_tfidf_entries(vocabulary, idf, messages)
+    matrix = np.zeros((len(messages), len(vocabulary)), dtype=np.float32)
+    matrix[rows, cols] = values
+    return matrix
+
+def load_intent_model(path=None):
+    """Load an intent model saved by train_intent_model.py; None if the file is missing."""
+    path = path or INTENT_MODEL_PATH
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        terms = data["terms"].tolist()
+        return {
+            "intents": data["intents"].tolist(),
+            "vocabulary": {term: idx for idx, term in enumerate(terms)},
+            "idf": data["idf"],
+            "weights": data["weights"],
+            "bias": data["bias"],
+        }
+
+def get_intent_model():
+    """Return the intent model, loading it on first use."""
+    global intent_model, intent_model_loaded
+    if not intent_model_loaded:
+        intent_model = load_intent_model()
+        intent_model_loaded = True
+    return intent_model
+
+def classify_intents(messages, model=None):
+    """
+    Classify a batch of messages in one vectorized pass.
+    Returns a list of (intent, confidence) pairs.
+    """
+    model = model or get_intent_model()
+    rows, cols, values = intent_tfidf_entries(model["vocabulary"], model["idf"], messages)
+    
+    # Sparse product: sum each message's weighted rows of the weight matrix
+    scores = np.tile(model["bias"], (len(messages), 1))
+    known = np.zeros(len(messages), dtype=bool)
+    if len(rows):
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        scores[rows[starts]] += np.add.reduceat(values[:, None] * model["weights"][cols], starts, axis=0)
+        known[rows[starts]] = True
+    
+    scores -= scores.max(axis=1, keepdims=True)
+    probabilities = np.exp(scores)
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    
+    best = probabilities.argmax(axis=1)
+    confidence = probabilities[np.arange(len(messages)), best]
+    # Messages with no known term carry no evidence either way
+    return [
+        (model["intents"][idx] if known[row] and confidence[row] >= INTENT_MIN_CONFIDENCE else "general",
+         float(confidence[row]))
+        for row, idx in enumerate(best)
+    ]
+
+def classify_intent(user_message):
+    model = get_intent_model()
+    if model is None:
+        return classify_intent_by_keywords(user_message)
+    return classify_intents([user_message], model)[0][0]
+
 def get_recommendation(user_message: str) -> str:
     """
     Provides personalized course recommendations based on the user's interests,
     suggesting relevant learning paths and courses from the existing catalog.
     Also includes helpful command suggestions for users to explore further.
+    Accepts the message as a string or an already parsed ParsedMessage.
     """
-    user_message_lower = user_message.lower()
-    
-    # Data Science / Machine Learning interests
-    if "data science" in user_message_lower or "machine learning" in user_message_lower or "ai" in user_message_lower:
-        return (
-            f"I see you're interested in Data Science! 🔢\n\n"
-            f"I'd recommend our 🛤️ **'Data Science Fundamentals'** learning path which includes:\n"
-            f"- **'Python for Everybody'** - A perfect starting point for data analysis\n"
-            f"- **'Intro to Data Science'** - Learn essential data concepts\n"
-            f"- **'Machine Learning Basics'** - Explore AI fundamentals\n\n"
-            f"You might also enjoy our 🎯 **'Machine Learning Apprentice'** quest which rewards you with XP and a special badge upon completion!\n\n"
-            f"**Helpful commands:**\n"
-            f"- Use `show learning path details Data Science Fundamentals` for the **full curriculum**\n"
-            f"- Use `start learning path Data Science Fundamentals` to begin **right away**\n"
-            f"- Use `show quests` to see **related data science quests**\n\n"
-            f"Would you like to start one of these courses or see more options?"
-        )
-    
-    # Cybersecurity interests
-    elif "cybersecurity" in user_message_lower or "security" in user_message_lower or "hacking" in user_message_lower or "network security" in user_message_lower:
-        return (
-            f"Great choice! Cybersecurity is an exciting field! 🔐\n\n"
-            f"I recommend our **'Cyber Security 101'** learning path which includes:\n"
-            f"- **'Intro to Cybersecurity'** - Learn fundamental concepts\n"
-            f"- **'CIA Triad'** - Understand the core principles of information security\n"
-            f"- **'Network Security Essentials'** - Protect systems from threats\n\n"
-            f"We also have specialized paths like **'Cryptography Explorer'** and **'Web Hacking Initiate'** quests that can earn you badges and XP!\n\n"
-            f"**Helpful commands:**\n"
-            f"- Use `show learning path details Cyber Security 101` to see **all chapters**\n"
-            f"- Use `start learning path Cyber Security 101` to begin your **security journey**\n"
-            f"- Use `show cybersecurity courses` for **all security-related courses**\n\n"
-            f"Would you like to explore any of these options, or would you prefer something more advanced?"
-        )
-    
-    # Web Development interests
-    elif "web" in user_message_lower or "html" in user_message_lower or "css" in user_message_lower or "javascript" in user_message_lower or "web development" in user_message_lower:
-        return (
-            f"Web development is a fantastic choice! 💻\n\n"
-            f"Our **'Web Fundamentals'** learning path is perfect for you with courses like:\n"
-            f"- **'Introduction to HTML'** - Build the structure of websites\n"
-            f"- **'Introduction to CSS'** - Create beautiful designs\n"
-            f"- **'Introduction to JavaScript'** - Add interactivity to your sites\n\n"
-            f"The **'Web Developer Starter'** quest is also great for beginners and rewards you with a special badge!\n\n"
-            f"**Helpful commands:**\n"
-            f"- Use `show learning path details Web Fundamentals` to explore the **full curriculum**\n" 
-            f"- Use `start learning path Web Fundamentals` to begin coding **right away**\n"
-            f"- Use `start quest Web Developer Starter` to earn your **first web development badge**\n\n"
-            f"Ready to start building awesome websites? Which of these interests you most?"
-        )
-    
-    # Business/Management interests
-    elif "business" in user_message_lower or "management" in user_message_lower or "leadership" in user_message_lower or "strategy" in user_message_lower:
-        return (
-            f"Business and management skills are always valuable! 📊\n\n"
-            f"I recommend our **'Management 101'** learning path which covers:\n"
-            f"- **'Introduction to Business'** - Understand core business concepts\n"
-            f"- **'Introduction to Management'** - Learn effective leadership skills\n"
-            f"- **'Introduction to Business Strategy'** - Develop strategic thinking\n\n"
-            f"The **'Business Management Foundation'** quest can help you earn extra XP and a professional badge!\n\n"
-            f"**Helpful commands:**\n"
-            f"- Use `show learning path details Management 101` to see the **full curriculum**\n"
-            f"- Use `start learning path Management 101` to begin your **management journey**\n"
-            f"- Use `show business management courses` for **all related courses**\n\n"
-            f"Would you like to focus on a specific aspect of business management?"
-        )
-    
-    # Linux/Operating Systems
-    elif "linux" in user_message_lower or "operating system" in user_message_lower or "os" in user_message_lower:
-        return (
-            f"Linux skills are highly sought after! 🐧\n\n"
-            f"Check out these courses from our **'Cyber Security 101'** path:\n"
-            f"- **'Linux Fundamentals - Part 1'** - Learn basic commands\n"
-            f"- **'Linux Fundamentals - Part 2'** - Explore system management\n"
-            f"- **'Linux Fundamentals - Part 3'** - Master advanced techniques\n\n"
-            f"These skills will give you a solid foundation for many tech careers!\n\n"
-            f"**Helpful commands:**\n"
-            f"- Use `show learning path details Cyber Security 101` to see the **full curriculum**\n"
-            f"- Use `start learning path Cyber Security 101` to begin **learning Linux**\n"
-            f"- Use `completed course 'Linux Fundamentals - Part 1'` after finishing a course\n\n"
-            f"Would you like to start with Linux basics or do you have some experience already?"
-        )
-    
-    # Networking
-    elif "network" in user_message_lower or "cisco" in user_message_lower or "routing" in user_message_lower:
-        return (
-            f"Networking is a critical field in IT! 🌐\n\n"
-            f"From our **'Cyber Security 101'** path, I recommend:\n"
-            f"- **'Networking Fundamentals'** - Understand how networks function\n"
-            f"- **'IP Addressing & Subnetting'** - Master IP management\n"
-            f"- **'Core Networking Protocols'** - Learn how devices communicate\n\n"
-            f"The **'Network Security Novice'** quest would be perfect for building your skills!\n\n"
-            f"**Helpful commands:**\n"
-            f"- Use `show learning path details Cyber Security 101` to explore **networking modules**\n"
-            f"- Use `start quest Network Security Novice` to begin the **networking quest**\n"
-            f"- Use `show trending courses` to see **popular networking courses**\n\n"
-            f"Would you like to focus on basic networking or network security aspects?"
-        )
-    
-    # Career change/beginners
-    elif "career change" in user_message_lower or "beginner" in user_message_lower or "starting out" in user_message_lower or "new to" in user_message_lower:
-        return (
-            f"Exciting to see you starting a new journey in tech! 🤖\n\n"
-            f"For beginners, I recommend:\n"
-            f"- **'Web Fundamentals'** learning path - Friendly introduction to web technologies\n"
-            f"- **'Cyber Security 101'** - Start with 'Basic Terminologies' course\n"
-            f"- **'Python for Everybody'** - Great first programming language\n\n"
-            f"All these paths are marked as beginner-friendly and will help you build confidence!\n\n"
-            f"**Helpful commands:**\n"
-            f"- Use `list learning paths` to see **all available learning journeys**\n"
-            f"- Use `show profile` to **track your progress** as you learn\n"
-            f"- Use `daily challenge` for a quick way to **earn XP every day**\n\n"
-            f"Do any of these areas spark your interest? I can recommend specific starting points."
-        )
-    
-    # Catch-all for other or unclear interests
-    else:
-        return (
-            f"I'd love to help you find the perfect courses! 😊\n\n"
-            f"We have several popular learning paths 🛤️:\n"
-            f"- **'Cyber Security 101'** - Explore the world of digital security\n"
-            f"- **'Data Science Fundamentals'** - Learn to analyze data and build models\n"
-            f"- **'Web Fundamentals'** - Create websites and web applications\n"
-            f"- **'Management 101'** - Develop essential business leadership skills\n\n"
-            f"**Helpful commands:**\n"
-            f"- Use `list learning paths` to see **all learning paths with details**\n"
-            f"- Use `show courses` to browse **all available courses**\n"
-            f"- Use `show trending courses` to see **what's popular right now**\n"
-            f"- Use `help all` for a list of **all available commands** for **every feature**\n\n"
-            f"What topics are you most interested in exploring today?"
-        )
+    return RECOMMENDATION_RESPONSES[classify_intent(user_message)]
 
 #########################################
 # 9. COURSE RATING FUNCTIONALITY
@@ -1652,9 +2519,15 @@ def process_course_completion(user_state, course_name) -> Tuple[str, Optional[st
     
     if not existing_course:
         # Add the matched course name (with correct capitalization) to completed courses
+        record_co_completion(matched_course_name, user_state["completed_courses"])
         user_state["completed_courses"].append(matched_course_name)
+        record_fact_change(user_state, f"course:{matched_course_name}")
+        bump_state_version(user_state)
+        sync_quest_counters(user_state)
+        sync_path_progress(initialize_learning_paths_in_user_state(user_state))
+        sync_next_steps(user_state)
         base_xp = 50
-        user_state["xp"] += base_xp
+        grant_xp(user_state, base_xp, XP_EVENT_COURSE_COMPLETION)
         
         # Add flag to check learning path progress
         user_state["pending_notifications"]["learning_path_check_needed"] = True
@@ -1753,6 +2626,13 @@ def get_course_categories():
     }
 
 def format_course_list():
+    """
+    Returns the formatted string of all available courses by category, prerendered
+    at startup by render_course_list().
+    """
+    return prerendered["course_list"]
+
+def render_course_list():
     """
     Creates a formatted string of all available courses by category.
     """
@@ -1788,9 +2668,11 @@ def rate_course(user_state, course_name, rating_str):
         
         course_ratings[matched_course]["total_rating"] += rating
         course_ratings[matched_course]["num_ratings"] += 1
+        global course_ratings_version
+        course_ratings_version += 1
 
         feedback_xp = 10
-        user_state["xp"] += feedback_xp
+        grant_xp(user_state, feedback_xp, XP_EVENT_COURSE_RATING)
 
         return (
             f"🙌 Thank you for rating **'{matched_course}'** **{rating}/5** stars!"
@@ -1825,6 +2707,68 @@ def initialize_learning_paths_in_user_state(user_state):
         user_state["learning_paths_progress"] = {}
     return user_state
 
+# Each started path's status keeps "chapter_course_counts" (completed courses per
+# chapter), "courses_completed", "total_courses" and "hours_invested", updated as
+# courses are completed so the progress views only have to format them.
+path_course_index = {}     # course -> [(path name, chapter index), ...]
+
+def compile_path_course_index():
+    """(Re)build the course -> path chapters index. Call after editing LEARNING_PATHS."""
+    path_course_index.clear()
+    for path_name, path_data in LEARNING_PATHS.items():
+        for chapter_idx, chapter in enumerate(path_data["chapters"]):
+            for course in chapter["courses"]:
+                path_course_index.setdefault(course, []).append((path_name, chapter_idx))
+
+def update_path_hours(path_status, path_data):
+    """Estimate hours invested from the share of the path's courses completed."""
+    total_courses = path_status["total_courses"]
+    path_status["hours_invested"] = (
+        path_status["courses_completed"] / total_courses * path_data["estimated_hours"] if total_courses > 0 else 0
+    )
+
+def init_path_progress(user_state, path_name, completed=None):
+    """Count a started path's completed courses from scratch."""
+    if completed is None:
+        completed = set(user_state["completed_courses"])
+    path_status = user_state["learning_paths_progress"][path_name]
+    path_data = LEARNING_PATHS[path_name]
+    
+    path_status["chapter_course_counts"] = [
+        sum(1 for course in chapter["courses"] if course in completed) for chapter in path_data["chapters"]
+    ]
+    path_status["courses_completed"] = sum(path_status["chapter_course_counts"])
+    path_status["total_courses"] = sum(len(chapter["courses"]) for chapter in path_data["chapters"])
+    update_path_hours(path_status, path_data)
+
+def sync_path_progress(user_state):
+    """
+    Apply courses completed since the last sync to every started path's progress.
+    Falls back to a full recount if completed_courses was replaced or shrank.
+    """
+    paths_progress = user_state["learning_paths_progress"]
+    new_courses = take_new_completions(user_state, "path_progress_cursor")
+    
+    if new_courses is None:
+        completed = set(user_state["completed_courses"])
+        for path_name in paths_progress:
+            init_path_progress(user_state, path_name, completed)
+        return
+    
+    for course in new_courses:
+        for path_name, chapter_idx in path_course_index.get(course, ()):
+            path_status = paths_progress.get(path_name)
+            if path_status and "chapter_course_counts" in path_status:
+                path_status["chapter_course_counts"][chapter_idx] += 1
+                path_status["courses_completed"] += 1
+                update_path_hours(path_status, LEARNING_PATHS[path_name])
+    # Paths started without going through start_learning_path() have no counts yet
+    for path_name, path_status in paths_progress.items():
+        if "chapter_course_counts" not in path_status:
+            init_path_progress(user_state, path_name)
+
+compile_path_course_index()
+
 def start_learning_path(user_state, path_name):
     """
     Start a learning path for the user if it exists.
@@ -1964,6 +2908,8 @@ def start_learning_path(user_state, path_name):
         "chapters_completed": [],
         "completed": False
     }
+    bump_state_version(user_state)
+    sync_path_progress(user_state)
 
     path_data = LEARNING_PATHS[path_matched]
     first_chapter = path_data["chapters"][0]
@@ -2250,6 +3196,8 @@ def show_learning_path_progress(user_state, path_name=None):
     # Initialize if needed
     user_state = initialize_learning_paths_in_user_state(user_state)
     
+    sync_path_progress(user_state)
+    
     # If no path_name provided, show summary of all in-progress paths
     if not path_name:
         in_progress = []
@@ -2276,19 +3224,11 @@ def show_learning_path_progress(user_state, path_name=None):
                 filled_length = int(progress_bar_length * (progress_percent / 100))
                 bar = '🟩' * filled_length + '⬜' * (progress_bar_length - filled_length)
                 
-                # Calculate courses completed
-                completed_courses = 0
-                total_courses = 0
-                for chapter in path_data["chapters"]:
-                    total_courses += len(chapter["courses"])
-                    for course in chapter["courses"]:
-                        if course in user_state["completed_courses"]:
-                            completed_courses += 1
-                
-                # Calculate time invested and remaining (based on estimated hours)
-                total_time = path_data["estimated_hours"]
-                time_invested = (completed_courses / total_courses) * total_time if total_courses > 0 else 0
-                time_remaining = total_time - time_invested
+                # Courses completed and time invested are kept up to date by sync_path_progress()
+                completed_courses = status["courses_completed"]
+                total_courses = status["total_courses"]
+                time_invested = status["hours_invested"]
+                time_remaining = path_data["estimated_hours"] - time_invested
                 
                 # Store all this information for sorting and display
                 in_progress.append({
@@ -2397,17 +3337,9 @@ def show_learning_path_progress(user_state, path_name=None):
     filled_length = int(progress_bar_length * (progress_percent / 100))
     overall_bar = '🟩' * filled_length + '⬜' * (progress_bar_length - filled_length)
     
-    # Count completed courses across the entire path
-    completed_courses = 0
-    total_courses = 0
-    
-    for chapter in path_data["chapters"]:
-        chapter_courses = chapter["courses"]
-        total_courses += len(chapter_courses)
-        for course in chapter_courses:
-            if course in user_state["completed_courses"]:
-                completed_courses += 1
-    
+    # Completed courses across the entire path
+    completed_courses = path_status["courses_completed"]
+    total_courses = path_status["total_courses"]
     course_percent = (completed_courses / total_courses) * 100 if total_courses > 0 else 0
     
     # Create progress bar for course completion
@@ -2416,19 +3348,17 @@ def show_learning_path_progress(user_state, path_name=None):
     course_filled_length = int(progress_bar_length * (course_percent / 100))
     course_bar = '🟩' * course_filled_length + '⬜' * (progress_bar_length - course_filled_length)
     
-    # Calculate estimated time metrics
-    total_time = path_data["estimated_hours"]
-    time_invested = (course_percent / 100) * total_time
-    time_remaining = total_time - time_invested
+    # Estimated time metrics
+    time_invested = path_status["hours_invested"]
+    time_remaining = path_data["estimated_hours"] - time_invested
     
     # If current chapter exists
     if current_chapter_idx < total_chapters:
         current_chapter = path_data["chapters"][current_chapter_idx]
         
         # Calculate current chapter progress
-        chapter_courses = current_chapter["courses"]
-        chapter_completed_courses = sum(1 for course in chapter_courses if course in user_state["completed_courses"])
-        chapter_total_courses = len(chapter_courses)
+        chapter_completed_courses = path_status["chapter_course_counts"][current_chapter_idx]
+        chapter_total_courses = len(current_chapter["courses"])
         chapter_percent = (chapter_completed_courses / chapter_total_courses) * 100 if chapter_total_courses > 0 else 0
         
         # Create progress bar for current chapter
@@ -2523,6 +3453,8 @@ def check_chapter_completion(user_state, path_name=None):
             if status and not status.get("completed", False):
                 paths_to_check.append(p_name)
     
+    completed_mask = completed_courses_mask(user_state)
+    
     # Check each path
     for path_name in paths_to_check:
         path_status = user_state["learning_paths_progress"][path_name]
@@ -2532,69 +3464,85 @@ def check_chapter_completion(user_state, path_name=None):
             continue # pragma: no cover
             
         path_data = LEARNING_PATHS[path_name]
-        current_chapter_idx = path_status.get("current_chapter", 0)
+        chapters = path_data["chapters"]
+        start_chapter_idx = path_status.get("current_chapter", 0)
         
         # Make sure we're still within the path's chapters
-        if current_chapter_idx >= len(path_data["chapters"]):
+        if start_chapter_idx >= len(chapters):
             continue
-            
-        current_chapter = path_data["chapters"][current_chapter_idx]
-        
-        # Check if all courses in the current chapter are completed
-        all_completed = all(course in user_state["completed_courses"] for course in current_chapter["courses"])
         
-        if all_completed:
-            # Mark this chapter as completed if not already
-            chapters_completed = path_status.get("chapters_completed", [])
-            if current_chapter_idx not in chapters_completed:
-                chapters_completed.append(current_chapter_idx)
-                path_status["chapters_completed"] = chapters_completed
-                
-                # Award XP for chapter completion
-                chapter_reward_xp = 50  # Base XP for completing a chapter
-                user_state["xp"] += chapter_reward_xp
-                
-                # Create chapter completion message
+        # Cascade through every consecutive chapter whose courses are all completed
+        chapters_completed = path_status.get("chapters_completed", [])
+        newly_completed = []
+        next_chapter_idx = start_chapter_idx
+        while next_chapter_idx < len(chapters) and not chapter_mask(path_name, next_chapter_idx) & ~completed_mask:
+            if next_chapter_idx not in chapters_completed:
+                chapters_completed.append(next_chapter_idx)
+                newly_completed.append(next_chapter_idx)
+            next_chapter_idx += 1
+        
+        if next_chapter_idx == start_chapter_idx:
+            continue
+        path_status["chapters_completed"] = chapters_completed
+        
+        if newly_completed:
+            bump_state_version(user_state)
+            # Award XP for each chapter completion
+            chapter_reward_xp = 50  # Base XP for completing a chapter
+            for _ in newly_completed:
+                grant_xp(user_state, chapter_reward_xp, XP_EVENT_CHAPTER_COMPLETION)
+            
+            # One consolidated completion message for all chapters finished in this pass
+            if len(newly_completed) == 1:
+                chapter_idx = newly_completed[0]
                 completion_message = (
-                    f"🎉 You've completed Chapter **{current_chapter_idx + 1}**: **'{current_chapter['title']}'**"
+                    f"🎉 You've completed Chapter **{chapter_idx + 1}**: **'{chapters[chapter_idx]['title']}'**"
                     f"in the **'{path_name}'** learning path!\n"
                     f"You earned **{chapter_reward_xp} XP** for completing this chapter!"
                 )
-                messages.append(completion_message)
-                
-            # Move to the next chapter
-            next_chapter_idx = current_chapter_idx + 1
-            
-            # If there are more chapters, advance to the next one
-            if next_chapter_idx < len(path_data["chapters"]):
-                path_status["current_chapter"] = next_chapter_idx
-                next_chapter = path_data["chapters"][next_chapter_idx]
-                
-                # Create course links for the next chapter
-                course_links = []
-                # Only show up to 3 courses in the message to avoid very long messages for chapters with many courses
-                show_courses = next_chapter["courses"][:3]
-                more_courses = len(next_chapter["courses"]) > 3
-                
-                for course in show_courses:
-                    link = COURSE_LINKS.get(course, "https://example.com/courses")
-                    completed = "✅ " if course in user_state["completed_courses"] else ""
-                    course_links.append(f"- {completed}[{course}]({link})")
-                
-                # Add note if there are more courses not shown
-                if more_courses:
-                    course_links.append(f"- ...and {len(next_chapter['courses']) - 3} more courses")
-                
-                # Create a separate message for the next chapter
-                next_chapter_message = (
-                    f"🚩 Next chapter unlocked: **'{next_chapter['title']}'**\n"
-                    f"{next_chapter['description']}\n\n"
-                    f"**Required Courses:** (showing {len(show_courses)} of {len(next_chapter['courses'])})\n"
-                    f"{chr(10).join(course_links)}\n\n"
-                    f"Use `show learning path progress` to see **all required courses**."
+            else:
+                chapter_lines = "\n".join(
+                    f"- Chapter **{chapter_idx + 1}**: **'{chapters[chapter_idx]['title']}'**" for chapter_idx in newly_completed
                 )
-                messages.append(next_chapter_message)
-    
+                completion_message = (
+                    f"🎉 You've completed **{len(newly_completed)}** chapters in the **'{path_name}'** learning path!\n"
+                    f"{chapter_lines}\n"
+                    f"You earned **{chapter_reward_xp * len(newly_completed)} XP** for completing these chapters!"
+                )
+            messages.append(completion_message)
+        
+        # Stay on the last chapter once every chapter is done
+        path_status["current_chapter"] = min(next_chapter_idx, len(chapters) - 1)
+        
+        # If there are more chapters, show the one the user advanced to
+        if next_chapter_idx < len(chapters):
+            next_chapter = chapters[next_chapter_idx]
+            
+            # Create course links for the next chapter
+            course_links = []
+            # Only show up to 3 courses in the message to avoid very long messages for chapters with many courses
+            show_courses = next_chapter["courses"][:3]
+            more_courses = len(next_chapter["courses"]) > 3
+            
+            for course in show_courses:
+                link = COURSE_LINKS.get(course, "https://example.com/courses")
+                completed = "✅ " if course in user_state["completed_courses"] else ""
+                course_links.append(f"- {completed}[{course}]({link})")
+            
+            # Add note if there are more courses not shown
+            if more_courses:
+                course_links.append(f"- ...and {len(next_chapter['courses']) - 3} more courses")
+            
+            # Create a separate message for the next chapter
+            next_chapter_message = (
+                f"🚩 Next chapter unlocked: **'{next_chapter['title']}'**\n"
+                f"{next_chapter['description']}\n\n"
+                f"**Required Courses:** (showing {len(show_courses)} of {len(next_chapter['courses'])})\n"
+                f"{chr(10).join(course_links)}\n\n"
+                f"Use `show learning path progress` to see **all required courses**."
+            )
+            messages.append(next_chapter_message)
+
     # If no messages were generated, provide a status update
     if not messages:
         available_courses = []
@@ -2663,12 +3611,14 @@ def check_learning_path_completion(user_state):
         if len(chapters_completed) == total_chapters:
             # Mark the path as completed
             path_status["completed"] = True
+            record_fact_change(user_state, f"path:{path_name}")
+            bump_state_version(user_state)
             
             # Award XP and badge
             reward_xp = path_data["completion_reward_xp"]
             reward_badge = path_data["completion_reward_badge"]
             
-            user_state["xp"] += reward_xp
+            grant_xp(user_state, reward_xp, XP_EVENT_PATH_COMPLETION)
             
             # Add the badge if not already earned
             if reward_badge not in user_state["badges"]:
@@ -2684,176 +3634,409 @@ def check_learning_path_completion(user_state):
     
     return messages
 
-def detect_learning_path_commands(user_message, user_state):
+def find_mentioned_path(user_message_lower):
+    """Return the first learning path named in the message, or None."""
+    for p_name in LEARNING_PATHS.keys():
+        if p_name.lower() in user_message_lower:
+            return p_name
+    return None
+
+def find_path_for_details(message):
     """
-    Detects and handles learning path related commands in the user message.
-    Returns the appropriate response or None if no learning path command is detected.
+    Find the learning path a "details" request (a ParsedMessage) is about: a path
+    named anywhere in the message, or one named after a path/details keyword.
     """
-    # Initialize learning_paths_progress if needed
-    user_state = initialize_learning_paths_in_user_state(user_state)
+    path_name = find_mentioned_path(message.casefolded)
+    if path_name:
+        return path_name
+    
+    for keyword in PATH_SYNONYMS + PATH_DETAILS_SYNONYMS:
+        if keyword in message.casefolded:
+            remainder = extract_after_keyword(message, [keyword])
+            if remainder.strip():
+                # Check if this remainder matches any path
+                for p_name in LEARNING_PATHS.keys():
+                    if p_name.lower() in remainder.lower():
+                        return p_name # pragma: no cover
+    return None
+
+def prompt_for_learning_path(user_state):
+    """Ask which learning path to start, listing the ones still available."""
+    user_state["pending_action"] = "start_learning_path"
     
-    user_message_lower = user_message.lower().strip()
-    
-    # Keywords for command detection
-    start_synonyms = ["start", "begin", "kick off", "go ahead with", "undertake", "embark on"]
-    list_synonyms = ["list", "show", "display", "view", "see", "what are"]
-    check_synonyms = ["check", "update", "verify", "look at"]
-    progress_synonyms = ["progress", "status", "advancement", "development"]
-    details_synonyms = ["details", "information", "description", "info", "courses", "explain", "tell me more about"]
-    path_synonyms = ["learning path", "learning paths", "path", "paths", "learning journey", "journey"]
-    
-    # FIX: Check for the PROGRESS command FIRST before more general commands
-    # 3. Show Learning Path Progress command
-    if ((any_keyword_in_text(user_message_lower, list_synonyms + check_synonyms) and
-         any_keyword_in_text(user_message_lower, progress_synonyms) and
-         any_keyword_in_text(user_message_lower, path_synonyms)) or
-        # Special case for "show learning path progress"
-        "show learning path progress" in user_message_lower):
-        
-        # Check if a specific path was mentioned
-        path_name = None
-        for p_name in LEARNING_PATHS.keys():
-            if p_name.lower() in user_message_lower:
-                path_name = p_name # pragma: no cover
-                break # pragma: no cover
-        
-        return show_learning_path_progress(user_state, path_name)
+    # Get available paths for the user as dictionaries for table formatting
+    available_paths = []
+    for p_name, p_data in LEARNING_PATHS.items():
+        if p_name not in user_state["learning_paths_progress"]:
+            available_paths.append({
+                "name": p_name,
+                "difficulty": p_data["difficulty"],
+                "hours": p_data["estimated_hours"]
+            })
     
-    # NEW COMMAND: Show Learning Path Details
-    if (any_keyword_in_text(user_message_lower, list_synonyms + ["get"]) and
-        any_keyword_in_text(user_message_lower, details_synonyms) and
-        any_keyword_in_text(user_message_lower, path_synonyms)):
+    if available_paths:
+        # Format paths as a table instead of a list
+        table_parts = []
+        table_parts.append("| Learning Path | Difficulty Level | Estimated Time |")
+        table_parts.append("|--------------|------------------|----------------|")
         
-        # Check if a specific path was mentioned
-        path_name = None
-        for p_name in LEARNING_PATHS.keys():
-            if p_name.lower() in user_message_lower:
-                path_name = p_name
-                break
-                
-        # Extract path name after any of the relevant keywords if we didn't find a match
-        if not path_name:
-            paths_keywords = path_synonyms + details_synonyms
-            for keyword in paths_keywords:
-                if keyword in user_message_lower:
-                    remainder = extract_after_keyword(user_message, [keyword])
-                    if remainder.strip():
-                        # Check if this remainder matches any path
-                        for p_name in LEARNING_PATHS.keys():
-                            if p_name.lower() in remainder.lower():
-                                path_name = p_name # pragma: no cover
-                                break # pragma: no cover
-                    if path_name:
-                        break # pragma: no cover
-        
-        return show_learning_path_details(user_state, path_name)
-    
-    # 1. Start Learning Path command
-    if (any_keyword_in_text(user_message_lower, start_synonyms) and 
-        any_keyword_in_text(user_message_lower, path_synonyms)):
-        
-        path_name = extract_after_keyword(user_message, path_synonyms)
-        
-        # If no path name was provided, set pending action for next input
-        if not path_name.strip():
-            user_state["pending_action"] = "start_learning_path"
-            
-            # Get available paths for the user as dictionaries for table formatting
-            available_paths = []
-            for p_name, p_data in LEARNING_PATHS.items():
-                if p_name not in user_state["learning_paths_progress"]:
-                    available_paths.append({
-                        "name": p_name,
-                        "difficulty": p_data["difficulty"],
-                        "hours": p_data["estimated_hours"]
-                    })
-            
-            if available_paths:
-                # Format paths as a table instead of a list
-                table_parts = []
-                table_parts.append("| Learning Path | Difficulty Level | Estimated Time |")
-                table_parts.append("|--------------|------------------|----------------|")
-                
-                for path in available_paths:
-                    table_parts.append(f"| **{path['name']}** | {path['difficulty']} | {path['hours']} hours |")
-                
-                paths_table = "\n".join(table_parts)
-                
-                return (
-                    f"Which learning path 🛤️ would you like to start? Here are the available options:\n\n"
-                    f"{paths_table}\n\n"
-                    f"Just type the name of the learning path you'd like to begin!"
-                )
-            else:
-                # If user has started all paths but not completed them
-                in_progress = []
-                for p_name, status in user_state["learning_paths_progress"].items():
-                    if not status.get("completed", False):
-                        # Calculate progress for more meaningful information
-                        chapters_completed = len(status.get("chapters_completed", []))
-                        total_chapters = len(LEARNING_PATHS[p_name]["chapters"])
-                        progress_percent = (chapters_completed / total_chapters) * 100 if total_chapters > 0 else 0
-                        
-                        # Add as formatted bullet point with progress
-                        in_progress.append(f"- **{p_name}** - {chapters_completed}/{total_chapters} chapters completed ({progress_percent:.1f}%)")
-                
-                if in_progress:
-                    paths_list = "\n".join(in_progress)
-                    return (
-                        f"You've already started all available learning paths. Here are your in-progress paths:\n\n"
-                        f"{paths_list}\n\n"
-                        f"Would you like to continue with any of these? Just type the path name!"
-                    )
-                else:
-                    return (
-                        "You've either completed or started all available learning paths. "
-                        "**Check your progress** with `show learning path progress`."
-                    )
+        for path in available_paths:
+            table_parts.append(f"| **{path['name']}** | {path['difficulty']} | {path['hours']} hours |")
+        
+        paths_table = "\n".join(table_parts)
         
-        return start_learning_path(user_state, path_name.strip())
+        return (
+            f"Which learning path 🛤️ would you like to start? Here are the available options:\n\n"
+            f"{paths_table}\n\n"
+            f"Just type the name of the learning path you'd like to begin!"
+        )
     
-    # Handle pending action for starting a learning path
-    if user_state.get("pending_action") == "start_learning_path":
-        path_name = user_message.strip()
-        user_state["pending_action"] = None
-        return start_learning_path(user_state, path_name)
+    # If user has started all paths but not completed them
+    in_progress = []
+    for p_name, status in user_state["learning_paths_progress"].items():
+        if not status.get("completed", False):
+            # Calculate progress for more meaningful information
+            chapters_completed = len(status.get("chapters_completed", []))
+            total_chapters = len(LEARNING_PATHS[p_name]["chapters"])
+            progress_percent = (chapters_completed / total_chapters) * 100 if total_chapters > 0 else 0
+            
+            # Add as formatted bullet point with progress
+            in_progress.append(f"- **{p_name}** - {chapters_completed}/{total_chapters} chapters completed ({progress_percent:.1f}%)")
     
-    # 2. List Learning Paths command - MOVED AFTER the progress command to avoid conflicts
-    if (any_keyword_in_text(user_message_lower, list_synonyms) and 
-        any_keyword_in_text(user_message_lower, path_synonyms)):
-        return list_learning_paths(user_state)
+    if in_progress:
+        paths_list = "\n".join(in_progress)
+        return (
+            f"You've already started all available learning paths. Here are your in-progress paths:\n\n"
+            f"{paths_list}\n\n"
+            f"Would you like to continue with any of these? Just type the path name!"
+        )
     
-    # 4. Check Chapter Completion command
-    if (any_keyword_in_text(user_message_lower, check_synonyms) and
-        any_keyword_in_text(user_message_lower, ["chapter", "learning path progress"])):
-        
-        # Check if a specific path was mentioned
-        path_name = None
-        for p_name in LEARNING_PATHS.keys():
-            if p_name.lower() in user_message_lower:
-                path_name = p_name # pragma: no cover
-                break # pragma: no cover
-        
-        messages = check_chapter_completion(user_state, path_name)
-        
-        # Check if any paths were completed
-        completion_messages = check_learning_path_completion(user_state)
-        messages.extend(completion_messages)
-        
-        return "\n\n".join(messages)
+    return (
+        "You've either completed or started all available learning paths. "
+        "**Check your progress** with `show learning path progress`."
+    )
+
+def start_learning_path_command(user_state, path_name):
+    """Start the named learning path, or ask for one if no name was given."""
+    if not path_name:
+        return prompt_for_learning_path(user_state)
+    return start_learning_path(user_state, path_name)
+
+def check_chapter_completion_command(user_state, path_name=None):
+    """Advance chapters (of one path, or all started paths) and report completed paths."""
+    messages = check_chapter_completion(user_state, path_name)
     
-    # No learning path command detected
-    return None
+    # Check if any paths were completed
+    completion_messages = check_learning_path_completion(user_state)
+    messages.extend(completion_messages)
+    
+    return "\n\n".join(messages)
+
+def detect_learning_path_commands(user_message, user_state):
+    """
+    Detects and handles learning path related commands in the user message.
+    Returns the appropriate response or None if no learning path command is detected.
+    """
+    return dispatch_command(LEARNING_PATH_ROUTE_INDEX, user_message, user_state)
         
+#########################################
+# CLOSEST UNLOCKS
+#########################################
+
+# Every course gets a bit; each badge, quest and path chapter is precompiled into a
+# requirement mask so "courses left" is a single AND + popcount per candidate.
+# Bits are assigned per process, so masks are never persisted (see serialize_user_state).
+course_bits = {}       # course -> bit mask
+course_by_bit = []     # bit position -> course
+unlock_requirements = []    # (kind, name, path or None, chapter index or None, mask, min_xp)
+chapter_masks = {}     # (path, chapter index) -> (chapter courses, mask)
+
+def course_bit(course):
+    """Return the bit assigned to a course, assigning a new one if needed."""
+    if course not in course_bits:
+        course_bits[course] = 1 << len(course_by_bit)
+        course_by_bit.append(course)
+    return course_bits[course]
+
+def courses_mask(courses):
+    mask = 0
+    for course in courses:
+        mask |= course_bit(course)
+    return mask
+
+def chapter_mask(path_name, chapter_idx):
+    """Return the requirement mask of a learning path chapter, recompiling it if the chapter changed."""
+    courses = LEARNING_PATHS[path_name]["chapters"][chapter_idx]["courses"]
+    cached = chapter_masks.get((path_name, chapter_idx))
+    if cached is None or cached[0] != courses:
+        cached = chapter_masks[(path_name, chapter_idx)] = (list(courses), courses_mask(courses))
+    return cached[1]
+
+def completed_courses_mask(user_state):
+    """Return the bitmask of the user's completed courses, updated incrementally."""
+    new_courses = take_new_completions(user_state, "completed_mask_cursor")
+    if new_courses is None:
+        user_state["completed_mask"] = 0
+        new_courses = user_state["completed_courses"]
+    user_state["completed_mask"] = user_state.get("completed_mask", 0) | courses_mask(new_courses)
+    return user_state["completed_mask"]
+
+def compile_unlock_masks():
+    """(Re)compile requirement masks. Call after editing badges, quests or learning paths."""
+    unlock_requirements.clear()
+    chapter_masks.clear()
+    
+    for courses in get_course_categories().values():
+        courses_mask(courses)
+    
+    for badge_name, req in SKILL_BADGE_REQUIREMENTS.items():
+        # Badges with a custom rule can't be scored by course count
+        if "rule" in req:
+            continue
+        unlock_requirements.append(("badge", badge_name, None, None, courses_mask(req["courses_needed"]), req["min_xp"]))
+    for quest_name, quest_data in QUESTS.items():
+        unlock_requirements.append(("quest", quest_name, None, None, courses_mask(quest_data["courses_required"]), 0))
+    for path_name, path_data in LEARNING_PATHS.items():
+        for chapter_idx, chapter in enumerate(path_data["chapters"]):
+            unlock_requirements.append(("chapter", chapter["title"], path_name, chapter_idx, chapter_mask(path_name, chapter_idx), 0))
+
+def rank_closest_unlocks(user_state, top_k=5):
+    """
+    Score every badge, quest and started-path chapter the user hasn't finished by
+    (courses left, XP left) and return the `top_k` closest as
+    (kind, name, path, remaining courses, XP needed) tuples.
+    """
+    completed_mask = completed_courses_mask(user_state)
+    xp = user_state["xp"]
+    badges = set(user_state["badges"])
+    active_quests = user_state["active_quests"]
+    paths_progress = user_state.get("learning_paths_progress", {})
+    
+    candidates = []
+    for position, (kind, name, path_name, chapter_idx, mask, min_xp) in enumerate(unlock_requirements):
+        if kind == "badge" and name in badges:
+            continue
+        if kind == "quest" and active_quests.get(name, {}).get("completed"):
+            continue
+        if kind == "chapter":
+            path_status = paths_progress.get(path_name)
+            if not path_status or path_status.get("completed") or chapter_idx in path_status.get("chapters_completed", []):
+                continue
+        missing = mask & ~completed_mask
+        candidates.append((missing.bit_count(), max(min_xp - xp, 0), position, missing))
+    
+    ranked = []
+    for courses_left, xp_needed, position, missing in heapq.nsmallest(top_k, candidates):
+        kind, name, path_name = unlock_requirements[position][:3]
+        remaining = [course_by_bit[bit] for bit in range(missing.bit_length()) if missing >> bit & 1]
+        ranked.append((kind, name, path_name, remaining, xp_needed))
+    return ranked
+
+def show_closest_unlocks(user_state, top_k=5):
+    """Format the badges, quests and chapters the user is closest to finishing."""
+    ranked = rank_closest_unlocks(user_state, top_k)
+    if not ranked:
+        return "🏅 You've unlocked everything available right now. Check back later for new quests and badges!"
+    
+    icons = {"badge": "🎖️ Badge", "quest": "🎯 Quest", "chapter": "🛣️ Chapter"}
+    response_parts = ["## 🔓 Closest to Unlock\n"]
+    for kind, name, path_name, remaining, xp_needed in ranked:
+        title = f"{icons[kind]}: **{name}**" + (f" ({path_name})" if path_name else "")
+        needs = []
+        if remaining:
+            needs.append(f"{len(remaining)} course{'s' if len(remaining) != 1 else ''} left: " + ", ".join(remaining[:3])
+                         + (f" and {len(remaining) - 3} more" if len(remaining) > 3 else ""))
+        if xp_needed:
+            needs.append(f"{xp_needed} more XP")
+        if not needs:
+            needs.append("ready to claim" + (f" - use `start quest {name}`" if kind == "quest" else ""))
+        response_parts.append(f"- {title} - {'; '.join(needs)}")
+    
+    return "\n".join(response_parts)
+
+compile_unlock_masks()
+
+#########################################
+# PREREQUISITE PLANNING
+#########################################
+
+# COURSE_PREREQUISITES is compiled once into a topological order and, per course, a
+# bitset over positions in that order of the course plus all of its transitive
+# prerequisites. Walking a plan's bits from the lowest up lists it in topological
+# order, so plans never need sorting.
+prerequisite_order = {}      # course -> position in a topological order
+courses_by_prerequisite_order = []    # position -> course
+prerequisite_closure = {}    # course -> mask of the course and everything it depends on
+# Bumped by every compile, so per-user masks over the old positions are rebuilt
+prerequisite_graph_version = 0
+
+def compile_prerequisite_graph():
+    """
+    (Re)compile COURSE_PREREQUISITES with Kahn's algorithm, breaking ties by catalog
+    order so plans are stable. Raises ValueError if the prerequisites contain a cycle.
+    """
+    global prerequisite_graph_version
+    for course, prerequisites in COURSE_PREREQUISITES.items():
+        courses_mask([course, *prerequisites])
+    courses = list(course_by_bit)
+    
+    dependents = {course: [] for course in courses}
+    pending = {course: 0 for course in courses}
+    for course, prerequisites in COURSE_PREREQUISITES.items():
+        for prerequisite in set(prerequisites):
+            dependents[prerequisite].append(course)
+            pending[course] += 1
+    
+    prerequisite_graph_version += 1
+    prerequisite_order.clear()
+    courses_by_prerequisite_order.clear()
+    prerequisite_closure.clear()
+    ready = [(position, course) for position, course in enumerate(courses) if pending[course] == 0]
+    while ready:
+        _, course = heapq.heappop(ready)
+        position = len(courses_by_prerequisite_order)
+        closure = 1 << position
+        for prerequisite in COURSE_PREREQUISITES.get(course, ()):
+            closure |= prerequisite_closure[prerequisite]
+        prerequisite_closure[course] = closure
+        prerequisite_order[course] = position
+        courses_by_prerequisite_order.append(course)
+        
+        for dependent in dependents[course]:
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                heapq.heappush(ready, (course_bits[dependent].bit_length() - 1, dependent))
+    
+    if len(prerequisite_order) != len(courses):
+        cyclic = sorted(course for course in courses if course not in prerequisite_order)
+        raise ValueError(f"COURSE_PREREQUISITES contains a cycle involving: {', '.join(cyclic)}")
+
+def completed_prerequisite_mask(user_state):
+    """Return the user's completed courses as a mask over topological positions, updated incrementally."""
+    new_courses = take_new_completions(user_state, "prerequisite_mask_cursor")
+    version, mask = user_state.get("prerequisite_mask") or (None, 0)
+    if new_courses is None or version != prerequisite_graph_version:
+        mask, new_courses = 0, user_state["completed_courses"]
+    for course in new_courses:
+        if course in prerequisite_order:
+            mask |= 1 << prerequisite_order[course]
+    user_state["prerequisite_mask"] = (prerequisite_graph_version, mask)
+    return mask
+
+def plan_remaining_courses(user_state, courses):
+    """
+    Return the minimal list of courses the user still has to take to finish `courses`,
+    including missing prerequisites, in an order that respects every prerequisite.
+    """
+    needed = 0
+    # Courses added since the graph was compiled have no prerequisites and go first
+    plan = []
+    for course in courses:
+        if course in prerequisite_closure:
+            needed |= prerequisite_closure[course]
+        elif course not in plan and course not in user_state["completed_courses"]:
+            plan.append(course)
+    remaining = needed & ~completed_prerequisite_mask(user_state)
+    
+    while remaining:
+        lowest = remaining & -remaining
+        plan.append(courses_by_prerequisite_order[lowest.bit_length() - 1])
+        remaining ^= lowest
+    return plan
+
+def plan_learning_path(user_state, path_name):
+    """Format the ordered list of courses left to finish a learning path."""
+    path_matched = next((p_key for p_key in LEARNING_PATHS if p_key.lower() == path_name.strip().lower()), None)
+    if not path_matched:
+        return f"❌ No learning path named **'{path_name.strip()}'** found. Use `list learning paths` to see **available paths**."
+    
+    path_courses = [course for chapter in LEARNING_PATHS[path_matched]["chapters"] for course in chapter["courses"]]
+    plan = plan_remaining_courses(user_state, path_courses)
+    if not plan:
+        return f"🎉 You've already completed every course in **'{path_matched}'**!"
+    
+    path_course_set = set(path_courses)
+    response_parts = [
+        f"## 🗺️ Your Plan for {path_matched}\n",
+        f"Take these **{len(plan)}** courses in order:\n"
+    ]
+    for step, course in enumerate(plan, start=1):
+        link = COURSE_LINKS.get(course, "https://example.com/courses")
+        note = "" if course in path_course_set else " *(prerequisite from another path)*"
+        response_parts.append(f"{step}. [{course}]({link}){note}")
+    return "\n".join(response_parts)
+
+compile_prerequisite_graph()
+
 #########################################
 # 11. HELPER FUNCTIONS FOR KEYWORD MATCHES
 #########################################
 
-def any_keyword_in_text(text: str, keywords: list[str]) -> bool:
-    return any(kw in text for kw in keywords)
+MESSAGE_TOKEN_PATTERN = re.compile(r"[a-z0-9+#]+")
+QUOTED_TEXT_PATTERN = re.compile(r'^([\'"])(.*)\1$')
+
+@dataclass(frozen=True)
+class ParsedMessage:
+    """
+    A user message normalized once and shared by every detector. `text` is the
+    message with whitespace collapsed; `casefolded` is its lowercase form, the same
+    length as `text` so positions line up (see lower_aligned()). Tokens, the word set
+    and the command keyword hits are computed on first use.
+    """
+    original: str
+    text: str
+    casefolded: str
+    
+    @cached_property
+    def tokens(self):
+        """(token, start, end) for every word, with offsets into `text`/`casefolded`."""
+        return tuple((match.group(), match.start(), match.end())
+                     for match in MESSAGE_TOKEN_PATTERN.finditer(self.casefolded))
+    
+    @cached_property
+    def words(self):
+        """Set of whole words, for word-boundary checks."""
+        return frozenset(token for token, _, _ in self.tokens)
+    
+    @cached_property
+    def keyword_hits(self):
+        """Every command keyword present in the message (see COMMAND_KEYWORD_LISTS)."""
+        return find_command_keywords(self.casefolded)
+
+def lower_aligned(text):
+    """
+    text.lower(), except characters whose lowercase form has a different length
+    (e.g. "İ" -> "i̇") are kept as is, so every offset in the result is valid in `text`.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+
+def parse_message(user_message):
+    """Normalize a message once for all detectors; ParsedMessages are passed through."""
+    if isinstance(user_message, ParsedMessage):
+        return user_message
+    text = " ".join(user_message.split())
+    return ParsedMessage(user_message, text, lower_aligned(text))
+
+def any_keyword_in_text(message: str | ParsedMessage, keywords: list[str]) -> bool:
+    """
+    Whether the message contains any of the keywords. Single words must match a whole
+    word ("ai" is not in "maintain"); phrases are matched as substrings.
+    """
+    message = parse_message(message)
+    return any(
+        kw in message.words if MESSAGE_TOKEN_PATTERN.fullmatch(kw) else kw in message.casefolded
+        for kw in keywords
+    )
 
-def extract_after_keyword(message: str, keywords) -> str:
-    msg_lower = message.lower()
+def extract_after_keyword(message, keywords) -> str:
+    if isinstance(message, ParsedMessage):
+        msg_lower = message.casefolded
+        message = message.text
+    else:
+        msg_lower = lower_aligned(message)
     last_index = -1
     chosen_len = 0
     for kw in keywords:
@@ -2868,14 +4051,130 @@ def extract_after_keyword(message: str, keywords) -> str:
     remainder = message[last_index + chosen_len:].strip(" .:-")
     
     # Remove surrounding quotes if present (handles both single and double quotes)
-    import re
-    quote_pattern = r'^([\'"])(.*)\1$'
-    match = re.match(quote_pattern, remainder)
+    match = QUOTED_TEXT_PATTERN.match(remainder)
     if match:
         remainder = match.group(2)  # Extract just the content inside the quotes
     
     return remainder
 
+def compile_keyword_automaton(keywords):
+    """
+    Compile keywords into an Aho-Corasick automaton, flattened into a DFA so each
+    character of the text costs a single dict lookup. Returns {"delta", "output"}:
+    delta[state] maps a character to the next state (missing = back to the root),
+    output[state] is the frozenset of keywords ending there (None if empty).
+    """
+    goto = [{}]
+    output = [set()]
+    for keyword in keywords:
+        state = 0
+        for ch in keyword:
+            if ch not in goto[state]:
+                goto.append({})
+                output.append(set())
+                goto[state][ch] = len(goto) - 1
+            state = goto[state][ch]
+        output[state].add(keyword)
+    
+    # Breadth-first over the trie: a state's fallback is always shallower, so its
+    # transitions and outputs are final by the time we copy them
+    fail = [0] * len(goto)
+    delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        output[state] |= output[fail[state]]
+        delta[state] = {**delta[fail[state]], **goto[state]}
+        for ch, child in goto[state].items():
+            fail[child] = delta[fail[state]].get(ch, 0) if state else 0
+            queue.append(child)
+    
+    return {"delta": delta, "output": [frozenset(keywords) if keywords else None for keywords in output]}
+
+def find_keyword_hits(automaton, text):
+    """Return every automaton keyword occurring in `text`, in one pass over the text."""
+    delta = automaton["delta"]
+    output = automaton["output"]
+    hits = set()
+    state = 0
+    for ch in text:
+        state = delta[state].get(ch, 0)
+        if output[state]:
+            hits |= output[state]
+    return hits
+
+def hits_any(hits, keywords):
+    """Equivalent of any_keyword_in_text() for a precomputed hit set."""
+    return not hits.isdisjoint(keywords)
+
+#########################################
+# COMMAND KEYWORDS
+#########################################
+
+# Synonym lists used by detect_command() and detect_learning_path_commands(), all
+# compiled into COMMAND_KEYWORD_AUTOMATON so a message is scanned only once.
+HELP_KEYWORDS = ["help", "how to", "show commands for", "tell me about"]
+TIMEZONE_KEYWORDS = ["set timezone", "set my timezone", "set time zone", "set my time zone"]
+UNLOCK_KEYWORDS = ["closest unlock", "closest to unlock", "next unlock", "what can i unlock", "what can i finish next"]
+DISPLAY_SYNONYMS = ["show", "display", "provide", "tell me", "share", "can i see"]
+TRENDING_SYNONYMS = ["trending", "popular", "hot", "top-rated"]
+COURSE_NOUN_SYNONYMS = ["course", "courses", "class", "classes", "program", "programs"]
+COURSE_LIST_SYNONYMS = ["show", "display", "list"]
+COMPLETION_SYNONYMS = ["completed", "finished", "done with"]
+COMPLETED_COURSE_SYNONYMS = ["course", "program", "programme", "class"]
+SHOW_SYNONYMS = ["show", "display", "tell me", "my"]
+BADGE_SYNONYMS = ["badge", "badges"]
+LEVEL_SYNONYMS = ["level", "rank"]
+QUEST_START_SYNONYMS = ["start", "begin", "kick off", "go ahead with"]
+QUEST_SYNONYMS = ["quest", "quests"]
+QUEST_LIST_SYNONYMS = ["show", "list", "provide", "display", "tell me", "what are", "can you show me", "could you display", "can i see"]
+QUEST_PROGRESS_SYNONYMS = ["progress", "status", "advancement", "details", "info"]
+QUEST_DETAILS_SYNONYMS = ["details", "information", "description", "info", "explain", "tell me more about"]
+LEADERBOARD_SYNONYMS = ["leaderboard", "rankings", "scoreboard"]
+LEAVE_SYNONYMS = ["leave", "quit", "exit from", "withdraw from"]
+JOIN_SYNONYMS = ["join", "be part of", "get on", "see my name on", "participate in", "add me to", "include me in", "be included in"]
+PROFILE_SYNONYMS = ["profile", "stats", "status", "info", "information", "summary", "overview"]
+PLAN_PATH_KEYWORDS = ["plan my path", "plan my learning path"]
+COURSE_CATEGORY_KEYWORDS = ["cybersecurity", "data science", "web development", "business management"]
+COURSE_RATING_KEYWORDS = ["course rating"]
+COURSES_KEYWORDS = ["courses"]
+COMPLETED_KEYWORDS = ["completed"]
+XP_KEYWORDS = ["xp"]
+DAILY_KEYWORDS = ["daily"]
+CHALLENGE_KEYWORDS = ["challenge"]
+RECOMMEND_KEYWORDS = ["recommend me something", "recommend something", "recommend me a course", "recommend a course",
+                      "suggest something", "suggest a course", "similar courses"]
+NEXT_STEP_KEYWORDS = ["what should i do next", "what should i learn next", "what should i take next", "next steps",
+                      "next step", "what's next"]
+
+PATH_START_SYNONYMS = ["start", "begin", "kick off", "go ahead with", "undertake", "embark on"]
+PATH_LIST_SYNONYMS = ["list", "show", "display", "view", "see", "what are"]
+PATH_DETAILS_VERBS = PATH_LIST_SYNONYMS + ["get"]
+PATH_CHECK_SYNONYMS = ["check", "update", "verify", "look at"]
+PATH_PROGRESS_SYNONYMS = ["progress", "status", "advancement", "development"]
+PATH_DETAILS_SYNONYMS = ["details", "information", "description", "info", "courses", "explain", "tell me more about"]
+PATH_SYNONYMS = ["learning path", "learning paths", "path", "paths", "learning journey", "journey"]
+CHAPTER_KEYWORDS = ["chapter", "learning path progress"]
+
+COMMAND_KEYWORD_LISTS = [
+    HELP_KEYWORDS, TIMEZONE_KEYWORDS, UNLOCK_KEYWORDS, DISPLAY_SYNONYMS, TRENDING_SYNONYMS,
+    COURSE_NOUN_SYNONYMS, COURSE_LIST_SYNONYMS, COMPLETION_SYNONYMS, COMPLETED_COURSE_SYNONYMS,
+    SHOW_SYNONYMS, BADGE_SYNONYMS, LEVEL_SYNONYMS, QUEST_START_SYNONYMS, QUEST_SYNONYMS,
+    QUEST_LIST_SYNONYMS, QUEST_PROGRESS_SYNONYMS, QUEST_DETAILS_SYNONYMS, LEADERBOARD_SYNONYMS,
+    LEAVE_SYNONYMS, JOIN_SYNONYMS, PROFILE_SYNONYMS, PATH_START_SYNONYMS, PATH_DETAILS_VERBS,
+    PATH_CHECK_SYNONYMS, PATH_PROGRESS_SYNONYMS, PATH_DETAILS_SYNONYMS, PATH_SYNONYMS, CHAPTER_KEYWORDS,
+    PLAN_PATH_KEYWORDS, COURSE_CATEGORY_KEYWORDS, COURSE_RATING_KEYWORDS, COURSES_KEYWORDS,
+    COMPLETED_KEYWORDS, XP_KEYWORDS, DAILY_KEYWORDS, CHALLENGE_KEYWORDS, RECOMMEND_KEYWORDS,
+    NEXT_STEP_KEYWORDS,
+]
+COMMAND_KEYWORD_AUTOMATON = compile_keyword_automaton(
+    {keyword for keywords in COMMAND_KEYWORD_LISTS for keyword in keywords}
+)
+
+def find_command_keywords(user_message_lower):
+    """Return the set of command keywords present in a lowercased message."""
+    return find_keyword_hits(COMMAND_KEYWORD_AUTOMATON, user_message_lower)
+
 # Add this function to your code in the command handler section
 
 def get_trending_courses():
@@ -2980,6 +4279,688 @@ def get_trending_courses():
     
     return "\n".join(response_parts)
 
+#########################################
+# CONTENT-BASED RECOMMENDATIONS
+#########################################
+
+# Every catalog course embedded as one L2-normalized TF-IDF row of a single matrix,
+# built from its title, category, chapters and learning paths, so scoring a user
+# against the whole catalog is one matrix-vector product.
+COURSE_RECOMMENDATION_COUNT = 5
+course_content_model = {"courses": [], "course_index": {}, "categories": {},
+                        "matrix": np.zeros((0, 0), dtype=np.float32)}
+
+def content_terms(text):
+    """Words and word bigrams of a course description."""
+    words = [token for token, _, _ in parse_message(text).tokens]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+def course_document(course, category):
+    """Text describing a course: its title (weighted twice), category, chapters and paths."""
+    parts = [course, course, category]
+    for path_name, chapter_idx in path_course_index.get(course, []):
+        path_data = LEARNING_PATHS[path_name]
+        chapter = path_data["chapters"][chapter_idx]
+        parts += [chapter["title"], chapter.get("description", ""), path_name, path_data.get("description", "")]
+    return " ".join(parts)
+
+def compile_course_content_model():
+    """(Re)build the course TF-IDF matrix. Call after editing the course catalog or LEARNING_PATHS."""
+    categories = {}
+    for category, courses in get_course_categories().items():
+        for course in courses:
+            categories.setdefault(course, category)
+    courses = list(categories)
+    
+    vocabulary = {}
+    term_counts = []
+    for course in courses:
+        counts = {}
+        for term in content_terms(course_document(course, categories[course])):
+            column = vocabulary.setdefault(term, len(vocabulary))
+            counts[column] = counts.get(column, 0) + 1
+        term_counts.append(counts)
+    
+    # Sublinear tf, smoothed idf, unit-length rows so dot products are cosines
+    matrix = np.zeros((len(courses), len(vocabulary)), dtype=np.float32)
+    for row, counts in enumerate(term_counts):
+        columns = np.fromiter(counts, dtype=np.intp, count=len(counts))
+        matrix[row, columns] = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    document_frequency = np.count_nonzero(matrix, axis=0)
+    idf = (np.log((1 + len(courses)) / (1 + document_frequency)) + 1).astype(np.float32)
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms > 0, norms, 1)
+    
+    # Terms and idf define the vector space; both change as courses are added
+    course_content_model.update(
+        courses=courses,
+        course_index={course: idx for idx, course in enumerate(courses)},
+        categories=categories,
+        matrix=matrix,
+        terms=list(vocabulary),
+        idf=idf,
+    )
+
+def recommend_similar_courses(completed_courses, top_k=COURSE_RECOMMENDATION_COUNT):
+    """
+    The top_k unseen courses most similar to the completed set, as [(course, cosine)]
+    best first. Empty when none of the completed courses is in the catalog.
+    Served approximately from the LSH index when COURSE_LSH_INDEX_DIR has one.
+    """
+    lsh_index = get_course_lsh_index()
+    if lsh_index is not None:
+        return recommend_from_lsh_index(lsh_index, completed_courses, top_k)
+    
+    course_index = course_content_model["course_index"]
+    seen = list({course_index[course] for course in completed_courses if course in course_index})
+    if not seen:
+        return []
+    
+    matrix = course_content_model["matrix"]
+    profile = matrix[seen].sum(axis=0)
+    profile /= np.linalg.norm(profile) or 1
+    return nearest_courses(matrix, course_content_model["courses"], profile, top_k, seen)
+
+def nearest_courses(matrix, courses, profile, top_k, seen):
+    """Exact top_k rows of `matrix` by cosine to `profile`, skipping the row ids in `seen`."""
+    scores = np.asarray(matrix @ profile)
+    scores[seen] = -np.inf
+    
+    k = min(top_k, len(scores) - len(seen))
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [(courses[idx], float(scores[idx])) for idx in top]
+
+def show_course_recommendations(user_state):
+    """
+    Courses most similar to the ones the user has completed, and courses other
+    learners completed alongside them. Served from the batch file when it is up to date.
+    """
+    # Looked up by init_session_state(); stale once the user completes another course
+    num_completed, precomputed = user_state.get("batch_recommendations") or (None, None)
+    if num_completed == len(user_state["completed_courses"]):
+        recommendations, also_completed = precomputed
+    else:
+        recommendations = recommend_similar_courses(user_state["completed_courses"])
+        also_completed = recommend_co_completed_courses(user_state["completed_courses"])
+    if not recommendations and not also_completed:
+        if user_state["completed_courses"]:
+            return (
+                "## 🎯 Recommended For You\n\n"
+                "I couldn't find any new courses similar to the ones you've completed.\n\n"
+                "Try `show trending courses` or `show courses` to explore something different."
+            )
+        return (
+            "## 🎯 Recommended For You\n\n"
+            "Complete a course first and I'll recommend similar ones "
+            "(e.g., `completed course Intro to Cybersecurity`).\n\n"
+            "In the meantime, try `show trending courses` or `show courses`."
+        )
+    
+    response_parts = ["## 🎯 Recommended For You\n"]
+    for i, (course, score) in enumerate(recommendations, 1):
+        response_parts.append(
+            f"{i}. **{course}** ({course_content_model['categories'].get(course, 'Other')}) - {score:.0%} match\n"
+            f"   [Visit Course]({COURSE_LINKS.get(course, 'https://example.com/courses')})"
+        )
+    if recommendations:
+        response_parts.append("\n*Based on the courses you've completed*")
+    
+    if also_completed:
+        response_parts.append("\n### 🤝 Learners Like You Also Completed\n")
+        for course, _ in also_completed:
+            response_parts.append(f"- [{course}]({COURSE_LINKS.get(course, 'https://example.com/courses')})")
+    return "\n".join(response_parts)
+
+compile_course_content_model()
+
+#########################################
+# CO-COMPLETION RECOMMENDATIONS
+#########################################
+
+# Item-item collaborative filtering: "learners who finished X also finished Y".
+# co_completion_counts[x][y] is the number of users who completed both x and y,
+# course_completion_counts[x] the number who completed x. Counts grow as
+# completions happen; each course's top neighbours by cosine similarity
+# (count(x, y) / sqrt(count(x) * count(y))) are recomputed lazily once stale.
+CO_COMPLETION_NEIGHBOURS = 20
+co_completion_counts = {}
+course_completion_counts = {}
+course_neighbours = {}
+stale_neighbour_lists = set()
+
+def record_co_completion(course, other_courses):
+    """Count one user's completion of `course` alongside the courses they had already completed."""
+    course_completion_counts[course] = course_completion_counts.get(course, 0) + 1
+    row = co_completion_counts.setdefault(course, {})
+    for other in other_courses:
+        if other == course:
+            continue
+        row[other] = row.get(other, 0) + 1
+        other_row = co_completion_counts.setdefault(other, {})
+        other_row[course] = other_row.get(course, 0) + 1
+    # count(course) is in every similarity involving it, so all its neighbours move
+    stale_neighbour_lists.add(course)
+    stale_neighbour_lists.update(row)
+
+def record_user_completions(completed_courses):
+    """Count a whole completion history, as if the courses were completed in order."""
+    for idx, course in enumerate(completed_courses):
+        record_co_completion(course, completed_courses[:idx])
+
+def clear_co_completion():
+    co_completion_counts.clear()
+    course_completion_counts.clear()
+    course_neighbours.clear()
+    stale_neighbour_lists.clear()
+
+def compile_course_neighbours(course):
+    """Recompute one course's top-k neighbour list from the counts."""
+    course_count = course_completion_counts.get(course, 0)
+    # A course completed before counting started (e.g. already in a user's history when
+    # the app restarted) has no count of its own, but was completed at least `count` times
+    neighbours = heapq.nlargest(
+        CO_COMPLETION_NEIGHBOURS,
+        ((count / math.sqrt(max(course_count, count) * max(course_completion_counts.get(other, 0), count)), other)
+         for other, count in co_completion_counts.get(course, {}).items()),
+    )
+    course_neighbours[course] = [(other, similarity) for similarity, other in neighbours]
+
+def get_course_neighbours(course):
+    """[(course, cosine similarity)] best first, refreshed if completions have come in since."""
+    if course in stale_neighbour_lists:
+        compile_course_neighbours(course)
+        stale_neighbour_lists.discard(course)
+    return course_neighbours.get(course, [])
+
+def build_co_completion_index(state_dir):
+    """
+    Rebuild the counts from every persisted user state in `state_dir` and
+    precompute all neighbour lists. Returns the number of users counted.
+    """
+    clear_co_completion()
+    users = 0
+    for path in iter_user_state_files(state_dir):
+        # Only the completion history is needed, so skip deserialize_user_state()
+        with open(path, encoding="utf-8") as state_file:
+            record_user_completions(json.load(state_file).get("completed_courses", []))
+        users += 1
+    for course in list(stale_neighbour_lists):
+        get_course_neighbours(course)
+    return users
+
+def recommend_co_completed_courses(completed_courses, top_k=COURSE_RECOMMENDATION_COUNT):
+    """
+    Merge the neighbour lists of the completed courses, summing similarities.
+    Returns [(course, score)] best first, never including completed courses.
+    """
+    completed = set(completed_courses)
+    scores = {}
+    for course in completed:
+        for other, similarity in get_course_neighbours(course):
+            if other not in completed:
+                scores[other] = scores.get(other, 0.0) + similarity
+    return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+#########################################
+# APPROXIMATE NEAREST COURSES (LSH)
+#########################################
+
+# For catalogs too large to score exactly per message: a random-projection LSH
+# index. Each of LSH_TABLES tables hashes a vector to LSH_BITS sign bits of its
+# projections onto random hyperplanes, so similar courses tend to share a bucket.
+# Per table, codes are kept sorted with the matching course ids, so a bucket is a
+# searchsorted() range and the arrays can be memory-mapped straight from disk.
+# Candidates from all tables are then re-ranked by their exact cosine.
+COURSE_LSH_INDEX_DIR = os.environ.get("COURSE_LSH_INDEX_DIR")
+LSH_TABLES = 16
+LSH_BITS = 11
+LSH_INDEX_ARRAYS = ("vectors", "planes", "codes", "order")
+# Below this many courses exact scoring is about as fast and never misses a neighbour
+LSH_MIN_CATALOG_SIZE = 10000
+
+course_lsh_index = None
+course_lsh_index_loaded = False
+
+def hash_lsh_codes(planes, vectors, num_tables):
+    """(len(vectors), num_tables) uint32 bucket codes of `vectors`."""
+    num_bits = planes.shape[1] // num_tables
+    signs = (vectors @ planes).reshape(len(vectors), num_tables, num_bits) > 0
+    return signs.astype(np.uint32) @ (np.uint32(1) << np.arange(num_bits, dtype=np.uint32))
+
+def build_lsh_index(vectors, names, num_tables=LSH_TABLES, num_bits=LSH_BITS, seed=0):
+    """Index unit-length `vectors` (one row per course in `names`)."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    planes = np.random.default_rng(seed).standard_normal((vectors.shape[1], num_tables * num_bits)).astype(np.float32)
+    codes = hash_lsh_codes(planes, vectors, num_tables).T
+    order = np.argsort(codes, axis=1, kind="stable").astype(np.int32)
+    return {
+        "names": list(names),
+        "ids": {name: idx for idx, name in enumerate(names)},
+        "vectors": vectors,
+        "planes": planes,
+        "codes": np.take_along_axis(codes, order, axis=1),
+        "order": order,
+    }
+
+def add_to_lsh_index(index, vectors, names):
+    """
+    Add courses without rehashing the existing ones: only the new vectors are
+    hashed, then merged into each table's sorted codes.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_tables = len(index["codes"])
+    new_codes = hash_lsh_codes(index["planes"], vectors, num_tables).T
+    new_ids = np.arange(len(index["names"]), len(index["names"]) + len(vectors), dtype=np.int32)
+    
+    codes, order = [], []
+    for table in range(num_tables):
+        new_order = np.argsort(new_codes[table], kind="stable")
+        table_codes = new_codes[table][new_order]
+        positions = np.searchsorted(index["codes"][table], table_codes, side="right")
+        codes.append(np.insert(index["codes"][table], positions, table_codes))
+        order.append(np.insert(index["order"][table], positions, new_ids[new_order]))
+    
+    for name in names:
+        index["ids"][name] = len(index["names"])
+        index["names"].append(name)
+    index["vectors"] = np.concatenate([index["vectors"], vectors])
+    index["codes"] = np.stack(codes)
+    index["order"] = np.stack(order)
+    return index
+
+def lsh_candidates(index, query):
+    """Ids of every course sharing a bucket with `query` in at least one table."""
+    num_tables = len(index["codes"])
+    query_codes = hash_lsh_codes(index["planes"], query[np.newaxis, :], num_tables)[0]
+    buckets = []
+    for table, code in enumerate(query_codes):
+        table_codes = index["codes"][table]
+        start = np.searchsorted(table_codes, code, side="left")
+        end = np.searchsorted(table_codes, code, side="right")
+        buckets.append(index["order"][table, start:end])
+    return np.unique(np.concatenate(buckets))
+
+def query_lsh_index(index, query, top_k=COURSE_RECOMMENDATION_COUNT, exclude=()):
+    """Approximate top_k nearest courses to `query` as [(course, cosine)] best first."""
+    candidates = lsh_candidates(index, query)
+    if len(exclude):
+        candidates = candidates[~np.isin(candidates, exclude)]
+    k = min(top_k, len(candidates))
+    if k == 0:
+        return []
+    
+    scores = index["vectors"][candidates] @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [(index["names"][candidates[idx]], float(scores[idx])) for idx in top]
+
+def save_lsh_index(index, directory):
+    """
+    Write each array as its own .npy file (so it can be memory-mapped) plus names.json.
+    The vector space the courses were embedded in (the "terms" and "idf" of
+    course_content_model), if recorded on the index, is saved as terms.json and idf.npy.
+    """
+    os.makedirs(directory, exist_ok=True)
+    arrays = LSH_INDEX_ARRAYS + (("idf",) if "idf" in index else ())
+    for key in arrays:
+        path = os.path.join(directory, f"{key}.npy")
+        # Write next to the target and swap in, so a reader never maps a partial file
+        with open(f"{path}.tmp", "wb") as array_file:
+            np.save(array_file, np.asarray(index[key]))
+        os.replace(f"{path}.tmp", path)
+    # names.json goes last: load_lsh_index() only reads an index once it exists
+    for key in ("terms", "names") if "terms" in index else ("names",):
+        path = os.path.join(directory, f"{key}.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as json_file:
+            json.dump(index[key], json_file)
+        os.replace(f"{path}.tmp", path)
+
+def load_lsh_index(directory=None, mmap_mode="r"):
+    """Load an index saved by save_lsh_index(), memory-mapped by default; None if missing."""
+    directory = directory or COURSE_LSH_INDEX_DIR
+    if not directory or not os.path.exists(os.path.join(directory, "names.json")):
+        return None
+    with open(os.path.join(directory, "names.json"), encoding="utf-8") as names_file:
+        names = json.load(names_file)
+    index = {key: np.load(os.path.join(directory, f"{key}.npy"), mmap_mode=mmap_mode) for key in LSH_INDEX_ARRAYS}
+    index.update(names=names, ids={name: idx for idx, name in enumerate(names)})
+    if os.path.exists(os.path.join(directory, "terms.json")):
+        with open(os.path.join(directory, "terms.json"), encoding="utf-8") as terms_file:
+            index["terms"] = json.load(terms_file)
+        index["idf"] = np.load(os.path.join(directory, "idf.npy"))
+    return index
+
+def get_course_lsh_index():
+    """Return the course LSH index from COURSE_LSH_INDEX_DIR, loading it on first use."""
+    global course_lsh_index, course_lsh_index_loaded
+    if not course_lsh_index_loaded:
+        course_lsh_index = load_lsh_index()
+        course_lsh_index_loaded = True
+    return course_lsh_index
+
+def recommend_from_lsh_index(index, completed_courses, top_k=COURSE_RECOMMENDATION_COUNT):
+    """recommend_similar_courses() against an LSH index instead of the exact matrix."""
+    seen = np.array(sorted({index["ids"][course] for course in completed_courses if course in index["ids"]}),
+                    dtype=np.int32)
+    if not len(seen):
+        return []
+    profile = np.asarray(index["vectors"][seen]).sum(axis=0)
+    profile /= np.linalg.norm(profile) or 1
+    
+    if len(index["names"]) >= LSH_MIN_CATALOG_SIZE:
+        recommendations = query_lsh_index(index, profile, top_k, exclude=seen)
+        # Sparse buckets can yield fewer candidates than asked for; exact scoring fills the list
+        if len(recommendations) >= min(top_k, len(index["names"]) - len(seen)):
+            return recommendations
+    return nearest_courses(index["vectors"], index["names"], profile, top_k, seen)
+
+#########################################
+# NEXT STEPS
+#########################################
+
+# "What should I do next": the user's uncompleted courses ranked by how much they
+# move started learning paths and active quests forward, plus their rating.
+# Each path/quest contributes scores to the courses it still needs; contributions
+# live in user_state["next_steps"]["sources"] and only the sources touched by a
+# new completion (or whose chapter/quest status moved) are recomputed, after which
+# the short merged list in "ranked" is rebuilt.
+NEXT_STEP_COUNT = 5
+NEXT_STEP_WEIGHTS = {
+    "chapter": 3.0,    # courses of a path's current chapter; later chapters get 1/(distance + 1) of it
+    "quest": 2.0,      # remaining quest courses, up to twice that for the quest's last course
+    "rating": 1.0,     # average rating / 5
+}
+
+def next_step_sources(user_state):
+    """Signature of every path/quest that can contribute next steps, keyed by source id."""
+    sources = {}
+    for path_name, status in user_state.get("learning_paths_progress", {}).items():
+        if path_name in LEARNING_PATHS and not status.get("completed"):
+            sources[f"path:{path_name}"] = [status.get("current_chapter", 0), len(status.get("chapters_completed", []))]
+    for quest_name, entry in user_state["active_quests"].items():
+        if quest_name in QUESTS and not entry.get("completed"):
+            sources[f"quest:{quest_name}"] = [len(entry.get("remaining_courses", ()))]
+    return sources
+
+def score_next_step_source(user_state, source, completed):
+    """{course: [score, reason]} for the courses one path or quest still needs."""
+    kind, name = source.split(":", 1)
+    contributions = {}
+    if kind == "path":
+        path_data = LEARNING_PATHS[name]
+        current_chapter = user_state["learning_paths_progress"][name].get("current_chapter", 0)
+        for distance, chapter in enumerate(path_data["chapters"][current_chapter:]):
+            for course in chapter["courses"]:
+                if course not in completed and course not in contributions:
+                    contributions[course] = [NEXT_STEP_WEIGHTS["chapter"] / (distance + 1), f"{name}: {chapter['title']}"]
+    else:
+        entry = user_state["active_quests"][name]
+        remaining = entry.get("remaining_courses")
+        if remaining is None:
+            remaining = {course for course in QUESTS[name]["courses_required"] if course not in completed}
+        for course in remaining:
+            contributions[course] = [NEXT_STEP_WEIGHTS["quest"] * (1 + 1 / len(remaining)), f"Quest: {name}"]
+    return contributions
+
+def course_rating_score(course):
+    rating = course_ratings.get(course)
+    if not rating or rating["num_ratings"] == 0:
+        return 0.0
+    return NEXT_STEP_WEIGHTS["rating"] * rating["total_rating"] / rating["num_ratings"] / 5
+
+def rank_next_steps(sources):
+    """Merge the source contributions into the top NEXT_STEP_COUNT [course, score, reasons]."""
+    merged = {}
+    for contributions in sources.values():
+        for course, (score, reason) in contributions["courses"].items():
+            entry = merged.setdefault(course, [course, course_rating_score(course), []])
+            entry[1] += score
+            entry[2].append(reason)
+    return heapq.nlargest(NEXT_STEP_COUNT, merged.values(), key=lambda entry: entry[1])
+
+def sync_next_steps(user_state):
+    """
+    Bring the precomputed next steps up to date with completions, started or
+    finished quests and paths, and new ratings since the last sync.
+    Returns the ranked [course, score, reasons] list.
+    """
+    next_steps = user_state.setdefault("next_steps", {"sources": {}, "ranked": [], "ratings_version": None})
+    cached = next_steps["sources"]
+    new_courses = take_new_completions(user_state, "next_steps_cursor")
+    current = next_step_sources(user_state)
+    
+    if new_courses is None:
+        stale = set(current)
+    else:
+        stale = {source for source, signature in current.items()
+                 if source not in cached or cached[source]["signature"] != signature}
+        for course in new_courses:
+            stale.update(f"quest:{quest_name}" for quest_name in quest_course_index.get(course, ()))
+            stale.update(f"path:{path_name}" for path_name, _ in path_course_index.get(course, ()))
+    stale &= set(current)
+    removed = set(cached) - set(current)
+    
+    if stale or removed or next_steps["ratings_version"] != course_ratings_version:
+        completed = set(user_state["completed_courses"])
+        for source in removed:
+            del cached[source]
+        for source in stale:
+            cached[source] = {"signature": current[source],
+                              "courses": score_next_step_source(user_state, source, completed)}
+        next_steps["ranked"] = rank_next_steps(cached)
+        next_steps["ratings_version"] = course_ratings_version
+    return next_steps["ranked"]
+
+def show_next_steps(user_state):
+    """Answer "what should I do next" from the precomputed next steps."""
+    ranked = sync_next_steps(initialize_learning_paths_in_user_state(user_state))
+    if not ranked:
+        if user_state["completed_courses"]:
+            return show_course_recommendations(user_state)
+        return (
+            "## 🧭 Your Next Steps\n\n"
+            "Start a learning path or a quest and I'll line up your next courses.\n"
+            "Try `list learning paths` or `show quests`."
+        )
+    
+    response_parts = ["## 🧭 Your Next Steps\n"]
+    for i, (course, _, reasons) in enumerate(ranked, 1):
+        rating = course_ratings.get(course)
+        stars = f" - {'⭐' * round(rating['total_rating'] / rating['num_ratings'])}" if rating and rating["num_ratings"] else ""
+        response_parts.append(
+            f"{i}. **{course}**{stars}\n"
+            f"   {'; '.join(reasons)} - [Visit Course]({COURSE_LINKS.get(course, 'https://example.com/courses')})"
+        )
+    response_parts.append("\nWhen you finish one, use: `completed course [name]`")
+    return "\n".join(response_parts)
+
+#########################################
+# RECOMMENDATION CACHE
+#########################################
+
+# Recommendations only change when the user's progress does, so results are cached
+# per (user_id, state version, intent); any completion, quest or path change bumps
+# the version and the old entries are simply never looked up again. Entries also
+# expire after RECOMMENDATION_CACHE_TTL seconds, because ratings and co-completion
+# counts move independently of the user. Least recently used entries go first.
+RECOMMENDATION_CACHE_SIZE = 4096
+RECOMMENDATION_CACHE_TTL = 300
+recommendation_cache = OrderedDict()    # key -> (expires at, response, size in bytes)
+recommendation_cache_stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "bytes": 0}
+
+def drop_cached_recommendation(key):
+    _, _, size = recommendation_cache.pop(key)
+    recommendation_cache_stats["bytes"] -= size
+
+def cached_recommendation(user_state, intent, compute):
+    """Return compute(user_state), reusing the last result while the user's state version is unchanged."""
+    key = (user_state.get("user_id"), get_state_version(user_state), intent)
+    now = time.monotonic()
+    entry = recommendation_cache.get(key)
+    if entry is not None:
+        if entry[0] > now:
+            recommendation_cache.move_to_end(key)
+            recommendation_cache_stats["hits"] += 1
+            return entry[1]
+        drop_cached_recommendation(key)
+        recommendation_cache_stats["expired"] += 1
+    
+    recommendation_cache_stats["misses"] += 1
+    response = compute(user_state)
+    size = sys.getsizeof(key) + sys.getsizeof(response)
+    recommendation_cache[key] = (now + RECOMMENDATION_CACHE_TTL, response, size)
+    recommendation_cache_stats["bytes"] += size
+    
+    # Expired entries collect at the least recently used end
+    while recommendation_cache:
+        oldest_key, (expires_at, _, _) = next(iter(recommendation_cache.items()))
+        if expires_at > now and len(recommendation_cache) <= RECOMMENDATION_CACHE_SIZE:
+            break
+        drop_cached_recommendation(oldest_key)
+        recommendation_cache_stats["expired" if expires_at <= now else "evicted"] += 1
+    return response
+
+def clear_recommendation_cache():
+    recommendation_cache.clear()
+    for stat in recommendation_cache_stats:
+        recommendation_cache_stats[stat] = 0
+
+def recommendation_cache_info():
+    """Return the recommendation cache's hit rate, evictions, size and approximate memory use."""
+    lookups = recommendation_cache_stats["hits"] + recommendation_cache_stats["misses"]
+    return {
+        **recommendation_cache_stats,
+        "hit_rate": recommendation_cache_stats["hits"] / lookups if lookups else 0.0,
+        "size": len(recommendation_cache),
+        "max_size": RECOMMENDATION_CACHE_SIZE,
+        "ttl": RECOMMENDATION_CACHE_TTL,
+    }
+
+#########################################
+# BATCH RECOMMENDATIONS
+#########################################
+
+# Recommendations for every persisted user, precomputed offline by
+# precompute_recommendations.py with the same scores as recommend_similar_courses()
+# and recommend_co_completed_courses(), but for a whole chunk of users per matrix
+# product. Saved as one .npz of course indices. A returning user's entry is looked
+# up once when their session starts, and used while their number of completed
+# courses matches the one it was computed from.
+BATCH_RECOMMENDATIONS_PATH = os.environ.get(
+    "BATCH_RECOMMENDATIONS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "batch_recommendations.npz")
+)
+
+batch_recommendations = None
+batch_recommendations_loaded = False
+batch_recommendations_mtime = None    # of the file loaded, so a rerun of the script is picked up
+
+def completion_matrix(completed_lists, courses):
+    """(users x courses) float32 0/1 matrix of who completed what; unknown courses are ignored."""
+    course_index = {course: idx for idx, course in enumerate(courses)}
+    matrix = np.zeros((len(completed_lists), len(courses)), dtype=np.float32)
+    for row, completed in enumerate(completed_lists):
+        columns = [course_index[course] for course in completed if course in course_index]
+        matrix[row, columns] = 1
+    return matrix
+
+def co_completion_similarity(completions, num_neighbours=CO_COMPLETION_NEIGHBOURS):
+    """
+    Dense (courses x courses) cosine similarity of co-completion counts, keeping each
+    course's top num_neighbours like course_neighbours does.
+    """
+    counts = completions.T @ completions
+    course_counts = np.diag(counts).copy()
+    np.fill_diagonal(counts, 0)
+    norms = np.sqrt(np.outer(course_counts, course_counts))
+    similarity = np.divide(counts, norms, out=np.zeros_like(counts), where=norms > 0)
+    if num_neighbours < similarity.shape[1]:
+        cutoff = np.argpartition(-similarity, num_neighbours - 1, axis=1)[:, num_neighbours:]
+        np.put_along_axis(similarity, cutoff, 0, axis=1)
+    return similarity
+
+def top_k_rows(scores, top_k, positive_only=False):
+    """
+    Per-row (indices, scores) of the top_k finite scores (positive ones only if
+    `positive_only`), best first; -1 pads rows with fewer of them.
+    """
+    k = min(top_k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    invalid = ~np.isfinite(top_scores)
+    if positive_only:
+        invalid |= top_scores <= 0
+    top[invalid] = -1
+    return top.astype(np.int32), np.nan_to_num(top_scores, neginf=0).astype(np.float32)
+
+def score_users(completions, course_matrix, similarity, top_k=COURSE_RECOMMENDATION_COUNT):
+    """
+    Content picks and co-completion picks for a chunk of users (rows of `completions`).
+    Returns (content indices, content scores, co-completion indices, co-completion scores).
+    """
+    profiles = completions @ course_matrix
+    norms = np.linalg.norm(profiles, axis=1, keepdims=True)
+    profiles /= np.where(norms > 0, norms, 1)
+    content = profiles @ course_matrix.T
+    co_completed = completions @ similarity
+    
+    completed = completions > 0
+    content[completed] = -np.inf
+    content[~completed.any(axis=1)] = -np.inf
+    co_completed[completed] = -np.inf
+    return (*top_k_rows(content, top_k), *top_k_rows(co_completed, top_k, positive_only=True))
+
+def load_batch_recommendations(path=None):
+    """Load a file written by precompute_recommendations.py; None if it is missing."""
+    path = path or BATCH_RECOMMENDATIONS_PATH
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        recommendations = {key: data[key] for key in data.files}
+    recommendations["courses"] = recommendations["courses"].tolist()
+    return recommendations
+
+def get_batch_recommendations():
+    """Return the batch recommendations, loading them on first use and again whenever the file changes."""
+    global batch_recommendations, batch_recommendations_loaded, batch_recommendations_mtime
+    try:
+        mtime = os.stat(BATCH_RECOMMENDATIONS_PATH).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if not batch_recommendations_loaded or mtime != batch_recommendations_mtime:
+        batch_recommendations = load_batch_recommendations()
+        batch_recommendations_loaded = True
+        batch_recommendations_mtime = mtime
+    return batch_recommendations
+
+def precomputed_recommendations(user_state):
+    """
+    The user's ([(course, similarity)], [(course, score)]) from the batch file, or
+    None if they aren't in it or have completed courses since it was computed.
+    """
+    recommendations = get_batch_recommendations()
+    if recommendations is None:
+        return None
+    user_ids = recommendations["user_ids"]
+    row = np.searchsorted(user_ids, user_state.get("user_id"))
+    if row == len(user_ids) or user_ids[row] != user_state.get("user_id"):
+        return None
+    if recommendations["num_completed"][row] != len(user_state["completed_courses"]):
+        return None
+    
+    courses = recommendations["courses"]
+    return tuple(
+        [(courses[idx], float(score)) for idx, score in zip(recommendations[f"{kind}_picks"][row],
+                                                            recommendations[f"{kind}_scores"][row]) if idx >= 0]
+        for kind in ("content", "co_completion")
+    )
+
 #########################################
 # 12. COMMAND HANDLER
 #########################################
@@ -2989,15 +4970,11 @@ def show_user_profile(user_state):
     including level, XP, badges, streaks, and learning progress.
     """
     # Calculate progress level percentage
-    current_level_idx = 0
-    next_level_idx = 0
     current_xp = user_state["xp"]
     
     # Find current and next level indices
-    for i, level in enumerate(TEN_LEVELS):
-        if current_xp >= level["xp_needed"]:
-            current_level_idx = i
-            next_level_idx = min(i + 1, len(TEN_LEVELS) - 1)
+    current_level_idx = get_level_index(current_xp)
+    next_level_idx = min(current_level_idx + 1, len(TEN_LEVELS) - 1)
     
     # Calculate progress to next level
     current_level = TEN_LEVELS[current_level_idx]
@@ -3034,11 +5011,23 @@ def show_user_profile(user_state):
     else:
         response_parts.append("**Status:** Maximum level achieved! 🏆\n")
     
+    # Approximate community ranking from the XP histogram (works without joining the leaderboard)
+    top_percent = get_xp_percentile_rank(current_xp)
+    if top_percent is not None:
+        response_parts.append(f"**Community Ranking:** Top {max(1, math.ceil(top_percent))}% of learners\n")
+    
     # Streak information
     response_parts.append("## 🔥 Activity Streak")
     response_parts.append(f"**Current Streak:** {user_state.get('current_streak', 0)} days")
     response_parts.append(f"**Longest Streak:** {user_state.get('longest_streak', 0)} days\n")
     
+    # Activity heatmap for the last year
+    if user_state.get("activity_bitmap"):
+        today = get_user_today(user_state)
+        active_days = count_active_days(user_state, today - timedelta(days=ACTIVITY_HEATMAP_DAYS - 1), today)
+        response_parts.append(f"**Active Days (last {ACTIVITY_HEATMAP_DAYS}):** {active_days}")
+        response_parts.append(f"```\n{render_activity_heatmap(user_state, today)}\n```\n")
+    
     # Badges section
     response_parts.append("## 🎖️ Earned Badges")
     if user_state["badges"]:
@@ -3095,7 +5084,8 @@ def show_user_profile(user_state):
     return "\n".join(response_parts)
 
 def handle_user_message(user_message: str, user_state: dict):
-    user_message_lower = user_message.lower().strip()
+    # Normalized once; detect_command() and get_recommendation() share it
+    parsed_message = parse_message(user_message)
     
     # Check for any pending actions first
     if user_state["pending_action"] == "join_leaderboard":
@@ -3145,7 +5135,7 @@ def handle_user_message(user_message: str, user_state: dict):
         # We do a quick pass: does the user message match any "recognized" commands (like "show xp")?
         # If so, we let them do that command.
         # Otherwise, we treat it as an attempt to answer the daily challenge.
-        recognized_response = detect_command(user_message, user_state)
+        recognized_response = detect_command(parsed_message, user_state)
         if recognized_response is not None:
             # Means the user typed a recognized command
             return recognized_response
@@ -3159,412 +5149,680 @@ def handle_user_message(user_message: str, user_state: dict):
             return ans
     else:
         # If there's no active challenge, we proceed normally
-        recognized_response = detect_command(user_message, user_state)
+        recognized_response = detect_command(parsed_message, user_state)
         if recognized_response is not None:
             return recognized_response
         else:
-            return get_recommendation(user_message)
+            return get_recommendation(parsed_message)
 
-def detect_command(user_message: str, user_state: dict) -> str | None | Tuple[str, Optional[str]]:
-    """
-    Check known commands or synonyms. Return the command's response if matched,
-    else return None so handle_user_message() can do fallback or daily-challenge attempt.
-    """
-    user_message_lower = user_message.lower().strip()
-    
-    HELP_RESPONSES = {
-        "📚 courses": (
-            "### Course Commands:\n"
-            "- `show courses` - List all available courses\n"
-            "- `show trending courses` - List some trending courses\n"
-            "- `completed course [name]` - Mark a course as completed\n"
-        ),
-        
-        "🛣️ learning paths": (
-            "### Learning Paths Commands:\n"
-            "- `list learning paths` - See all available paths\n"
-            "- `start learning path [name]` - Begin a learning path\n"
-            "- `show learning path progress` - Check your current progress\n"
-            "- `show learning path details` - View detailed curriculum\n"
-            "- `check chapter completion` - Update chapter progress"
-        ),
-        
-        "🎯 quests": (
-            "### Quest Commands:\n"
-            "- `show quests` - List all available quests\n"
-            "- `show quest details` - View detailed info of each quest\n"
-            "- `start quest [name]` - Begin a new quest\n"
-            "- `show quest progress` - Check your current quest progress"
-        ),
-        
-        "🧩 challenges": (
-            "### Daily Challenge Commands:\n"
-            "- `daily challenge` - Get today's challenge\n"
-            "- Simply type your answer to respond to a challenge"
-        ),
-        
-        "📈 progress": (
-            "### Progress Tracking Commands:\n"
-            "- `show xp` - View your current experience points\n"
-            "- `show level` - Check your current level\n"
-            "- `show badges` - See all earned badges\n"
-            "- `show profile` - Displays all user profile information."
-        ),
-        
-        "🏆 leaderboard": (
-            "### Leaderboard Commands:\n"
-            "- `show leaderboard` - View top performers\n"
-            "- `join leaderboard [nickname]` - Add yourself to rankings\n"
-            "- `leave leaderboard` - Remove yourself from rankings"
-        )
-    }
+#########################################
+# COMMAND ROUTING
+#########################################
+
+HELP_RESPONSES = {
+    "📚 courses": (
+        "### Course Commands:\n"
+        "- `show courses` - List all available courses\n"
+        "- `show trending courses` - List some trending courses\n"
+        "- `recommend me something` - Courses similar to the ones you've completed\n"
+        "- `what should I do next` - Your next courses for the paths and quests you've started\n"
+        "- `completed course [name]` - Mark a course as completed\n"
+    ),
+    
+    "🛣️ learning paths": (
+        "### Learning Paths Commands:\n"
+        "- `list learning paths` - See all available paths\n"
+        "- `start learning path [name]` - Begin a learning path\n"
+        "- `show learning path progress` - Check your current progress\n"
+        "- `show learning path details` - View detailed curriculum\n"
+        "- `check chapter completion` - Update chapter progress\n"
+        "- `plan my path [name]` - Get the ordered list of courses left, prerequisites included"
+    ),
+    
+    "🎯 quests": (
+        "### Quest Commands:\n"
+        "- `show quests` - List all available quests\n"
+        "- `show quest details` - View detailed info of each quest\n"
+        "- `start quest [name]` - Begin a new quest\n"
+        "- `show quest progress` - Check your current quest progress"
+    ),
+    
+    "🧩 challenges": (
+        "### Daily Challenge Commands:\n"
+        "- `daily challenge` - Get today's challenge\n"
+        "- Simply type your answer to respond to a challenge"
+    ),
+    
+    "📈 progress": (
+        "### Progress Tracking Commands:\n"
+        "- `show xp` - View your current experience points\n"
+        "- `show level` - Check your current level\n"
+        "- `show badges` - See all earned badges\n"
+        "- `show profile` - Displays all user profile information.\n"
+        "- `set timezone [name]` - Count streak days in your local time (e.g., `set timezone Europe/London`)\n"
+        "- `closest unlocks` - See the badges, quests and chapters you're closest to finishing"
+    ),
+    
+    "🏆 leaderboard": (
+        "### Leaderboard Commands:\n"
+        "- `show leaderboard` - View top performers\n"
+        "- `join leaderboard [nickname]` - Add yourself to rankings\n"
+        "- `leave leaderboard` - Remove yourself from rankings"
+    )
+}
+
+# Mapping between common user terms and the emoji keys in HELP_RESPONSES
+HELP_TOPIC_KEYWORDS = {
+    "course": "📚 courses",
+    "courses": "📚 courses",
+    "path": "🛣️ learning paths",
+    "paths": "🛣️ learning paths", 
+    "learning path": "🛣️ learning paths",
+    "learning paths": "🛣️ learning paths",
+    "quest": "🎯 quests",
+    "quests": "🎯 quests",
+    "challenge": "🧩 challenges",
+    "challenges": "🧩 challenges",
+    "daily challenge": "🧩 challenges",
+    "progress": "📈 progress",
+    "xp": "📈 progress",
+    "level": "📈 progress",
+    "badge": "📈 progress",
+    "leaderboard": "🏆 leaderboard",
+    "ranking": "🏆 leaderboard"
+}
+
+def show_command_guide(user_state=None):
+    """Return the prerendered "help all" guide."""
+    return prerendered["command_guide"]
+
+def render_command_guide():
+    """Compile all help responses into one comprehensive guide ("help all")."""
+    response_parts = [
+        "# IBM Course Recommender - Command Guide\n",
+        "Here's a comprehensive list of all available commands organized by feature:\n"
+    ]
     
-    # Check specifically for "help all" command
-    if user_message_lower == "help all":
-        # Compile all help responses into one comprehensive guide
-        response_parts = [
-            "# IBM Course Recommender - Command Guide\n",
-            "Here's a comprehensive list of all available commands organized by feature:\n"
-        ]
-        
-        # Add each feature's commands with spacing between sections
-        for feature, commands in HELP_RESPONSES.items():
-            response_parts.append(f"\n\n## {feature.title()}\n{commands}")
-            response_parts.append("\n---\n")
-        
-        # Add final tips
-        response_parts.append("### 💡 Tips")
-        response_parts.append("- Commands are case-insensitive")
-        response_parts.append("- Daily challenges refresh every day for bonus XP")
-        response_parts.append("- For personalized recommendations, just chat about your interests!")
-        
-        return "\n".join(response_parts)
+    # Add each feature's commands with spacing between sections
+    for feature, commands in HELP_RESPONSES.items():
+        response_parts.append(f"\n\n## {feature.title()}\n{commands}")
+        response_parts.append("\n---\n")
     
-    # Check for specific feature help
-    help_keywords = ["help", "how to", "show commands for", "tell me about"]
-    if any(kw in user_message_lower for kw in help_keywords):
-        # Check for each feature keyword in a way that doesn't require emojis
-        # Define a mapping between common user terms and the emoji keys in HELP_RESPONSES
-        feature_keyword_map = {
-            "course": "📚 courses",
-            "courses": "📚 courses",
-            "path": "🛣️ learning paths",
-            "paths": "🛣️ learning paths", 
-            "learning path": "🛣️ learning paths",
-            "learning paths": "🛣️ learning paths",
-            "quest": "🎯 quests",
-            "quests": "🎯 quests",
-            "challenge": "🧩 challenges",
-            "challenges": "🧩 challenges",
-            "daily challenge": "🧩 challenges",
-            "progress": "📈 progress",
-            "xp": "📈 progress",
-            "level": "📈 progress",
-            "badge": "📈 progress",
-            "leaderboard": "🏆 leaderboard",
-            "ranking": "🏆 leaderboard"
-        }
-        
-        # Check if any feature keyword is in the user message
-        matched_feature = None
-        for keyword, help_key in feature_keyword_map.items():
-            if keyword in user_message_lower:
-                matched_feature = help_key
-                break
-                
-        if matched_feature:
-            return HELP_RESPONSES[matched_feature]
-        else:
-            # If no specific feature matched, return general help
-            return (
-                "👋 Welcome to **IBM Course Recommender** - start your personalized learning journey now!\n\n"
-                "**Available Features:**\n"
-                "- 📚 **Courses** - Gain knowledge from different fields\n"
-                "- 🛣️ **Learning Paths** - Structured educational journeys\n"
-                "- 🎯 **Quests** - Complete tasks to earn rewards\n"
-                "- 🧩 **Daily Challenges** - Test your knowledge daily\n"
-                "- 📈 **Progress Tracking** - Monitor your advancement\n"
-                "- 🏆 **Leaderboard** - Compare with other learners\n\n"
-                
-                "**💡 Tips:**\n"  # Fixed missing newline and added colon
-                "Type `help all` to see **all command for every feature**\n"
-                "Type `help [feature]` to learn more about **any feature** (e.g., `help quests`)"
-            )
+    # Add final tips
+    response_parts.append("### 💡 Tips")
+    response_parts.append("- Commands are case-insensitive")
+    response_parts.append("- Daily challenges refresh every day for bonus XP")
+    response_parts.append("- For personalized recommendations, just chat about your interests!")
+    
+    return "\n".join(response_parts)
 
+def find_help_topic(message):
+    """Return the HELP_RESPONSES key for the first feature term in the message, or None."""
+    for keyword, help_key in HELP_TOPIC_KEYWORDS.items():
+        if keyword in message.casefolded:
+            return (help_key,)
+    return (None,)
+
+def show_help(user_state, topic=None):
+    """Return the help for one feature, or the general help if no feature was named."""
+    if topic:
+        return HELP_RESPONSES[topic]
+    return (
+        "👋 Welcome to **IBM Course Recommender** - start your personalized learning journey now!\n\n"
+        "**Available Features:**\n"
+        "- 📚 **Courses** - Gain knowledge from different fields\n"
+        "- 🛣️ **Learning Paths** - Structured educational journeys\n"
+        "- 🎯 **Quests** - Complete tasks to earn rewards\n"
+        "- 🧩 **Daily Challenges** - Test your knowledge daily\n"
+        "- 📈 **Progress Tracking** - Monitor your advancement\n"
+        "- 🏆 **Leaderboard** - Compare with other learners\n\n"
+        
+        "**💡 Tips:**\n"  # Fixed missing newline and added colon
+        "Type `help all` to see **all command for every feature**\n"
+        "Type `help [feature]` to learn more about **any feature** (e.g., `help quests`)"
+    )
 
-    # 1) Show "Trending"/"Popular" Courses
-    synonyms_for_show = ["show", "display", "provide", "tell me", "share", "can i see"]
-    synonyms_for_trending = ["trending", "popular", "hot", "top-rated"]
-    synonyms_for_courses = ["course", "courses", "class", "classes", "program", "programs"]
+def set_timezone_command(user_state, tz_name):
+    """Set the user's timezone for streaks and daily challenges."""
+    if not tz_name.strip():
+        current = user_state.get("timezone") or "server time"
+        return f"Your streaks currently follow **{current}**. Use: `set timezone <Region/City>`, e.g. `set timezone Asia/Tokyo`"
+    return set_user_timezone(user_state, tz_name)
+
+def plan_path_command(user_state, path_name):
+    """Ordered plan of the courses left in a learning path, prerequisites included."""
+    if not path_name.strip():
+        return "Which learning path should I plan? Use: `plan my path <Learning Path Name>`"
+    return plan_learning_path(user_state, path_name)
+
+def complete_course_command(user_state, course_name):
+    """Mark a course as completed, or ask for its name if none was given."""
+    if not course_name.strip():
+        # No course name was provided, set pending action for next input
+        user_state["pending_action"] = "complete_course"
+        
+        # Create a simplified response without listing all courses
+        return (
+            "It seems like you forgot to include the course name, no worries!\n\n"
+            "Please type the name of the course you've completed.\n\n"
+            "If you need to see available courses, use: `show courses`"
+        )
+    
+    # If course name was provided, process it normally
+    return process_course_completion(user_state, course_name)
 
-    if (any_keyword_in_text(user_message_lower, synonyms_for_show)
-        and any_keyword_in_text(user_message_lower, synonyms_for_trending)
-        and any_keyword_in_text(user_message_lower, synonyms_for_courses)):
-        return get_trending_courses()
-        
+def show_xp(user_state):
+    return f"You current XP ✨: **{user_state['xp']}**"
+
+def show_badges(user_state):
+    if user_state["badges"]:
+        return "You have the following badges 🎖️:\n- " + "\n- ".join(user_state["badges"])
+    return "You haven't earned any badges yet."
+
+def show_level(user_state):
+    return f"Your current level 🔝: **{user_state['level']}**."
+
+def prompt_for_quest(user_state):
+    """Ask which quest to start, listing new quests first, then in-progress ones."""
+    # Get ONLY truly available quests (not started, not completed)
+    available_quests = []
+    in_progress_quests = []
+    
+    for q_name in QUESTS.keys():
+        # Check if the quest is in active_quests
+        quest_status = user_state["active_quests"].get(q_name)
         
-    # Course display commands - UPDATED SECTION
-    if (any_keyword_in_text(user_message_lower, ["show", "display", "list"]) and
-        "courses" in user_message_lower):
+        # Completely new quests
+        if quest_status is None:
+            available_quests.append(q_name)
+        # In-progress quests (started but not completed)
+        elif quest_status.get("completed") is False:
+            in_progress_quests.append(q_name)
+    
+    # Set the pending action to capture the next input as quest name
+    user_state["pending_action"] = "start_quest"
+    
+    # If there are new quests available
+    if available_quests:
+        # Limit to top 5 quests and format them with bullet points
+        top_quests = available_quests[:5]
+        formatted_quests = [f"- {quest}" for quest in top_quests]
+        quest_list = "\n".join(formatted_quests)
         
-        # Check if it's for completed courses
-        if "completed" in user_message_lower:
-            return show_completed_courses(user_state)
+        # Add message about remaining quests if there are more than 5
+        remaining_msg = ""
+        if len(available_quests) > 5:
+            more_count = len(available_quests) - 5
+            remaining_msg = f"\n*...and {more_count} more quests. Use `show quests` to see **all**.*"
         
-        # Check if it's for a specific category
-        categories = ["cybersecurity", "data science", "web development", "business management"]
+        return (
+            f"It seems like you forgot to include the quest name, no worries! Here are some quests you can start:\n\n"
+            f"{quest_list}{remaining_msg}\n\n"
+            f"Just type the quest name you'd like to begin!"
+        )
+    # If there are no new quests but there are in-progress quests
+    elif in_progress_quests:
+        # Limit to top 5 in-progress quests and format them with bullet points
+        top_quests = in_progress_quests[:5]
+        formatted_quests = [f"- {quest}" for quest in top_quests]
+        quest_list = "\n".join(formatted_quests)
         
-        for category in categories:
-            if category in user_message_lower:
-                return show_category_courses(user_state, category)
+        # Add message about remaining quests if there are more than 5
+        remaining_msg = ""
+        if len(in_progress_quests) > 5:
+            more_count = len(in_progress_quests) - 5
+            remaining_msg = f"\n*...and **{more_count}** more quests in progress. Use `show quest progress` to see **all**.*"
         
-        # If no specific category, show all courses
-        return show_courses(user_state)
+        return (
+            f"You don't have any new quests available at the moment, but here are some quests you're currently working on:\n\n"
+            f"{quest_list}{remaining_msg}\n\n"
+            f"Would you like to continue with any of these? Just type the quest name!"
+        )
+    # If there are no new or in-progress quests
+    else:
+        return (
+            "It looks like you've completed **all available quests**! Check back later for new quests, "
+            "or type `list quests` to see all your **completed quests**."
+        )
+
+def start_quest_command(user_state, quest_name):
+    """Start the named quest, or ask for one if no name was given."""
+    if not quest_name:
+        return prompt_for_quest(user_state)
+    return start_quest(user_state, quest_name)
+
+def find_quest_for_details(message):
+    """
+    Find the quest a "details" request (a ParsedMessage) is about: a quest named
+    anywhere in the message, or one named after a quest/details keyword.
+    """
+    for q_name in QUESTS.keys():
+        if q_name.lower() in message.casefolded:
+            return (q_name,) # pragma: no cover
+    
+    for keyword in QUEST_SYNONYMS + QUEST_DETAILS_SYNONYMS:
+        if keyword in message.casefolded:
+            remainder = extract_after_keyword(message, [keyword])
+            if remainder.strip():
+                # Check if this remainder matches any quest
+                for q_name in QUESTS.keys():
+                    if q_name.lower() in remainder.lower():
+                        return (q_name,) # pragma: no cover
+    return (None,)
+
+def join_leaderboard_command(user_state, nickname):
+    """Join the leaderboard with the nickname given in the message, or ask for one."""
+    if nickname:
+        # The user typed something that might be their nickname
+        # e.g. "add me to the scoreboard MyNickname" 
+        return join_leaderboard(user_state, nickname)
+    
+    # No nickname found => prompt for it
+    user_state["pending_action"] = "join_leaderboard"
+    return "🤩 Absolutely! Can I please have your nickname?"
+
+def recommend_courses_command(user_state):
+    return cached_recommendation(user_state, "similar_courses", show_course_recommendations)
+
+def next_steps_command(user_state):
+    return cached_recommendation(user_state, "next_steps", show_next_steps)
+
+def show_course_rating(user_state, course_name):
+    if not course_name:
+        return "Usage: 'Course rating <course name>'." # pragma: no cover
+    avg_rating = get_course_average_rating(course_name)
+    return f"'{course_name}' has an average rating of {avg_rating}."
+
+def run_pending_action(user_state, value):
+    """Treat the message as the answer to the question a command left pending."""
+    action = user_state["pending_action"]
+    # Reset pending action
+    user_state["pending_action"] = None
+    
+    if action == "complete_course":
+        return process_course_completion(user_state, value)
+    if action == "start_quest":
+        return start_quest(user_state, value)
+    return start_learning_path(user_state, value)
+
+def message_value(message):
+    """Argument extractor passing the whole message on, e.g. as a pending action's answer."""
+    return (message.original.strip(),)
+
+def mentioned_path(message):
+    return (find_mentioned_path(message.casefolded),)
+
+def is_recommendation_request(message):
+    """
+    A plain request for recommendations ("recommend me something"). Messages that
+    name a topic ("recommend a course on linux") keep the topical reply of
+    get_recommendation() instead.
+    """
+    if message.casefolded.strip(" .!?") in RECOMMEND_KEYWORDS:
+        return True
+    return classify_intent(message) == "general"
+
+# Command routes. A route matches when every keyword group has a hit in the message
+# (see COMMAND_KEYWORD_LISTS), no "exclude" group does, the optional "match" check on
+# the ParsedMessage passes and, for pending-action routes, the user's pending_action
+# is the one given. The matching route with the lowest priority wins; "extract" turns
+# the ParsedMessage into the handler's arguments after user_state.
+# Routes are indexed by their first keyword group, so list the most specific first.
+LEARNING_PATH_ROUTES = [
+    # Progress is checked before the more general path commands
+    {"name": "path_progress", "priority": 220,
+     "keywords": [PATH_SYNONYMS, PATH_PROGRESS_SYNONYMS, PATH_LIST_SYNONYMS + PATH_CHECK_SYNONYMS],
+     "extract": mentioned_path, "handler": show_learning_path_progress},
+    {"name": "path_details", "priority": 221,
+     "keywords": [PATH_SYNONYMS, PATH_DETAILS_SYNONYMS, PATH_DETAILS_VERBS],
+     "extract": lambda message: (find_path_for_details(message),),
+     "handler": show_learning_path_details},
+    {"name": "start_path", "priority": 222, "keywords": [PATH_SYNONYMS, PATH_START_SYNONYMS],
+     "extract": lambda message: (extract_after_keyword(message, PATH_SYNONYMS).strip(),),
+     "handler": start_learning_path_command},
+    {"name": "pending_start_learning_path", "priority": 223, "keywords": [], "pending_action": "start_learning_path",
+     "extract": message_value, "handler": run_pending_action},
+    {"name": "list_paths", "priority": 224, "keywords": [PATH_SYNONYMS, PATH_LIST_SYNONYMS],
+     "handler": list_learning_paths},
+    {"name": "check_chapters", "priority": 225, "keywords": [CHAPTER_KEYWORDS, PATH_CHECK_SYNONYMS],
+     "extract": mentioned_path, "handler": check_chapter_completion_command},
+]
+
+COMMAND_ROUTES = [
+    {"name": "help_all", "priority": 10, "keywords": [HELP_KEYWORDS],
+     "match": lambda message: message.casefolded == "help all", "handler": show_command_guide},
+    {"name": "help", "priority": 20, "keywords": [HELP_KEYWORDS], "extract": find_help_topic, "handler": show_help},
+    {"name": "set_timezone", "priority": 30, "keywords": [TIMEZONE_KEYWORDS],
+     "extract": lambda message: (extract_after_keyword(message, ["timezone", "time zone"]),),
+     "handler": set_timezone_command},
+    {"name": "plan_path", "priority": 40, "keywords": [PLAN_PATH_KEYWORDS],
+     "match": lambda message: message.casefolded.startswith(("plan my path", "plan my learning path")),
+     "extract": lambda message: (extract_after_keyword(message, ["plan my learning path", "plan my path"]),),
+     "handler": plan_path_command},
+    {"name": "closest_unlocks", "priority": 50, "keywords": [UNLOCK_KEYWORDS], "handler": show_closest_unlocks},
+    {"name": "recommend_courses", "priority": 55, "keywords": [RECOMMEND_KEYWORDS],
+     "match": is_recommendation_request, "handler": recommend_courses_command},
+    {"name": "next_steps", "priority": 56, "keywords": [NEXT_STEP_KEYWORDS], "handler": next_steps_command},
+    {"name": "trending_courses", "priority": 60, "keywords": [TRENDING_SYNONYMS, DISPLAY_SYNONYMS, COURSE_NOUN_SYNONYMS],
+     "handler": lambda user_state: get_trending_courses()},
+    {"name": "completed_courses", "priority": 70, "keywords": [COURSES_KEYWORDS, COURSE_LIST_SYNONYMS, COMPLETED_KEYWORDS],
+     "handler": show_completed_courses},
+    {"name": "category_courses", "priority": 71, "keywords": [COURSES_KEYWORDS, COURSE_LIST_SYNONYMS, COURSE_CATEGORY_KEYWORDS],
+     "exclude": [COMPLETED_KEYWORDS],
+     "extract": lambda message: (
+         next(category for category in COURSE_CATEGORY_KEYWORDS if category in message.casefolded),),
+     "handler": show_category_courses},
+    {"name": "all_courses", "priority": 72, "keywords": [COURSES_KEYWORDS, COURSE_LIST_SYNONYMS],
+     "exclude": [COMPLETED_KEYWORDS, COURSE_CATEGORY_KEYWORDS], "handler": show_courses},
+    {"name": "complete_course", "priority": 80, "keywords": [COMPLETION_SYNONYMS, COMPLETED_COURSE_SYNONYMS],
+     "extract": lambda message: (extract_after_keyword(message, COMPLETED_COURSE_SYNONYMS),),
+     "handler": complete_course_command},
+    {"name": "pending_complete_course", "priority": 90, "keywords": [], "pending_action": "complete_course",
+     "extract": message_value, "handler": run_pending_action},
+    {"name": "show_xp", "priority": 100, "keywords": [XP_KEYWORDS, SHOW_SYNONYMS], "handler": show_xp},
+    {"name": "show_badges", "priority": 110, "keywords": [BADGE_SYNONYMS, SHOW_SYNONYMS], "handler": show_badges},
+    {"name": "show_level", "priority": 120, "keywords": [LEVEL_SYNONYMS, SHOW_SYNONYMS], "handler": show_level},
+    {"name": "daily_challenge", "priority": 130, "keywords": [CHALLENGE_KEYWORDS, DAILY_KEYWORDS],
+     "handler": present_daily_challenge},
+    {"name": "start_quest", "priority": 140, "keywords": [QUEST_SYNONYMS, QUEST_START_SYNONYMS],
+     "extract": lambda message: (extract_after_keyword(message, QUEST_SYNONYMS).strip(),),
+     "handler": start_quest_command},
+    {"name": "pending_start_quest", "priority": 150, "keywords": [], "pending_action": "start_quest",
+     "extract": message_value, "handler": run_pending_action},
+    {"name": "quest_details", "priority": 160, "keywords": [QUEST_SYNONYMS, QUEST_DETAILS_SYNONYMS, QUEST_LIST_SYNONYMS],
+     "extract": find_quest_for_details, "handler": show_quest_details},
+    {"name": "quest_progress", "priority": 170, "keywords": [QUEST_SYNONYMS, QUEST_PROGRESS_SYNONYMS, QUEST_LIST_SYNONYMS],
+     "handler": show_quest_progress},
+    {"name": "list_quests", "priority": 180, "keywords": [QUEST_SYNONYMS, QUEST_LIST_SYNONYMS], "handler": list_quests},
+    {"name": "show_leaderboard", "priority": 190, "keywords": [LEADERBOARD_SYNONYMS, DISPLAY_SYNONYMS],
+     "handler": lambda user_state: show_leaderboard(top_n=5, user_state=user_state)},
+    {"name": "leave_leaderboard", "priority": 200, "keywords": [LEADERBOARD_SYNONYMS, LEAVE_SYNONYMS],
+     "handler": leave_leaderboard},
+    {"name": "join_leaderboard", "priority": 210, "keywords": [LEADERBOARD_SYNONYMS, JOIN_SYNONYMS],
+     "extract": lambda message: (
+         extract_after_keyword(message, LEADERBOARD_SYNONYMS + JOIN_SYNONYMS).strip(),),
+     "handler": join_leaderboard_command},
+    *LEARNING_PATH_ROUTES,
+    {"name": "course_rating", "priority": 230, "keywords": [COURSE_RATING_KEYWORDS],
+     "match": lambda message: message.casefolded.startswith("course rating"),
+     "extract": lambda message: (message.casefolded.split("rating", 1)[1].strip(),),
+     "handler": show_course_rating},
+    {"name": "show_profile", "priority": 240, "keywords": [PROFILE_SYNONYMS, SHOW_SYNONYMS], "handler": show_user_profile},
+]
+
+def compile_route_index(routes):
+    """
+    Index routes for dispatch: keyword -> routes whose first keyword group contains
+    it, and pending action -> routes that only apply while it is pending.
+    """
+    by_keyword = {}
+    by_pending_action = {}
+    for route in sorted(routes, key=lambda route: route["priority"]):
+        if route["keywords"]:
+            for keyword in route["keywords"][0]:
+                by_keyword.setdefault(keyword, []).append(route)
+        else:
+            by_pending_action.setdefault(route["pending_action"], []).append(route)
+    return {"by_keyword": by_keyword, "by_pending_action": by_pending_action}
+
+COMMAND_ROUTE_INDEX = compile_route_index(COMMAND_ROUTES)
+LEARNING_PATH_ROUTE_INDEX = compile_route_index(LEARNING_PATH_ROUTES)
+
+def route_matches(route, message, pending_action):
+    if route.get("pending_action") and route["pending_action"] != pending_action:
+        return False
+    hits = message.keyword_hits
+    if not all(hits_any(hits, keywords) for keywords in route["keywords"]):
+        return False
+    if any(hits_any(hits, keywords) for keywords in route.get("exclude", ())):
+        return False
+    return route.get("match") is None or route["match"](message)
+
+def resolve_command_route(route_index, message, pending_action=None):
+    """
+    Return the highest-priority route matching a ParsedMessage, or None. Only
+    routes indexed under one of the message's keyword hits (or its pending action)
+    are evaluated.
+    """
+    candidates = {}
+    for keyword in message.keyword_hits:
+        for route in route_index["by_keyword"].get(keyword, ()):
+            candidates[route["name"]] = route
+    for route in route_index["by_pending_action"].get(pending_action, ()):
+        candidates[route["name"]] = route
+    
+    for route in sorted(candidates.values(), key=lambda route: route["priority"]):
+        if route_matches(route, message, pending_action):
+            return route
+    return None
+
+def run_route(route, args, user_state):
+    initialize_learning_paths_in_user_state(user_state)
+    return route["handler"](user_state, *args)
+
+def dispatch_command(route_index, user_message, user_state):
+    """Run the handler of the route matching the message; None if no route matches."""
+    message = parse_message(user_message)
+    route = resolve_command_route(route_index, message, user_state.get("pending_action"))
+    if route is None:
+        return None
+    
+    args = route["extract"](message) if "extract" in route else ()
+    return run_route(route, args, user_state)
+
+# Many messages are exact repeats ("show courses", "help all"), so the routes of
+# recent messages are kept in an LRU cache. Only route resolution is cached:
+# arguments are extracted from each message as sent (extractors may read the
+# original text, which the key normalizes away) and handlers always run against
+# the current user state.
+ROUTE_CACHE_SIZE = 1024
+route_cache = OrderedDict()    # (normalized message text, pending action) -> route or None
+route_cache_stats = {"hits": 0, "misses": 0}
+
+def resolve_cached_command(user_message, pending_action=None):
+    """
+    Return (route, args) for a message from the command routes, or None if nothing
+    matches. Routes are cached by the message's whitespace-normalized text; case is
+    kept because extracted names and nicknames use it.
+    """
+    message = parse_message(user_message)
+    key = (message.text, pending_action)
+    if key in route_cache:
+        route_cache.move_to_end(key)
+        route_cache_stats["hits"] += 1
+        route = route_cache[key]
+    else:
+        route_cache_stats["misses"] += 1
+        route = route_cache[key] = resolve_command_route(COMMAND_ROUTE_INDEX, message, pending_action)
+        while len(route_cache) > ROUTE_CACHE_SIZE:
+            route_cache.popitem(last=False)
+    
+    if route is None:
+        return None
+    return route, route["extract"](message) if "extract" in route else ()
+
+def clear_route_cache():
+    route_cache.clear()
+    route_cache_stats["hits"] = route_cache_stats["misses"] = 0
+
+def route_cache_info():
+    """Return the routing cache's hits, misses, hit rate and size."""
+    lookups = route_cache_stats["hits"] + route_cache_stats["misses"]
+    return {
+        "hits": route_cache_stats["hits"],
+        "misses": route_cache_stats["misses"],
+        "hit_rate": route_cache_stats["hits"] / lookups if lookups else 0.0,
+        "size": len(route_cache),
+        "max_size": ROUTE_CACHE_SIZE,
+    }
 
-    # 2) Course Completion
-    completion_synonyms = ["completed", "finished", "done with"]
-    course_synonyms = ["course", "program", "programme", "class"]
+def detect_command(user_message: str | ParsedMessage, user_state: dict) -> str | None | Tuple[str, Optional[str]]:
+    """
+    Check known commands or synonyms. Return the command's response if matched,
+    else return None so handle_user_message() can do fallback or daily-challenge attempt.
+    """
+    resolved = resolve_cached_command(user_message, user_state.get("pending_action"))
+    if resolved is None:
+        return None
+    route, args = resolved
+    return run_route(route, args, user_state)
+
+#########################################
+# PRERENDERED RESPONSES & CATALOG REFRESH
+#########################################
+
+# Responses that depend only on the catalog are rendered once at startup and
+# refreshed by refresh_catalog_caches(); handlers return them as is, or overlay
+# the little per-user state they need.
+prerendered = {}
+
+def prerender_static_responses():
+    prerendered["command_guide"] = render_command_guide()
+    prerendered["course_list"] = render_course_list()
+    prerendered["quest_blocks"] = render_quest_blocks()
+    prerendered["quest_overview"] = render_quest_overview({}, [])
+
+def refresh_catalog_caches():
+    """
+    Rebuild everything derived from the catalog (COURSE_LINKS, QUESTS,
+    SKILL_BADGE_REQUIREMENTS, LEARNING_PATHS, COURSE_PREREQUISITES, TEN_LEVELS).
+    Call after reloading or editing any of them.
+    """
+    global course_lsh_index_loaded, batch_recommendations_loaded
+    compile_level_thresholds()
+    compile_rule_graph()
+    compile_quest_course_index()
+    compile_path_course_index()
+    compile_unlock_masks()
+    compile_prerequisite_graph()
+    compile_course_content_model()
+    # The LSH index is reloaded on next use, in case it was rebuilt for the new catalog
+    course_lsh_index_loaded = False
+    batch_recommendations_loaded = False
+    prerender_static_responses()
+    # Cached routes may carry quest or path names extracted against the old catalog
+    clear_route_cache()
+
+prerender_static_responses()
 
-    if (any_keyword_in_text(user_message_lower, completion_synonyms) and
-    any_keyword_in_text(user_message_lower, course_synonyms)):
+#########################################
+# USER STATE PERSISTENCE
+#########################################
+
+# Directory where each user's state is saved as <user_id>.json after every turn.
+# Persistence is disabled when USER_STATE_DIR is not set.
+USER_STATE_DIR = os.environ.get("USER_STATE_DIR")
+
+def serialize_user_state(user_state):
+    """Convert a user state into a JSON-compatible dictionary."""
+    data = dict(user_state)
+    if data.get("active_quests"):
+        data["active_quests"] = {
+            quest_name: {**entry, "remaining_courses": sorted(entry["remaining_courses"])} if "remaining_courses" in entry else entry
+            for quest_name, entry in data["active_quests"].items()
+        }
+    if data.get("activity_bitmap") is not None:
+        data["activity_bitmap"] = base64.b64encode(bytes(data["activity_bitmap"])).decode("ascii")
+    # Course bits and prerequisite positions are assigned per process, so these masks
+    # are rebuilt after loading instead. Batch picks are looked up again each session.
+    for key in ("completed_mask", "completed_mask_cursor", "prerequisite_mask", "prerequisite_mask_cursor",
+                "batch_recommendations"):
+        data.pop(key, None)
+    return data
+
+def deserialize_user_state(data):
+    """Rebuild a user state from its JSON representation."""
+    user_state = dict(data)
+    for entry in user_state.get("active_quests", {}).values():
+        if "remaining_courses" in entry:
+            entry["remaining_courses"] = set(entry["remaining_courses"])
+    if user_state.get("activity_bitmap") is not None:
+        user_state["activity_bitmap"] = bytearray(base64.b64decode(user_state["activity_bitmap"]))
+    # Drop masks saved by older versions; they are rebuilt on first use
+    user_state.pop("completed_mask", None)
+    user_state.pop("completed_mask_cursor", None)
+    initialize_learning_paths_in_user_state(user_state)
+    return user_state
+
+def save_user_state(user_state, state_dir=None):
+    """
+    Write the user state to `state_dir` (default USER_STATE_DIR).
+    The file is replaced atomically so readers never see a partial write.
+    Returns the file path, or None if persistence is disabled.
+    """
+    state_dir = state_dir or USER_STATE_DIR
+    if not state_dir:
+        return None
+    
+    os.makedirs(state_dir, exist_ok=True)
+    path = os.path.join(state_dir, f"{user_state['user_id']}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as state_file:
+        json.dump(serialize_user_state(user_state), state_file)
+    os.replace(tmp_path, path)
+    return path
+
+def load_user_state(path):
+    with open(path, encoding="utf-8") as state_file:
+        return deserialize_user_state(json.load(state_file))
+
+def iter_user_state_files(state_dir):
+    """Lazily yield the paths of all persisted user states, one directory entry at a time."""
+    with os.scandir(state_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(".json"):
+                yield entry.path
+
+def iter_persisted_user_states(state_dir):
+    """Stream (path, user_state) pairs for every persisted user."""
+    for path in iter_user_state_files(state_dir):
+        yield path, load_user_state(path)
+
+#########################################
+# BATCH RE-EVALUATION AFTER RULE CHANGES
+#########################################
+
+def reevaluate_user_state(user_state):
+    """
+    Re-run the learning path, quest, badge and level checks against the current
+    LEARNING_PATHS, QUESTS, SKILL_BADGE_REQUIREMENTS and TEN_LEVELS definitions.
+    Used offline after rules change, since checks normally only run after a completion.
     
-        course_name = extract_after_keyword(user_message, course_synonyms)
+    Returns:
+        A dictionary describing what changed (empty lists/None/0 if nothing did)
+    """
+    user_state = initialize_learning_paths_in_user_state(user_state)
+    old_xp = user_state["xp"]
+    old_level = user_state["level"]
     
-        if not course_name.strip():
-            # No course name was provided, set pending action for next input
-            user_state["pending_action"] = "complete_course"
-        
-            # Create a simplified response without listing all courses
-            response = (
-            "It seems like you forgot to include the course name, no worries!\n\n"
-            "Please type the name of the course you've completed.\n\n"
-            "If you need to see available courses, use: `show courses`"
-            )
-        
-            return response
+    def completed_chapter_count():
+        return sum(len(status.get("chapters_completed", []))
+                   for status in user_state["learning_paths_progress"].values())
     
-        # If course name was provided, process it normally
-        return process_course_completion(user_state, course_name)
+    old_chapters = completed_chapter_count()
+    old_paths = {p for p, status in user_state["learning_paths_progress"].items() if status.get("completed")}
+    old_quests = {q for q, status in user_state["active_quests"].items() if status.get("completed")}
     
-    # Handle pending actions for multi-turn interactions
-    if user_state.get("pending_action") == "complete_course":
-        # User's next message should be the course name
-        course_name = user_message.strip()
-        # Reset pending action
-        user_state["pending_action"] = None
-        # Process the course completion
-        return process_course_completion(user_state, course_name)
-            
-    # 3) Show XP
-    show_synonyms = ["show", "display", "tell me", "my"]
-    if any_keyword_in_text(user_message_lower, show_synonyms) and "xp" in user_message_lower:
-        return f"You current XP ✨: **{user_state['xp']}**"
-
-    # 4) Show Badges
-    badge_synonyms = ["badge", "badges"]   
-    if (any_keyword_in_text(user_message_lower, show_synonyms)
-        and any_keyword_in_text(user_message_lower, badge_synonyms)):
-        if user_state["badges"]:
-            return "You have the following badges 🎖️:\n- " + "\n- ".join(user_state["badges"])
-        else:
-            return "You haven't earned any badges yet."
-
-    # 5) Show Level
-    level_synonyms = ["level", "rank"]
-    if (any_keyword_in_text(user_message_lower, show_synonyms)
-        and any_keyword_in_text(user_message_lower, level_synonyms)):
-        return f"Your current level 🔝: **{user_state['level']}**."
-
-    # 6) Daily Challenge synonyms
-    #    If user wants to start a daily challenge (no active one).
-    if "daily" in user_message_lower and "challenge" in user_message_lower:
-        return present_daily_challenge(user_state)
-
-    # 7) Start Quest synonyms
-    start_synonyms = ["start", "begin", "kick off", "go ahead with"]
-    quest_synonyms = ["quest", "quests"]
-
-    # Check if user wants to start a quest
-    if (any_keyword_in_text(user_message_lower, start_synonyms)
-        and any_keyword_in_text(user_message_lower, quest_synonyms)):
-        
-        quest_name = extract_after_keyword(user_message, quest_synonyms)
-        
-        # If no quest name was provided, set pending action for next input
-        if not quest_name.strip():
-            # Get ONLY truly available quests (not started, not completed)
-            available_quests = []
-            in_progress_quests = []
-            
-            for q_name in QUESTS.keys():
-                # Check if the quest is in active_quests
-                quest_status = user_state["active_quests"].get(q_name)
-                
-                # Completely new quests
-                if quest_status is None:
-                    available_quests.append(q_name)
-                # In-progress quests (started but not completed)
-                elif quest_status.get("completed") is False:
-                    in_progress_quests.append(q_name)
-            
-            # Set the pending action to capture the next input as quest name
-            user_state["pending_action"] = "start_quest"
-            
-            # If there are new quests available
-            if available_quests:
-                # Limit to top 5 quests and format them with bullet points
-                top_quests = available_quests[:5]
-                formatted_quests = [f"- {quest}" for quest in top_quests]
-                quest_list = "\n".join(formatted_quests)
-                
-                # Add message about remaining quests if there are more than 5
-                remaining_msg = ""
-                if len(available_quests) > 5:
-                    more_count = len(available_quests) - 5
-                    remaining_msg = f"\n*...and {more_count} more quests. Use `show quests` to see **all**.*"
-                
-                return (
-                    f"It seems like you forgot to include the quest name, no worries! Here are some quests you can start:\n\n"
-                    f"{quest_list}{remaining_msg}\n\n"
-                    f"Just type the quest name you'd like to begin!"
-                )
-            # If there are no new quests but there are in-progress quests
-            elif in_progress_quests:
-                # Limit to top 5 in-progress quests and format them with bullet points
-                top_quests = in_progress_quests[:5]
-                formatted_quests = [f"- {quest}" for quest in top_quests]
-                quest_list = "\n".join(formatted_quests)
-                
-                # Add message about remaining quests if there are more than 5
-                remaining_msg = ""
-                if len(in_progress_quests) > 5:
-                    more_count = len(in_progress_quests) - 5
-                    remaining_msg = f"\n*...and **{more_count}** more quests in progress. Use `show quest progress` to see **all**.*"
-                
-                return (
-                    f"You don't have any new quests available at the moment, but here are some quests you're currently working on:\n\n"
-                    f"{quest_list}{remaining_msg}\n\n"
-                    f"Would you like to continue with any of these? Just type the quest name!"
-                )
-            # If there are no new or in-progress quests
-            else:
-                return (
-                    "It looks like you've completed **all available quests**! Check back later for new quests, "
-                    "or type `list quests` to see all your **completed quests**."
-                )
-        
-        return start_quest(user_state, quest_name.strip())
-    
-    # Handle pending actions for multi-turn interactions
-    if user_state.get("pending_action") == "start_quest":
-        # User's message should be the quest name
-        quest_name = user_message.strip() # pragma: no cover
-        # Reset pending action
-        user_state["pending_action"] = None # pragma: no cover
-        # Process the quest name
-        return start_quest(user_state, quest_name) # pragma: no cover
-
-    # 8) Quest Commands - check specific quest commands first
-    synonyms_for_list = ["show", "list", "provide", "display", "tell me", "what are", "can you show me", "could you display", "can i see"]
-    quest_synonyms = ["quest", "quests"]
-    progress_synonyms = ["progress", "status", "advancement", "details", "info"]
-    details_synonyms = ["details", "information", "description", "info", "explain", "tell me more about"]
-    
-    # NEW: Check for "show quest details" command
-    if (any_keyword_in_text(user_message_lower, synonyms_for_list) and
-        any_keyword_in_text(user_message_lower, quest_synonyms) and
-        any_keyword_in_text(user_message_lower, details_synonyms)):
-        
-        # Check if a specific quest was mentioned
-        quest_name = None
-        for q_name in QUESTS.keys():
-            if q_name.lower() in user_message_lower:
-                quest_name = q_name # pragma: no cover
-                break # pragma: no cover
-                
-        # Extract quest name after any of the relevant keywords if we didn't find a match
-        if not quest_name:
-            quests_keywords = quest_synonyms + details_synonyms
-            for keyword in quests_keywords:
-                if keyword in user_message_lower:
-                    remainder = extract_after_keyword(user_message, [keyword])
-                    if remainder.strip():
-                        # Check if this remainder matches any quest
-                        for q_name in QUESTS.keys():
-                            if q_name.lower() in remainder.lower():
-                                quest_name = q_name # pragma: no cover
-                                break # pragma: no cover
-                    if quest_name:
-                        break # pragma: no cover
-        
-        return show_quest_details(user_state, quest_name)
-    
-    # First check for the more specific "show quest progress" command
-    if (any_keyword_in_text(user_message_lower, synonyms_for_list) and
-        any_keyword_in_text(user_message_lower, quest_synonyms) and
-        any_keyword_in_text(user_message_lower, progress_synonyms)):
-        return show_quest_progress(user_state)
-    
-    # Then check for the more general "show quests" command
-    if (any_keyword_in_text(user_message_lower, synonyms_for_list) and
-        any_keyword_in_text(user_message_lower, quest_synonyms)):
-        return list_quests(user_state)
-    
-    # 10) Show leaderboard synonyms
-    synonyms_for_leaderboard = ["leaderboard", "rankings", "scoreboard"]
-    if (any_keyword_in_text(user_message_lower, synonyms_for_show) and
-        any_keyword_in_text(user_message_lower, synonyms_for_leaderboard)):
-        return show_leaderboard(top_n=5, user_state=user_state)
-    
-    # 11) Leave Leaderboard synonyms
-    synonyms_for_leave = ["leave", "quit", "exit from", "withdraw from"]
-    if (any_keyword_in_text(user_message_lower, synonyms_for_leave) and
-        any_keyword_in_text(user_message_lower, synonyms_for_leaderboard)):
-        return leave_leaderboard(user_state)
-    
-    # 12) "Join leaderboard" logic: Check if the user wants to "join the leaderboard" in any phrasing
-    synonyms_for_join = ["join", "be part of", "get on", "see my name on", "participate in", "add me to", "include me in", "be included in"]
-    if (any_keyword_in_text(user_message_lower, synonyms_for_join) and
-        any_keyword_in_text(user_message_lower, synonyms_for_leaderboard)):
-         # Now we check if the user also provided a nickname in the same message
-        # e.g. "include me in the scoreboard JohnDoe"
-        
-        # We can try a simple approach: see if there's any text after the last leaderboard synonym
-        # or after the last join synonym. We can do something like:
-        
-        remainder = extract_after_keyword(user_message, synonyms_for_leaderboard + synonyms_for_join)
-        nickname = remainder.strip()
-        
-        if nickname:
-            # The user typed something that might be their nickname
-            # e.g. "add me to the scoreboard MyNickname" 
-            return join_leaderboard(user_state, nickname)
-        else:
-            # No nickname found => prompt for it
-            user_state["pending_action"] = "join_leaderboard"
-            return "🤩 Absolutely! Can I please have your nickname?"
-            
-    # Check for Learning Path commands
-    learning_path_response = detect_learning_path_commands(user_message, user_state)
-    if learning_path_response is not None:
-        return learning_path_response
-    
-    if user_message_lower.startswith("course rating"):
-        parts = user_message_lower.split("rating", 1)
-        if len(parts) < 2 or not parts[1].strip():
-            return "Usage: 'Course rating <course name>'." # pragma: no cover
-        course_name = parts[1].strip()
-        avg_rating = get_course_average_rating(course_name)
-        return f"'{course_name}' has an average rating of {avg_rating}."
-    
-    # Add the profile command detection after existing show XP, badges, level commands
-    profile_synonyms = ["profile", "stats", "status", "info", "information", "summary", "overview"]
-    if (any_keyword_in_text(user_message_lower, show_synonyms) and
-        any_keyword_in_text(user_message_lower, profile_synonyms)):
-        return show_user_profile(user_state)
-
-    # If none of those matched, return None
-    return None
+    # One pass cascades through every satisfied chapter
+    check_chapter_completion(user_state)
+    check_learning_path_completion(user_state)
+    
+    # Quest and path rewards can push XP over badge thresholds, so badges go last
+    check_quests(user_state)
+    new_badges = check_skill_badges(user_state)
+    user_state["level"] = determine_custom_level(user_state["xp"])
+    
+    new_paths = {p for p, status in user_state["learning_paths_progress"].items() if status.get("completed")}
+    new_quests = {q for q, status in user_state["active_quests"].items() if status.get("completed")}
+    
+    return {
+        "badges": new_badges,
+        "quests": sorted(new_quests - old_quests),
+        "chapters": completed_chapter_count() - old_chapters,
+        "paths": sorted(new_paths - old_paths),
+        "level": (old_level, user_state["level"]) if user_state["level"] != old_level else None,
+        "xp": user_state["xp"] - old_xp,
+    }
 
 #########################################
 # 13. MAIN CHATBOT & GRADIO UI
@@ -3647,9 +5905,20 @@ def process_pending_notifications(history, user_state):
         yield history, user_state, gr.update(visible=False), None
         return
     
+    # Only rules reading a fact that changed since the last check are re-evaluated
+    changed_facts = set()
+    
+    # Learning paths are checked first, since a completed path is a fact badges and
+    # quests can read; their messages are still streamed last
+    chapter_messages, path_messages = [], []
+    if user_state["pending_notifications"].get("learning_path_check_needed", False):
+        chapter_messages = check_chapter_completion(user_state)
+        path_messages = check_learning_path_completion(user_state)
+    
     # Process quest completions
     if user_state["pending_notifications"].get("quest_check_needed", False):
-        quest_msgs = check_quests(user_state)
+        changed_facts |= pop_changed_facts(user_state)
+        quest_msgs = check_quests(user_state, changed_facts)
         # Stream quest messages
         for qm in quest_msgs:
             history.append({"role": "assistant", "content": ""})
@@ -3659,7 +5928,9 @@ def process_pending_notifications(history, user_state):
 
     # Process badge awards
     if user_state["pending_notifications"].get("badges_check_needed", False):
-        newly_awarded_skill_badges = check_skill_badges(user_state)
+        # Includes XP granted by quest rewards above
+        changed_facts |= pop_changed_facts(user_state)
+        newly_awarded_skill_badges = check_skill_badges(user_state, changed_facts)
         for badge in newly_awarded_skill_badges:
             badge_text = (
                 f"You've earned a new skill badge: **'{badge}'**!"
@@ -3680,16 +5951,13 @@ def process_pending_notifications(history, user_state):
     
     # Process learning path updates
     if user_state["pending_notifications"].get("learning_path_check_needed", False):
-        # Check chapter completion
-        chapter_messages = check_chapter_completion(user_state)
-        for cm in chapter_messages:
+        # Chapter completions are streamed as one consolidated notification
+        if chapter_messages:
             history.append({"role": "assistant", "content": ""})
-            for partial_text in type_text_in_word_chunks(cm, chunk_size=3, chunk_delay=0.15, pre_delay=0.75):
+            for partial_text in type_text_in_word_chunks("\n\n".join(chapter_messages), chunk_size=3, chunk_delay=0.15, pre_delay=0.75):
                 history[-1]["content"] = partial_text
                 yield history, user_state, gr.update(visible=False), None
         
-        # Check learning path completion
-        path_messages = check_learning_path_completion(user_state)
         for pm in path_messages:
             history.append({"role": "assistant", "content": ""})
             for partial_text in type_text_in_word_chunks(pm, chunk_size=3, chunk_delay=0.15, pre_delay=0.75):
@@ -3699,6 +5967,9 @@ def process_pending_notifications(history, user_state):
     # Update leaderboard
     update_leaderboard(user_state)
     
+    # Persist the user's progress (no-op unless USER_STATE_DIR is set)
+    save_user_state(user_state)
+    
     # Clear pending notifications after processing
     user_state["pending_notifications"] = {
         "quest_check_needed": False,
@@ -3707,6 +5978,40 @@ def process_pending_notifications(history, user_state):
         "learning_path_check_needed": False
     }
 
+# Ids usable as a state file name (see save_user_state)
+SESSION_USER_ID_PATTERN = re.compile(r"[A-Za-z0-9_.-]+")
+
+def session_user_id(request):
+    """
+    The stable id of the user behind a session: their login name when the app runs
+    with auth, else a `?user_id=` link parameter. None for anonymous sessions.
+    """
+    if request is None:
+        return None
+    user_id = request.username or (getattr(request, "query_params", None) or {}).get("user_id")
+    if user_id and SESSION_USER_ID_PATTERN.fullmatch(user_id) and user_id.strip("."):
+        return user_id
+    return None
+
+def init_session_state(user_state, request: gr.Request = None):
+    """
+    Set up a browser session's state; the gr.State default is shared by all sessions.
+    A returning user gets their persisted state and precomputed picks back, anyone
+    else a fresh user id.
+    """
+    user_id = session_user_id(request)
+    path = os.path.join(USER_STATE_DIR, f"{user_id}.json") if user_id and USER_STATE_DIR else None
+    if path and os.path.exists(path):
+        user_state = load_user_state(path)
+    else:
+        user_state["user_id"] = user_id or str(uuid.uuid4())
+    
+    precomputed = precomputed_recommendations(user_state)
+    user_state["batch_recommendations"] = (
+        None if precomputed is None else (len(user_state["completed_courses"]), precomputed)
+    )
+    return user_state
+
 def bot(history: list, user_state: dict):
     # 1) Update streak, parse user command, etc...
     update_streak(user_state)
@@ -3720,11 +6025,13 @@ def bot(history: list, user_state: dict):
     else:
         immediate_response = response
 
-    # Set up pending notifications based on course completion
+    # Set up pending notifications based on course completion, or a quest just
+    # started whose courses may already be done
+    quest_started = any(fact.startswith("quest:") for fact in user_state.get("changed_facts", []))
     user_state["pending_notifications"] = {
-        "quest_check_needed": True if course_to_rate else False,
-        "badges_check_needed": True if course_to_rate else False,
-        "level_check_needed": True if course_to_rate else False,
+        "quest_check_needed": True if course_to_rate or quest_started else False,
+        "badges_check_needed": True if course_to_rate or quest_started else False,
+        "level_check_needed": True if course_to_rate or quest_started else False,
         "learning_path_check_needed": True if course_to_rate else False
     }
 
@@ -3822,12 +6129,13 @@ theme = gr.themes.Base(
 # 6. Modified Gradio UI setup
 with gr.Blocks(theme=theme) as demo:
     user_state = gr.State({
-        "user_id": str(uuid.uuid4()),
+        "user_id": None,    # assigned per session by init_session_state()
         "xp": 0,
         "level": "0x1 [Initiate]",
         "badges": [],
         "leaderboard_nickname": None,
         "last_active_date": None,
+        "timezone": None,
         "current_streak": 0,
         "longest_streak": 0,
         "completed_courses": [],
@@ -3912,5 +6220,14 @@ with gr.Blocks(theme=theme) as demo:
         outputs=[chat_input]
     )
 
-demo.launch()        
-        
\ No newline at end of file
+    demo.load(
+        fn=init_session_state,
+        inputs=[user_state],
+        outputs=[user_state]
+    )
+
+if __name__ == "__main__":
+    schedule_nightly_streak_expiry()
+    if USER_STATE_DIR and os.path.isdir(USER_STATE_DIR):
+        build_co_completion_index(USER_STATE_DIR)
+    demo.launch()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Offline precomputation of course recommendations for every persisted user,
+for email digests and the "your picks" panel. Loads all completion histories
+into one users x courses matrix, scores chunks of users in a process pool and
+writes the top-k picks to a compact .npz file the app looks up at session start
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+# Make the backend package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.ibm_course_recommender import (
+    USER_STATE_DIR, BATCH_RECOMMENDATIONS_PATH, COURSE_RECOMMENDATION_COUNT, course_content_model,
+    iter_user_state_files, load_user_state, completion_matrix, co_completion_similarity, score_users,
+    build_co_completion_index, recommend_similar_courses, recommend_co_completed_courses
+)
+
+# Catalog arrays, set once per worker process by init_worker() rather than sent with every chunk
+worker_arrays = {}
+
+
+def read_completions(path):
+    """(user_id, completed_courses) of one persisted user state. Runs inside a worker process."""
+    with open(path, encoding="utf-8") as state_file:
+        data = json.load(state_file)
+    return data["user_id"], data.get("completed_courses", [])
+
+
+def init_worker(course_matrix, similarity, top_k):
+    worker_arrays.update(course_matrix=course_matrix, similarity=similarity, top_k=top_k)
+
+
+def score_chunk(completions):
+    """Top-k picks for one chunk of users. Runs inside a worker process."""
+    return score_users(completions, worker_arrays["course_matrix"], worker_arrays["similarity"], worker_arrays["top_k"])
+
+
+def precompute_recommendations(state_dir, top_k=COURSE_RECOMMENDATION_COUNT, workers=None, chunk_size=1024):
+    """
+    Score every user state in `state_dir`. Returns the arrays to save, keyed as
+    load_batch_recommendations() expects, with users sorted by id.
+    """
+    with Pool(processes=workers) as pool:
+        users = sorted(pool.imap_unordered(read_completions, iter_user_state_files(state_dir), chunksize=256))
+
+    courses = course_content_model["courses"]
+    completed_lists = [completed for _, completed in users]
+    completions = completion_matrix(completed_lists, courses)
+    similarity = co_completion_similarity(completions)
+
+    chunks = [completions[start:start + chunk_size] for start in range(0, len(users), chunk_size)]
+    with Pool(processes=workers, initializer=init_worker,
+              initargs=(course_content_model["matrix"], similarity, top_k)) as pool:
+        results = pool.map(score_chunk, chunks)
+
+    k = min(top_k, len(courses))
+    if results:
+        content_picks, content_scores, co_picks, co_scores = (np.concatenate(parts) for parts in zip(*results))
+    else:
+        content_picks = co_picks = np.zeros((0, k), dtype=np.int32)
+        content_scores = co_scores = np.zeros((0, k), dtype=np.float32)
+
+    index_type = np.int16 if len(courses) < np.iinfo(np.int16).max else np.int32
+    return {
+        "courses": np.array(courses),
+        "user_ids": np.array([user_id for user_id, _ in users]),
+        "num_completed": np.array([len(completed) for completed in completed_lists], dtype=np.int32),
+        "content_picks": content_picks.astype(index_type),
+        "content_scores": content_scores.astype(np.float16),
+        "co_completion_picks": co_picks.astype(index_type),
+        "co_completion_scores": co_scores.astype(np.float16),
+    }
+
+
+def save_recommendations(arrays, path):
+    """Write the arrays as one compressed .npz, replaced atomically so the app never reads a partial file"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.tmp", "wb") as output_file:
+        np.savez_compressed(output_file, **arrays)
+    os.replace(f"{path}.tmp", path)
+
+
+def measure_per_user_handlers(state_dir, sample_size):
+    """Seconds per user to load the state and compute the same picks one user at a time, on `sample_size` users"""
+    build_co_completion_index(state_dir)
+    paths = []
+    for path in iter_user_state_files(state_dir):
+        if len(paths) == sample_size:
+            break
+        paths.append(path)
+
+    start = time.perf_counter()
+    for path in paths:
+        completed = load_user_state(path)["completed_courses"]
+        recommend_similar_courses(completed)
+        recommend_co_completed_courses(completed)
+    return (time.perf_counter() - start) / max(len(paths), 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Precompute course recommendations for all users")
+    parser.add_argument("state_dir", nargs="?", default=USER_STATE_DIR,
+                        help="Directory of persisted user states (default: $USER_STATE_DIR)")
+    parser.add_argument("--output", default=BATCH_RECOMMENDATIONS_PATH,
+                        help="Where to write the recommendations (default: $BATCH_RECOMMENDATIONS_PATH)")
+    parser.add_argument("--top-k", type=int, default=COURSE_RECOMMENDATION_COUNT, help="Recommendations per user")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="Users scored per matrix product")
+    parser.add_argument("--compare", type=int, default=0,
+                        help="Also time the per-user functions on this many users, for comparison")
+    args = parser.parse_args()
+
+    if not args.state_dir:
+        parser.error("No state directory given and USER_STATE_DIR is not set")
+
+    start = time.perf_counter()
+    arrays = precompute_recommendations(args.state_dir, args.top_k, args.workers, args.chunk_size)
+    save_recommendations(arrays, args.output)
+    elapsed = time.perf_counter() - start
+
+    users = len(arrays["user_ids"])
+    print(f"Precomputed {args.top_k} recommendations for {users:,} users in {elapsed:.2f}s "
+          f"({users / elapsed if elapsed else 0:,.0f} users/s)")
+    print(f"Saved to {args.output} ({os.path.getsize(args.output):,} bytes)")
+
+    if args.compare:
+        per_user = measure_per_user_handlers(args.state_dir, args.compare)
+        print(f"One user at a time: {per_user * 1e3:.2f} ms/user, about {per_user * users:.1f}s for all users")
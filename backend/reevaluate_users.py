@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Offline re-evaluation of every persisted user after QUESTS,
+SKILL_BADGE_REQUIREMENTS, LEARNING_PATHS or TEN_LEVELS change.
+Streams user states from the state directory, shards them across a
+process pool, writes back changed states and prints a diff summary.
+Workers return the XP events they grant, and only this process appends
+them to XP_LEDGER_FILE.
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+# Make the backend package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import ibm_course_recommender as recommender
+from backend.ibm_course_recommender import (
+    USER_STATE_DIR, iter_user_state_files, load_user_state, save_user_state, reevaluate_user_state,
+    get_xp_ledger_file, xp_ledger_line
+)
+
+
+def init_worker():
+    """Leave XP_LEDGER_FILE to the parent, and keep every XP event in memory until it is returned"""
+    recommender.XP_LEDGER_FILE = None
+    # A user's event list is never empty right after an append, so no snapshot trims it
+    recommender.XP_SNAPSHOT_INTERVAL = 0
+
+
+def reevaluate_user_file(args):
+    """
+    Re-evaluate one persisted user state. Runs inside a worker process.
+    Returns (changed, diff, XP events as (user_id, event_type, amount, timestamp)).
+    """
+    path, dry_run = args
+    user_state = load_user_state(path)
+    diff = reevaluate_user_state(user_state)
+    events = [(user_state["user_id"], *event) for event in recommender.xp_ledger.pop(user_state["user_id"], [])]
+
+    changed = any(diff.values())
+    if changed and not dry_run:
+        save_user_state(user_state, os.path.dirname(path))
+    return changed, diff, events
+
+
+def write_ledger_events(results, dry_run=False):
+    """Pass (changed, diff) through, appending each user's XP events to XP_LEDGER_FILE unless dry_run"""
+    ledger_file = get_xp_ledger_file() if recommender.XP_LEDGER_FILE and not dry_run else None
+    for changed, diff, events in results:
+        if ledger_file is not None and changed:
+            ledger_file.writelines(xp_ledger_line(*event) for event in events)
+        yield changed, diff
+    if ledger_file is not None:
+        ledger_file.flush()
+
+
+def summarize(results):
+    """Aggregate per-user diffs into overall counts"""
+    summary = Counter()
+    badges = Counter()
+    quests = Counter()
+    paths = Counter()
+    level_changes = Counter()
+
+    for changed, diff in results:
+        summary["users"] += 1
+        if not changed:
+            continue
+        summary["changed_users"] += 1
+        summary["xp_awarded"] += diff["xp"]
+        summary["chapters_completed"] += diff["chapters"]
+        badges.update(diff["badges"])
+        quests.update(diff["quests"])
+        paths.update(diff["paths"])
+        if diff["level"]:
+            level_changes[diff["level"]] += 1
+
+    return summary, badges, quests, paths, level_changes
+
+
+def reevaluate_directory(state_dir, workers=None, chunk_size=64, dry_run=False):
+    """
+    Re-evaluate every user state in `state_dir` using a pool of `workers` processes.
+    Returns (summary, badges, quests, paths, level_changes) counters and the elapsed time.
+    """
+    start = time.perf_counter()
+    tasks = ((path, dry_run) for path in iter_user_state_files(state_dir))
+
+    with Pool(processes=workers, initializer=init_worker) as pool:
+        results = pool.imap_unordered(reevaluate_user_file, tasks, chunksize=chunk_size)
+        report = summarize(write_ledger_events(results, dry_run))
+
+    return report, time.perf_counter() - start
+
+
+def print_report(report, elapsed, dry_run=False):
+    summary, badges, quests, paths, level_changes = report
+    users = summary["users"]
+
+    print(f"Re-evaluated {users} users in {elapsed:.2f}s ({users / elapsed if elapsed else 0:,.0f} users/s)")
+    print(f"Users changed: {summary['changed_users']}" + (" (dry run, nothing written)" if dry_run else ""))
+    print(f"XP awarded: {summary['xp_awarded']}")
+    print(f"Chapters completed: {summary['chapters_completed']}")
+
+    for title, counter in (("Badges awarded", badges), ("Quests completed", quests), ("Learning paths completed", paths)):
+        if counter:
+            print(f"\n{title}:")
+            for name, count in counter.most_common():
+                print(f"  {name}: {count}")
+
+    if level_changes:
+        print("\nLevel changes:")
+        for (old_level, new_level), count in level_changes.most_common():
+            print(f"  {old_level} -> {new_level}: {count}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-evaluate badges, quests, levels and learning paths for all users")
+    parser.add_argument("state_dir", nargs="?", default=USER_STATE_DIR,
+                        help="Directory of persisted user states (default: $USER_STATE_DIR)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="User states sent to a worker at a time")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them back")
+    args = parser.parse_args()
+
+    if not args.state_dir:
+        parser.error("No state directory given and USER_STATE_DIR is not set")
+
+    report, elapsed = reevaluate_directory(args.state_dir, args.workers, args.chunk_size, args.dry_run)
+    print_report(report, elapsed, args.dry_run)
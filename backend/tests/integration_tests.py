@@ -235,5 +235,136 @@ class IntegrationTests(unittest.TestCase):
         self.assertIsNone(self.user_state["pending_action"])
         self.assertTrue(self.user_state["active_quests"]["Data Science Starter"]["started"])
 
+    def test_xp_ledger_matches_user_xp(self):
+        """Test that every XP grant across features lands in the ledger"""
+        from backend.ibm_course_recommender import rebuild_xp_from_ledger, get_xp_history, rate_course
+        
+        self.user_state["user_id"] = "ledger_integration_user"
+        
+        # Earn XP from courses, a rating, a quest and a learning path chapter
+        handle_user_message("start quest Data Science Starter", self.user_state)
+        handle_user_message("start learning path Data Science Fundamentals", self.user_state)
+        handle_user_message("completed course Python for Everybody", self.user_state)
+        handle_user_message("completed course Intro to Data Science", self.user_state)
+        rate_course(self.user_state, "Python for Everybody", "5")
+        check_quests(self.user_state)
+        check_chapter_completion(self.user_state)
+        
+        # The ledger explains all of the user's XP
+        self.assertEqual(rebuild_xp_from_ledger("ledger_integration_user"), self.user_state["xp"])
+        events = {e["event"] for e in get_xp_history("ledger_integration_user")}
+        self.assertEqual(events, {"course_completion", "course_rating", "quest_reward", "chapter_completion"})
+
+    def test_reevaluate_persisted_users(self):
+        """Test the offline re-evaluation command across a process pool"""
+        import tempfile
+        from backend import ibm_course_recommender as recommender
+        from backend.ibm_course_recommender import save_user_state, load_user_state
+        from backend.reevaluate_users import reevaluate_directory
+        
+        with tempfile.TemporaryDirectory() as state_dir:
+            # One stale user who already meets a badge's and a quest's requirements, one up-to-date user
+            stale_user = dict(self.user_state, user_id="stale_user", xp=100,
+                              completed_courses=["Python for Everybody", "Intro to Data Science"],
+                              active_quests={"Data Science Starter": {"started": True, "completed": False}})
+            fresh_user = dict(self.user_state, user_id="fresh_user", badges=[], completed_courses=[])
+            save_user_state(stale_user, state_dir)
+            save_user_state(fresh_user, state_dir)
+            
+            # Dry run reports the change without writing it
+            ledger_path = os.path.join(state_dir, "xp_ledger.csv")
+            with patch.object(recommender, "XP_LEDGER_FILE", ledger_path):
+                (summary, badges, _, _, _), _ = reevaluate_directory(state_dir, workers=2, dry_run=True)
+            self.assertEqual(summary["users"], 2)
+            self.assertEqual(summary["changed_users"], 1)
+            self.assertEqual(badges["Python Beginner"], 1)
+            self.assertEqual(load_user_state(f"{state_dir}/stale_user.json")["badges"], [])
+            self.assertFalse(os.path.exists(ledger_path))
+            
+            # A real run writes the new badge back, and the parent appends the workers' XP events
+            with patch.object(recommender, "XP_LEDGER_FILE", ledger_path):
+                reevaluate_directory(state_dir, workers=2)
+            recommender.xp_ledger_file.close()
+            self.assertIn("Python Beginner", load_user_state(f"{state_dir}/stale_user.json")["badges"])
+            with open(ledger_path, encoding="utf-8") as f:
+                self.assertEqual([line.split(",")[:3] for line in f],
+                                 [["stale_user", str(recommender.XP_EVENT_QUEST_REWARD), "100"]])
+
+    def test_precompute_recommendations(self):
+        """Test the offline batch recommendations across a process pool and their lookup at session start"""
+        import tempfile
+        import gradio as gr
+        from backend import ibm_course_recommender as recommender
+        from backend.ibm_course_recommender import save_user_state, bot
+        from backend.precompute_recommendations import precompute_recommendations, save_recommendations
+        
+        histories = {
+            "batch_user_a": ["CIA Triad", "Basic Terminologies"],
+            "batch_user_b": ["CIA Triad", "Networking Fundamentals"],
+            "batch_user_c": ["Networking Fundamentals", "Core Networking Protocols", "CIA Triad"],
+            "batch_user_d": [],
+        }
+        with tempfile.TemporaryDirectory() as state_dir:
+            for user_id, completed in histories.items():
+                save_user_state(dict(self.user_state, user_id=user_id, completed_courses=completed), state_dir)
+            batch_path = os.path.join(state_dir, "batch.npz")
+            arrays = precompute_recommendations(state_dir, workers=2, chunk_size=2)
+            recommender.build_co_completion_index(state_dir)
+            
+            def start_session(user_id):
+                return recommender.init_session_state(dict(self.user_state, user_id=None), gr.Request(username=user_id))
+            
+            def fake_typing(text, **kwargs):
+                yield text
+            
+            try:
+                with patch.object(recommender, "USER_STATE_DIR", state_dir), \
+                     patch.object(recommender, "BATCH_RECOMMENDATIONS_PATH", batch_path), \
+                     patch.object(recommender, "type_text_in_word_chunks", side_effect=fake_typing):
+                    # Before the batch runs, sessions start without picks
+                    self.assertIsNone(start_session("batch_user_a")["batch_recommendations"])
+                    
+                    # Once it has run, a returning user's session starts with their saved
+                    # progress and picks, which match what the per-user functions compute
+                    save_recommendations(arrays, batch_path)
+                    for user_id, completed in histories.items():
+                        user_state = start_session(user_id)
+                        self.assertEqual(user_state["user_id"], user_id)
+                        self.assertEqual(user_state["completed_courses"], completed)
+                        num_completed, (content, co_completed) = user_state["batch_recommendations"]
+                        self.assertEqual(num_completed, len(completed))
+                        live_content = recommender.recommend_similar_courses(completed)
+                        live_co_completed = recommender.recommend_co_completed_courses(completed)
+                        for picks, live in ((content, live_content), (co_completed, live_co_completed)):
+                            self.assertEqual([course for course, _ in picks], [course for course, _ in live])
+                            for (_, score), (_, live_score) in zip(picks, live):
+                                self.assertAlmostEqual(score, live_score, places=2)
+                    
+                    # The chat serves the precomputed picks
+                    user_state = start_session("batch_user_a")
+                    with patch.object(recommender, "recommend_similar_courses") as mock_recommend:
+                        history = list(bot([{"role": "user", "content": "recommend me something"}], user_state))[-1][0]
+                        mock_recommend.assert_not_called()
+                    self.assertIn(f"**{user_state['batch_recommendations'][1][0][0][0]}**", history[1]["content"])
+                    
+                    # Users who completed courses since the batch ran are computed live
+                    user_state["completed_courses"].append("Intro to Cybersecurity")
+                    with patch.object(recommender, "recommend_similar_courses", return_value=[]) as mock_recommend:
+                        recommender.show_course_recommendations(user_state)
+                        mock_recommend.assert_called_once()
+                    
+                    # Anonymous and unknown users get a fresh id and no picks
+                    for request in (None, gr.Request(username="unknown"), gr.Request(username="../batch_user_a")):
+                        user_state = recommender.init_session_state(dict(self.user_state, user_id=None), request)
+                        self.assertNotIn(user_state["user_id"], histories)
+                        self.assertIsNone(user_state["batch_recommendations"])
+                    
+                    # A rerun of the script is picked up without a restart
+                    save_recommendations({**arrays, "num_completed": arrays["num_completed"] + 1}, batch_path)
+                    os.utime(batch_path, ns=(0, 0))
+                    self.assertIsNone(start_session("batch_user_a")["batch_recommendations"])
+            finally:
+                recommender.clear_co_completion()
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -73,6 +73,76 @@ class UnitTests(unittest.TestCase):
         self.assertEqual(determine_custom_level(8000), "0xA [Legendary]")
         self.assertEqual(determine_custom_level(9999), "0xA [Legendary]")  # Above max level
         
+    def test_compute_levels_bulk(self):
+        """Test vectorized level resolution against the scalar lookup"""
+        from backend.ibm_course_recommender import compute_levels_bulk, get_level_index
+        
+        xp_values = [-10, 0, 199, 200, 350, 999, 1000, 7999, 8000, 9999]
+        level_indices, progress = compute_levels_bulk(xp_values)
+        
+        # Indices match the bisect-based scalar lookup
+        self.assertEqual(list(level_indices), [get_level_index(xp) for xp in xp_values])
+        
+        # Progress is the fraction of the way to the next level
+        self.assertAlmostEqual(progress[1], 0.0)
+        self.assertAlmostEqual(progress[4], 0.5)  # 350 is halfway between 200 and 500
+        self.assertAlmostEqual(progress[0], 0.0)  # Negative XP is clamped
+        
+        # Maximum level is always fully progressed
+        self.assertEqual(level_indices[-1], len(TEN_LEVELS) - 1)
+        self.assertAlmostEqual(progress[-1], 1.0)
+        self.assertAlmostEqual(progress[-2], 1.0)
+        
+    def test_xp_ledger(self):
+        """Test that XP grants are recorded in the ledger and can be rebuilt from snapshots"""
+        from backend.ibm_course_recommender import (
+            grant_xp, rebuild_xp_from_ledger, rebuild_user_xp, get_xp_history,
+            xp_snapshots, XP_SNAPSHOT_INTERVAL, XP_EVENT_COURSE_COMPLETION, XP_EVENT_QUEST_REWARD
+        )
+        
+        self.user_state["user_id"] = "ledger_test_user"
+        
+        # Test 1: Each grant updates XP and appends a typed event
+        grant_xp(self.user_state, 50, XP_EVENT_COURSE_COMPLETION)
+        grant_xp(self.user_state, 100, XP_EVENT_QUEST_REWARD)
+        self.assertEqual(self.user_state["xp"], 150)
+        history = get_xp_history("ledger_test_user")
+        self.assertEqual([e["event"] for e in history], ["course_completion", "quest_reward"])
+        self.assertEqual([e["amount"] for e in history], [50, 100])
+        
+        # Test 2: A snapshot is taken every XP_SNAPSHOT_INTERVAL events
+        self.assertNotIn("ledger_test_user", xp_snapshots)
+        for _ in range(XP_SNAPSHOT_INTERVAL - 2):
+            grant_xp(self.user_state, 10, XP_EVENT_COURSE_COMPLETION)
+        self.assertEqual(xp_snapshots["ledger_test_user"]["event_count"], XP_SNAPSHOT_INTERVAL)
+        self.assertEqual(xp_snapshots["ledger_test_user"]["xp"], self.user_state["xp"])
+        # Snapshotted events are dropped from memory
+        self.assertEqual(get_xp_history("ledger_test_user"), [])
+        
+        # Test 3: Rebuilding replays the tail after the snapshot
+        grant_xp(self.user_state, 25, XP_EVENT_COURSE_COMPLETION)
+        self.assertEqual(rebuild_xp_from_ledger("ledger_test_user"), self.user_state["xp"])
+        
+        # Test 4: Corrupted state can be restored from the ledger
+        expected_xp = self.user_state["xp"]
+        self.user_state["xp"] = 0
+        self.assertEqual(rebuild_user_xp(self.user_state), expected_xp)
+        self.assertEqual(self.user_state["level"], determine_custom_level(expected_xp))
+        
+        # Test 5: The ledger file is appended through one handle, flushed after every event
+        import tempfile
+        from backend import ibm_course_recommender as recommender
+        with tempfile.TemporaryDirectory() as ledger_dir:
+            ledger_path = os.path.join(ledger_dir, "xp_ledger.csv")
+            with patch.object(recommender, "XP_LEDGER_FILE", ledger_path):
+                grant_xp(self.user_state, 10, XP_EVENT_COURSE_COMPLETION)
+                ledger_file = recommender.xp_ledger_file
+                grant_xp(self.user_state, 20, XP_EVENT_COURSE_COMPLETION)
+                self.assertIs(recommender.xp_ledger_file, ledger_file)
+                with open(ledger_path, encoding="utf-8") as f:
+                    self.assertEqual([line.split(",")[2] for line in f], ["10", "20"])
+            recommender.xp_ledger_file.close()
+        
     def test_check_skill_badges(self):
         """Test badge awarding based on course completion"""
         # Set up user state with courses but no badges yet
@@ -100,6 +170,40 @@ class UnitTests(unittest.TestCase):
         self.assertIn("Cybersecurity Fundamentals", newly_awarded)
         self.assertIn("Cybersecurity Fundamentals", self.user_state["badges"])
         
+    def test_compiled_badge_rules(self):
+        """Test declarative badge rules and incremental re-checking from changed facts"""
+        from backend.ibm_course_recommender import compile_rule_graph, rule_nodes, rule_fact_index
+        
+        custom_badges = {
+            "Polyglot": {"rule": {"count": 2, "of": ["Python for Everybody", "Introduction to JavaScript", "Introduction to HTML"]}},
+            "Path Finisher": {"rule": {"all": [{"path_completed": "Data Science"}, {"min_xp": 500}]}},
+            "Either Intro": {"rule": {"any": ["Intro to Cybersecurity", "Introduction to Business"]}},
+        }
+        try:
+            with patch.dict(SKILL_BADGE_REQUIREMENTS, custom_badges):
+                compile_rule_graph()
+                
+                # Test 1: the same course appearing in several rules compiles to one node
+                course_nodes = [node for node in rule_nodes if node[:2] == ("course", "Python for Everybody")]
+                self.assertEqual(len(course_nodes), 1)
+                self.assertIn("Polyglot", rule_fact_index["course:Introduction to HTML"]["badge"])
+                
+                # Test 2: "any 2 of" and "any" rules
+                self.user_state["completed_courses"] = ["Python for Everybody", "Introduction to HTML", "Introduction to Business"]
+                self.user_state["xp"] = 0
+                newly_awarded = check_skill_badges(self.user_state)
+                self.assertIn("Polyglot", newly_awarded)
+                self.assertIn("Either Intro", newly_awarded)
+                self.assertNotIn("Path Finisher", newly_awarded)
+                
+                # Test 3: only rules reading a changed fact are re-checked
+                self.user_state["learning_paths_progress"] = {"Data Science": {"completed": True}}
+                self.user_state["xp"] = 600
+                self.assertEqual(check_skill_badges(self.user_state, {"course:CIA Triad"}), [])
+                self.assertEqual(check_skill_badges(self.user_state, {"path:Data Science"}), ["Path Finisher"])
+        finally:
+            compile_rule_graph()
+    
     def test_update_streak_new_day(self):
         """Test streak update when logging in on consecutive days"""
         # Set up previous login from yesterday
@@ -159,6 +263,124 @@ class UnitTests(unittest.TestCase):
         self.assertEqual(self.user_state["longest_streak"], 1)
         self.assertEqual(self.user_state["last_active_date"], date.today().isoformat())
         
+    def test_update_streak_uses_user_timezone(self):
+        """Test that streak days follow the user's own timezone"""
+        from datetime import datetime, timezone
+        from backend.ibm_course_recommender import get_user_today, set_user_timezone
+        
+        # Test 1: Same instant, different local dates on either side of the date line
+        instant = datetime(2025, 3, 10, 12, 0, tzinfo=timezone.utc)
+        self.assertEqual(get_user_today({"timezone": "Pacific/Kiritimati"}, instant), date(2025, 3, 11))
+        self.assertEqual(get_user_today({"timezone": "Pacific/Pago_Pago"}, instant), date(2025, 3, 10))
+        
+        # Test 2: Unknown timezones fall back to server time
+        self.assertEqual(get_user_today({"timezone": "Mars/Olympus_Mons"}), date.today())
+        self.assertIn("not a timezone", set_user_timezone(self.user_state, "Mars/Olympus_Mons"))
+        self.assertNotIn("timezone", self.user_state)
+        
+        # Test 3: Yesterday in the user's timezone continues the streak
+        self.assertIn("Asia/Tokyo", set_user_timezone(self.user_state, "Asia/Tokyo"))
+        tokyo_today = get_user_today(self.user_state)
+        self.user_state["last_active_date"] = (tokyo_today - timedelta(days=1)).isoformat()
+        self.user_state["current_streak"] = 4
+        self.user_state["longest_streak"] = 4
+        update_streak(self.user_state)
+        self.assertEqual(self.user_state["current_streak"], 5)
+        self.assertEqual(self.user_state["last_active_date"], tokyo_today.isoformat())
+    
+    def test_expire_lapsed_streaks(self):
+        """Test the nightly bulk pass that expires broken streaks"""
+        from datetime import datetime, timezone
+        from backend.ibm_course_recommender import (
+            expire_lapsed_streaks, index_streak_activity, streak_activity_index, streak_user_states, leaderboard
+        )
+        
+        original_index = {day: set(users) for day, users in streak_activity_index.items()}
+        original_states = streak_user_states.copy()
+        original_leaderboard = leaderboard.copy()
+        
+        try:
+            streak_activity_index.clear()
+            streak_user_states.clear()
+            now = datetime(2025, 3, 10, 0, 30, tzinfo=timezone.utc)
+            
+            def make_user(user_id, last_active, tz_name):
+                state = {"user_id": user_id, "last_active_date": last_active, "timezone": tz_name, "current_streak": 7}
+                index_streak_activity(state, None)
+                return state
+            
+            active_yesterday = make_user("yesterday_user", "2025-03-09", "UTC")
+            lapsed_long_ago = make_user("old_user", "2025-02-01", "UTC")
+            lapsed_two_days = make_user("two_days_user", "2025-03-08", "UTC")
+            # Still 2025-03-09 in Honolulu, so a streak from 03-08 is alive there
+            behind_utc = make_user("honolulu_user", "2025-03-08", "Pacific/Honolulu")
+            
+            # Users on the leaderboard get their displayed streak updated too
+            leaderboard.append({"user_id": "old_user", "nickname": "Old", "xp": 0, "level": "0x1 [Initiate]", "current_streak": 7})
+            
+            expired = expire_lapsed_streaks(now)
+            
+            self.assertEqual(expired, 2)
+            self.assertEqual(lapsed_long_ago["current_streak"], 0)
+            self.assertEqual(lapsed_two_days["current_streak"], 0)
+            self.assertEqual(active_yesterday["current_streak"], 7)
+            self.assertEqual(behind_utc["current_streak"], 7)
+            self.assertEqual(leaderboard[-1]["current_streak"], 0)
+            
+            # Expired users leave the index, so the next pass skips them
+            self.assertNotIn("2025-02-01", streak_activity_index)
+            self.assertEqual(streak_activity_index["2025-03-08"], {"honolulu_user"})
+            self.assertEqual(expire_lapsed_streaks(now), 0)
+            
+            # Expired users leave the live state registry too, so it doesn't grow forever
+            self.assertEqual(set(streak_user_states), {"yesterday_user", "honolulu_user"})
+            
+            # Each session gets its own user id instead of sharing the gr.State default
+            from backend.ibm_course_recommender import init_session_state
+            self.assertNotEqual(init_session_state({"user_id": None})["user_id"], init_session_state({"user_id": None})["user_id"])
+        finally:
+            streak_activity_index.clear()
+            streak_activity_index.update(original_index)
+            streak_user_states.clear()
+            streak_user_states.update(original_states)
+            leaderboard.clear()
+            leaderboard.extend(original_leaderboard)
+    
+    def test_activity_bitmap(self):
+        """Test the per-user activity calendar bitmap and heatmap"""
+        from backend.ibm_course_recommender import (
+            mark_active_day, was_active_on, count_active_days, render_activity_heatmap,
+            serialize_user_state, deserialize_user_state
+        )
+        
+        state = {}
+        start = date(2025, 1, 1)
+        active_days = [start + timedelta(days=offset) for offset in (0, 1, 2, 10, 200, 364)]
+        for day in active_days:
+            mark_active_day(state, day)
+        
+        # Test 1: one bit per day, so a year fits in ~46 bytes
+        self.assertEqual(len(state["activity_bitmap"]), 46)
+        self.assertTrue(all(was_active_on(state, day) for day in active_days))
+        self.assertFalse(was_active_on(state, start + timedelta(days=3)))
+        self.assertFalse(was_active_on(state, start - timedelta(days=1)))
+        self.assertEqual(count_active_days(state, start, start + timedelta(days=364)), 6)
+        self.assertEqual(count_active_days(state, start + timedelta(days=2), start + timedelta(days=10)), 2)
+        
+        # Test 2: marking a day before the bitmap start keeps earlier bits intact
+        mark_active_day(state, start - timedelta(days=3))
+        self.assertTrue(was_active_on(state, start - timedelta(days=3)))
+        self.assertTrue(all(was_active_on(state, day) for day in active_days))
+        
+        # Test 3: heatmap has one row per weekday and one cell per active day
+        heatmap = render_activity_heatmap(state, start + timedelta(days=364))
+        self.assertEqual(len(heatmap.splitlines()), 7)
+        self.assertEqual(heatmap.count("█"), 6)
+        
+        # Test 4: the bitmap survives a JSON round trip
+        restored = deserialize_user_state(serialize_user_state(state))
+        self.assertEqual(restored["activity_bitmap"], state["activity_bitmap"])
+    
     def test_present_daily_challenge_already_completed(self):
         """Test presenting daily challenge when already completed today"""
         from backend.ibm_course_recommender import present_daily_challenge
@@ -532,6 +754,58 @@ class UnitTests(unittest.TestCase):
             for entry in original_leaderboard:
                 leaderboard.append(entry)
                 
+    def test_xp_histogram_percentile_rank(self):
+        """Test the approximate percentile rank computed from the XP histogram"""
+        from backend.ibm_course_recommender import (
+            grant_xp, get_xp_percentile_rank, show_user_profile, xp_histogram_bucket,
+            xp_histogram, xp_histogram_user_buckets, leaderboard, XP_EVENT_COURSE_COMPLETION
+        )
+        
+        # Save the original histogram state
+        original_counts = xp_histogram.copy()
+        original_buckets = xp_histogram_user_buckets.copy()
+        original_leaderboard = leaderboard.copy()
+        
+        try:
+            xp_histogram[:] = [0] * len(xp_histogram)
+            xp_histogram_user_buckets.clear()
+            
+            # Test 1: Empty histogram has no rank
+            self.assertIsNone(get_xp_percentile_rank(100))
+            
+            # Test 2: Buckets are ordered by XP
+            self.assertEqual(xp_histogram_bucket(0), 0)
+            self.assertEqual(xp_histogram_bucket(-5), 0)
+            self.assertLess(xp_histogram_bucket(100), xp_histogram_bucket(1000))
+            
+            # Test 3: Users are counted when granted XP, even without a leaderboard nickname
+            users = [{"user_id": f"hist_user_{i}", "xp": 0, "leaderboard_nickname": None} for i in range(100)]
+            for i, user in enumerate(users):
+                grant_xp(user, i * 100, XP_EVENT_COURSE_COMPLETION)
+            self.assertEqual(sum(xp_histogram), 100)
+            
+            # The strongest user is near the top, the weakest covers everyone
+            self.assertLess(get_xp_percentile_rank(9900), 5)
+            self.assertEqual(get_xp_percentile_rank(0), 100)
+            self.assertAlmostEqual(get_xp_percentile_rank(5000), 50, delta=10)
+            
+            # Test 4: Updating a user moves them between buckets instead of double counting
+            grant_xp(users[0], 20000, XP_EVENT_COURSE_COMPLETION)
+            self.assertEqual(sum(xp_histogram), 100)
+            self.assertLessEqual(get_xp_percentile_rank(20000), 1)
+            
+            # Test 5: Profile shows the community ranking, without counting the viewer again
+            self.user_state["xp"] = 9900
+            result = show_user_profile(self.user_state)
+            self.assertIn("Community Ranking:** Top", result)
+            self.assertEqual(sum(xp_histogram), 100)
+        finally:
+            xp_histogram[:] = original_counts
+            xp_histogram_user_buckets.clear()
+            xp_histogram_user_buckets.update(original_buckets)
+            leaderboard.clear()
+            leaderboard.extend(original_leaderboard)
+    
     def test_leave_leaderboard(self):
         """Test removing a user from the leaderboard"""
         from backend.ibm_course_recommender import leave_leaderboard
@@ -755,6 +1029,82 @@ class UnitTests(unittest.TestCase):
         
         
         
+    def test_quest_remaining_counters(self):
+        """Test that active quests keep remaining-course counters up to date"""
+        from backend.ibm_course_recommender import (
+            start_quest, process_course_completion, sync_quest_counters, check_quests,
+            serialize_user_state, deserialize_user_state
+        )
+        
+        start_quest(self.user_state, "Web Developer Starter")
+        entry = self.user_state["active_quests"]["Web Developer Starter"]
+        self.assertEqual(entry["remaining_count"], 2)
+        
+        # Test 1: completing a required course decrements the counter
+        process_course_completion(self.user_state, "Introduction to HTML")
+        self.assertEqual(entry["remaining_courses"], {"Introduction to CSS"})
+        self.assertEqual(entry["remaining_count"], 1)
+        
+        # Test 2: unrelated courses leave the counter alone
+        process_course_completion(self.user_state, "CIA Triad")
+        self.assertEqual(entry["remaining_count"], 1)
+        
+        # Test 3: replacing completed_courses triggers a full recount
+        self.user_state["completed_courses"] = ["Introduction to CSS"]
+        sync_quest_counters(self.user_state)
+        self.assertEqual(entry["remaining_courses"], {"Introduction to HTML"})
+        
+        # Test 4: counters survive a JSON round trip and drive completion
+        restored = deserialize_user_state(serialize_user_state(self.user_state))
+        self.assertEqual(restored["active_quests"]["Web Developer Starter"]["remaining_courses"], {"Introduction to HTML"})
+        restored["completed_courses"].append("Introduction to HTML")
+        self.assertEqual(len(check_quests(restored)), 1)
+        self.assertTrue(restored["active_quests"]["Web Developer Starter"]["completed"])
+    
+    def test_rank_closest_unlocks(self):
+        """Test ranking badges, quests and chapters by how close they are to unlocking"""
+        from backend.ibm_course_recommender import rank_closest_unlocks, show_closest_unlocks, detect_command
+        
+        self.user_state["completed_courses"] = ["Introduction to HTML", "Introduction to CSS", "Python for Everybody"]
+        self.user_state["xp"] = 40
+        self.user_state["badges"] = ["Web Developer Fundamentals"]
+        
+        ranked = rank_closest_unlocks(self.user_state, top_k=3)
+        
+        # Test 1: a quest whose courses are all done ranks first and is ready to claim
+        self.assertEqual(ranked[0][:2], ("quest", "Web Developer Starter"))
+        self.assertEqual(ranked[0][3], [])
+        
+        # Test 2: remaining courses and missing XP are reported
+        python_badge = next(entry for entry in rank_closest_unlocks(self.user_state, top_k=20) if entry[1] == "Python Beginner")
+        self.assertEqual(python_badge[3], ["Intro to Data Science"])
+        self.assertEqual(python_badge[4], 10)
+        
+        # Test 3: earned badges are never suggested
+        self.assertNotIn("Web Developer Fundamentals", [entry[1] for entry in rank_closest_unlocks(self.user_state, top_k=100)])
+        
+        # Test 4: the command renders the ranking
+        self.assertEqual(detect_command("closest unlocks", self.user_state), show_closest_unlocks(self.user_state))
+        self.assertIn("ready to claim", show_closest_unlocks(self.user_state))
+        
+        # Test 5: masks are process-local, so they are never persisted and are rebuilt on load
+        from backend.ibm_course_recommender import (
+            serialize_user_state, deserialize_user_state, completed_courses_mask, courses_mask, chapter_mask, LEARNING_PATHS
+        )
+        data = serialize_user_state(self.user_state)
+        self.assertNotIn("completed_mask", data)
+        self.assertNotIn("completed_mask_cursor", data)
+        data["completed_mask"] = 1
+        self.assertEqual(completed_courses_mask(deserialize_user_state(data)), courses_mask(self.user_state["completed_courses"]))
+        
+        # Test 6: chapter masks are keyed by (path, chapter index) and follow edits to the chapter
+        path_name = next(iter(LEARNING_PATHS))
+        chapter = LEARNING_PATHS[path_name]["chapters"][0]
+        self.assertEqual(chapter_mask(path_name, 0), courses_mask(chapter["courses"]))
+        with unittest.mock.patch.dict(chapter, {"courses": ["Python for Everybody"]}):
+            self.assertEqual(chapter_mask(path_name, 0), courses_mask(["Python for Everybody"]))
+        self.assertEqual(chapter_mask(path_name, 0), courses_mask(chapter["courses"]))
+    
     def test_check_quests(self):
         """Test the check_quests function for quest completion"""
         # Import required dependencies
@@ -1069,6 +1419,36 @@ class UnitTests(unittest.TestCase):
         self.assertIn(test_quest, result)
         self.assertNotIn("No quest named", result)
      
+    def test_prerendered_responses(self):
+        """Test the prerendered static responses and their refresh after a catalog change"""
+        from backend.ibm_course_recommender import (
+            show_quest_details, show_command_guide, render_command_guide, format_course_list, render_course_list,
+            render_quest_overview, refresh_catalog_caches, QUESTS
+        )
+        
+        # Test 1: Static blocks are rendered once and returned as is
+        self.assertIs(show_command_guide(), show_command_guide())
+        self.assertEqual(show_command_guide(), render_command_guide())
+        self.assertEqual(format_course_list(), render_course_list())
+        
+        # Test 2: The quest overview overlays the user's completed courses
+        fresh = show_quest_details(self.user_state)
+        self.assertEqual(fresh, render_quest_overview({}, []))
+        self.assertNotIn("✅", fresh)
+        course = next(iter(QUESTS.values()))["courses_required"][0]
+        self.user_state["completed_courses"].append(course)
+        self.assertIn(f"✅ [{course}]", show_quest_details(self.user_state))
+        
+        # Test 3: Refreshing the catalog caches picks up a new quest
+        new_quest = {"courses_required": [course], "reward_xp": 5, "reward_badge": "Refresh Badge"}
+        try:
+            with patch.dict(QUESTS, {"Refresh Quest": new_quest}):
+                refresh_catalog_caches()
+                self.assertIn("### Refresh Quest (Not Started)", show_quest_details({"active_quests": {}, "completed_courses": []}))
+        finally:
+            refresh_catalog_caches()
+        self.assertNotIn("Refresh Quest", show_quest_details(self.user_state))
+
     def test_show_quest_details_status_variations(self):
         """Test show_quest_details function with quests in different states"""
         from backend.ibm_course_recommender import show_quest_details, QUESTS
@@ -1711,6 +2091,36 @@ class UnitTests(unittest.TestCase):
         self.assertIn("Management", result)
 
 
+    def test_intent_classifier(self):
+        """Test the TF-IDF intent model behind get_recommendation and its keyword fallback"""
+        from backend.ibm_course_recommender import (
+            classify_intent, classify_intents, classify_intent_by_keywords, get_recommendation, RECOMMENDATION_RESPONSES
+        )
+        
+        # Test 1: Substrings inside unrelated words don't pick a topic
+        self.assertEqual(classify_intent_by_keywords("how do I maintain my laptop"), "general")
+        self.assertEqual(classify_intent("how do I maintain my laptop"), "general")
+        self.assertEqual(classify_intent_by_keywords("what does it cost"), "general")
+        self.assertEqual(get_recommendation("what does it cost"), RECOMMENDATION_RESPONSES["general"])
+        self.assertEqual(classify_intent_by_keywords("Is AI hard? What OS should I use?"), "data_science")
+        self.assertEqual(classify_intent_by_keywords("I'm new to coding"), "beginner")
+        
+        # Test 2: A batch is scored in one call with the same results as single messages
+        messages = ["teach me machine learning", "I want to secure my network", "", "zzz qqq"]
+        batch = classify_intents(messages)
+        self.assertEqual([intent for intent, _ in batch], [classify_intent(message) for message in messages])
+        self.assertEqual(batch[0][0], "data_science")
+        self.assertEqual(batch[2][0], "general")
+        self.assertEqual(batch[3][0], "general")
+        
+        # Test 3: Without a model file the keyword rules are used, matching single words whole
+        with patch('backend.ibm_course_recommender.intent_model', None), \
+             patch('backend.ibm_course_recommender.intent_model_loaded', True):
+            self.assertEqual(get_recommendation("how do I maintain my skills"), RECOMMENDATION_RESPONSES["general"])
+            self.assertEqual(get_recommendation("what does it cost"), RECOMMENDATION_RESPONSES["general"])
+            self.assertEqual(classify_intent("which os is best"), "linux")
+            self.assertEqual(classify_intent("I want to build websites"), "web_development")
+
     def test_process_course_completion(self):
         """Test the process_course_completion function for handling course completions"""
         # Import required dependencies
@@ -2396,6 +2806,41 @@ class UnitTests(unittest.TestCase):
     
     
     
+    def test_learning_path_progress_counters(self):
+        """Test that started learning paths keep their course counts and hours up to date"""
+        from backend.ibm_course_recommender import (
+            start_learning_path, process_course_completion, sync_path_progress, show_learning_path_progress, LEARNING_PATHS
+        )
+        
+        path_name = "Cyber Security 101"
+        path_data = LEARNING_PATHS[path_name]
+        total_courses = sum(len(chapter["courses"]) for chapter in path_data["chapters"])
+        
+        process_course_completion(self.user_state, "CIA Triad")
+        start_learning_path(self.user_state, path_name)
+        path_status = self.user_state["learning_paths_progress"][path_name]
+        
+        # Test 1: courses completed before starting the path are counted
+        self.assertEqual(path_status["chapter_course_counts"][0], 1)
+        self.assertEqual(path_status["total_courses"], total_courses)
+        
+        # Test 2: completion events update the chapter, path and hours
+        process_course_completion(self.user_state, "Basic Terminologies")
+        process_course_completion(self.user_state, "Common Types of Attacks")
+        self.assertEqual(path_status["chapter_course_counts"][:2], [2, 1])
+        self.assertEqual(path_status["courses_completed"], 3)
+        self.assertAlmostEqual(path_status["hours_invested"], 3 / total_courses * path_data["estimated_hours"])
+        
+        # Test 3: the views format the stored counts
+        result = show_learning_path_progress(self.user_state, path_name)
+        self.assertIn(f"**Course Completion:** 3/{total_courses} courses", result)
+        self.assertIn("**Chapter Progress:** 2/3 courses", result)
+        
+        # Test 4: replacing completed_courses triggers a full recount
+        self.user_state["completed_courses"] = ["Intro to Cybersecurity"]
+        sync_path_progress(self.user_state)
+        self.assertEqual(path_status["courses_completed"], 1)
+    
     def test_show_learning_path_progress(self):
         """Test the show_learning_path_progress function for displaying progress details"""
         from backend.ibm_course_recommender import show_learning_path_progress, LEARNING_PATHS
@@ -2664,6 +3109,106 @@ class UnitTests(unittest.TestCase):
 
 
 
+    def test_command_keyword_automaton(self):
+        """Test that the single-pass keyword automaton agrees with a substring check per synonym list"""
+        from backend.ibm_course_recommender import (
+            compile_keyword_automaton, find_keyword_hits, find_command_keywords, hits_any, COMMAND_KEYWORD_LISTS
+        )
+        
+        # Test 1: Overlapping keywords are all reported
+        automaton = compile_keyword_automaton(["learning path", "path", "paths", "he", "she", "hers"])
+        self.assertEqual(find_keyword_hits(automaton, "ushers on learning paths"),
+                         {"learning path", "path", "paths", "he", "she", "hers"})
+        self.assertEqual(find_keyword_hits(automaton, "nothing to see"), set())
+        
+        # Test 2: Hit checks match the substring chain for every synonym list
+        messages = [
+            "show me my learning path progress please",
+            "I have completed the course Cybersecurity Fundamentals",
+            "can you show me the quest details for Web Developer Starter",
+            "what can i unlock next? help",
+            "join the leaderboard and show my profile overview",
+            "",
+        ]
+        for message in messages:
+            hits = find_command_keywords(message.lower())
+            for keywords in COMMAND_KEYWORD_LISTS:
+                self.assertEqual(hits_any(hits, keywords), any(kw in message.lower() for kw in keywords),
+                                 f"{keywords} on {message!r}")
+
+    def test_plan_remaining_courses(self):
+        """Test prerequisite-aware planning of the courses left in a learning path"""
+        from backend.ibm_course_recommender import (
+            plan_remaining_courses, plan_learning_path, compile_prerequisite_graph, COURSE_PREREQUISITES
+        )
+        
+        # Test 1: missing prerequisites are included and come first
+        self.user_state["completed_courses"] = ["Python for Everybody"]
+        self.assertEqual(plan_remaining_courses(self.user_state, ["Machine Learning Basics"]),
+                         ["Intro to Data Science", "Machine Learning Basics"])
+        
+        # Test 2: every course in a path plan appears after all of its prerequisites
+        self.user_state["completed_courses"] = []
+        plan = plan_remaining_courses(self.user_state, ["Digital Forensics Fundamentals", "Deploying a Website"])
+        for course in plan:
+            for prerequisite in COURSE_PREREQUISITES.get(course, []):
+                self.assertLess(plan.index(prerequisite), plan.index(course))
+        
+        # Test 3: the command output lists the plan
+        result = plan_learning_path(self.user_state, "data science fundamentals")
+        self.assertIn("Take these **3** courses in order", result)
+        
+        # Test 4: a recompiled graph rebuilds the user's completed mask over the new positions,
+        # and that mask is never persisted
+        from backend.ibm_course_recommender import serialize_user_state
+        self.user_state["completed_courses"] = ["Python for Everybody"]
+        plan_remaining_courses(self.user_state, ["Machine Learning Basics"])
+        self.assertNotIn("prerequisite_mask", serialize_user_state(self.user_state))
+        try:
+            with patch.dict(COURSE_PREREQUISITES, {"Intro to Data Science": ["Python for Everybody", "Intro to Cybersecurity"]}):
+                compile_prerequisite_graph()
+                self.assertEqual(plan_remaining_courses(self.user_state, ["Machine Learning Basics"]),
+                                 ["Intro to Cybersecurity", "Intro to Data Science", "Machine Learning Basics"])
+        finally:
+            compile_prerequisite_graph()
+        
+        # Test 5: cycles are rejected
+        try:
+            with patch.dict(COURSE_PREREQUISITES, {"Intro to Cybersecurity": ["CIA Triad"]}):
+                with self.assertRaises(ValueError):
+                    compile_prerequisite_graph()
+        finally:
+            compile_prerequisite_graph()
+    
+    def test_check_chapter_completion_cascades(self):
+        """Test that one check advances through every satisfied chapter"""
+        from backend.ibm_course_recommender import check_chapter_completion, LEARNING_PATHS
+        
+        path_name = "Cyber Security 101"
+        chapters = LEARNING_PATHS[path_name]["chapters"]
+        self.user_state["learning_paths_progress"][path_name] = {
+            "started": True, "completed": False, "current_chapter": 0, "chapters_completed": []
+        }
+        self.user_state["completed_courses"] = chapters[0]["courses"] + chapters[1]["courses"] + chapters[2]["courses"]
+        
+        messages = check_chapter_completion(self.user_state)
+        path_status = self.user_state["learning_paths_progress"][path_name]
+        
+        # Test 1: three chapters completed in a single pass, each rewarded once
+        self.assertEqual(path_status["chapters_completed"], [0, 1, 2])
+        self.assertEqual(path_status["current_chapter"], 3)
+        self.assertEqual(self.user_state["xp"], 150)
+        
+        # Test 2: one consolidated completion message followed by the next chapter
+        self.assertEqual(len(messages), 2)
+        self.assertIn("completed **3** chapters", messages[0])
+        self.assertIn(chapters[3]["title"], messages[1])
+        
+        # Test 3: checking again changes nothing
+        check_chapter_completion(self.user_state)
+        self.assertEqual(path_status["chapters_completed"], [0, 1, 2])
+        self.assertEqual(self.user_state["xp"], 150)
+    
     def test_check_chapter_completion_edge_cases(self):
         """Test check_chapter_completion function covering all edge cases"""
         from backend.ibm_course_recommender import check_chapter_completion, LEARNING_PATHS, COURSE_LINKS
@@ -3269,6 +3814,333 @@ class UnitTests(unittest.TestCase):
         # Should not match
         self.assertFalse(any_keyword_in_text("hello world", ["goodbye", "farewell"]))
         
+        # Single words match whole words only; phrases match anywhere
+        self.assertFalse(any_keyword_in_text("how do I maintain my skills", ["ai", "os"]))
+        self.assertTrue(any_keyword_in_text("Is AI for me?", ["ai"]))
+        self.assertTrue(any_keyword_in_text("I'm new to Linux", ["new to"]))
+        
+    def test_parse_message(self):
+        """Test the shared ParsedMessage normalization pass"""
+        from backend.ibm_course_recommender import parse_message, handle_user_message
+        
+        # Test 1: Whitespace is collapsed once; tokens carry offsets into the text
+        message = parse_message("  Completed   course 'Intro to C++'  ")
+        self.assertEqual(message.text, "Completed course 'Intro to C++'")
+        self.assertEqual(message.casefolded, "completed course 'intro to c++'")
+        self.assertEqual(message.tokens[0], ("completed", 0, 9))
+        self.assertIn("c++", message.words)
+        self.assertNotIn("cour", message.words)
+        self.assertTrue({"completed", "course"} <= message.keyword_hits)
+        self.assertIs(parse_message(message), message)
+        
+        # Test 2: extract_after_keyword gives the same result for parsed and raw text
+        self.assertEqual(extract_after_keyword(message, ["course"]), "Intro to C++")
+        self.assertEqual(extract_after_keyword(message.text, ["course"]), "Intro to C++")
+        
+        # Test 3: Offsets stay aligned when a character's lowercase form is longer ("İ" -> "i̇")
+        message = parse_message("İstanbul fan: join leaderboard Ayşe")
+        self.assertEqual(len(message.casefolded), len(message.text))
+        self.assertEqual(extract_after_keyword(message, ["join leaderboard"]), "Ayşe")
+        self.assertEqual(extract_after_keyword(message.text, ["join leaderboard"]), "Ayşe")
+        
+        # Test 4: handle_user_message parses once and shares the result
+        with patch('backend.ibm_course_recommender.detect_command', return_value=None) as mock_detect, \
+             patch('backend.ibm_course_recommender.get_recommendation', return_value="rec") as mock_recommend:
+            self.assertEqual(handle_user_message("tell me about AI", self.user_state), "rec")
+            self.assertIs(mock_detect.call_args[0][0], mock_recommend.call_args[0][0])
+            self.assertEqual(mock_recommend.call_args[0][0].casefolded, "tell me about ai")
+
+    def test_content_recommendations(self):
+        """Test course recommendations by content similarity to the completed courses"""
+        from backend.ibm_course_recommender import (
+            recommend_similar_courses, show_course_recommendations, course_content_model, detect_command
+        )
+        
+        # Test 1: Completed courses are never recommended; the closest courses come first
+        completed = ["Networking Fundamentals"]
+        recommendations = recommend_similar_courses(completed, top_k=3)
+        self.assertEqual(len(recommendations), 3)
+        courses = [course for course, _ in recommendations]
+        self.assertNotIn("Networking Fundamentals", courses)
+        self.assertIn("Core Networking Protocols", courses)
+        scores = [score for _, score in recommendations]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        
+        # Test 2: Nothing to recommend from, or nothing left to recommend
+        self.assertEqual(recommend_similar_courses([]), [])
+        self.assertEqual(recommend_similar_courses(course_content_model["courses"]), [])
+        
+        # Test 3: "Recommend me something" is routed to the recommender
+        user_state = {"completed_courses": completed, "pending_action": None}
+        result = detect_command("Recommend me something", user_state)
+        self.assertEqual(result, show_course_recommendations(user_state))
+        self.assertIn("Core Networking Protocols", result)
+        self.assertIn("Complete a course first", show_course_recommendations({"completed_courses": []}))
+        self.assertNotIn("Complete a course first", show_course_recommendations({"completed_courses": ["Not A Catalog Course"]}))
+        
+        # Test 4: Requests naming a topic keep the topical reply, with or without completed courses
+        from backend.ibm_course_recommender import get_recommendation, RECOMMENDATION_RESPONSES
+        for completed_courses in ([], completed):
+            user_state = {"completed_courses": completed_courses, "pending_action": None}
+            self.assertIsNone(detect_command("can you recommend a course on cybersecurity", user_state))
+            self.assertEqual(get_recommendation("recommend something about linux"), RECOMMENDATION_RESPONSES["linux"])
+            self.assertEqual(detect_command("Recommend a course!", user_state), show_course_recommendations(user_state))
+
+    def test_co_completion_recommendations(self):
+        """Test item-item recommendations from courses completed together"""
+        import json
+        import math
+        import tempfile
+        from backend import ibm_course_recommender as recommender
+        
+        recommender.clear_co_completion()
+        try:
+            # Test 1: Neighbours are cosine-normalized co-completion counts, refreshed as completions come in
+            recommender.record_user_completions(["CIA Triad", "Basic Terminologies"])
+            recommender.record_user_completions(["CIA Triad", "Networking Fundamentals"])
+            neighbours = dict(recommender.get_course_neighbours("CIA Triad"))
+            self.assertAlmostEqual(neighbours["Basic Terminologies"], 1 / math.sqrt(2))
+            recommender.record_user_completions(["Basic Terminologies", "CIA Triad"])
+            neighbours = dict(recommender.get_course_neighbours("CIA Triad"))
+            self.assertAlmostEqual(neighbours["Basic Terminologies"], 2 / math.sqrt(3 * 2))
+            
+            # Test 2: The online merge skips completed courses and ranks by summed similarity
+            recommendations = recommender.recommend_co_completed_courses(["CIA Triad"])
+            self.assertEqual([course for course, _ in recommendations], ["Basic Terminologies", "Networking Fundamentals"])
+            
+            # Test 3: Completing a course counts it against the user's earlier completions, and a
+            # batch rebuild from persisted states gives the same lists
+            recommender.process_course_completion(self.user_state, "CIA Triad")
+            recommender.process_course_completion(self.user_state, "Networking Fundamentals")
+            expected = recommender.get_course_neighbours("Networking Fundamentals")
+            self.assertAlmostEqual(dict(expected)["CIA Triad"], 2 / math.sqrt(4 * 2))
+            
+            histories = [["CIA Triad", "Basic Terminologies"], ["CIA Triad", "Networking Fundamentals"],
+                         ["Basic Terminologies", "CIA Triad"], ["CIA Triad", "Networking Fundamentals"]]
+            with tempfile.TemporaryDirectory() as state_dir:
+                for i, history in enumerate(histories):
+                    with open(os.path.join(state_dir, f"user_{i}.json"), "w") as f:
+                        json.dump({"user_id": f"user_{i}", "completed_courses": history}, f)
+                self.assertEqual(recommender.build_co_completion_index(state_dir), 4)
+            self.assertEqual(recommender.get_course_neighbours("Networking Fundamentals"), expected)
+            
+            # Test 4: A course completed before counting started has no count of its own
+            recommender.clear_co_completion()
+            recommender.record_co_completion("CIA Triad", ["Intro to Cybersecurity"])
+            self.assertEqual(recommender.recommend_co_completed_courses(["CIA Triad"]), [("Intro to Cybersecurity", 1.0)])
+            self.assertEqual(recommender.get_course_neighbours("Intro to Cybersecurity"), [("CIA Triad", 1.0)])
+        finally:
+            recommender.clear_co_completion()
+
+    def test_lsh_index(self):
+        """Test the random-projection LSH index for approximate similar-course lookups"""
+        import tempfile
+        import numpy as np
+        from backend import ibm_course_recommender as recommender
+        
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((300, 32)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        names = [f"Course {i}" for i in range(300)]
+        
+        # Test 1: A course is its own nearest neighbour, unless excluded
+        index = recommender.build_lsh_index(vectors[:200], names[:200], num_tables=8, num_bits=6)
+        self.assertEqual(recommender.query_lsh_index(index, vectors[7], 1)[0][0], "Course 7")
+        self.assertNotIn("Course 7", [name for name, _ in recommender.query_lsh_index(index, vectors[7], 5, exclude=[7])])
+        
+        # Test 2: Adding courses incrementally gives the same index as building it from scratch
+        recommender.add_to_lsh_index(index, vectors[200:], names[200:])
+        rebuilt = recommender.build_lsh_index(vectors, names, num_tables=8, num_bits=6)
+        for key in ("vectors", "codes", "order"):
+            np.testing.assert_array_equal(index[key], rebuilt[key])
+        self.assertEqual(index["ids"]["Course 250"], 250)
+        
+        # Test 3: A saved index loads memory-mapped and serves recommendations
+        with tempfile.TemporaryDirectory() as index_dir:
+            recommender.save_lsh_index(index, index_dir)
+            loaded = recommender.load_lsh_index(index_dir)
+            self.assertIsInstance(loaded["vectors"], np.memmap)
+            with patch.object(recommender, "course_lsh_index", loaded), \
+                 patch.object(recommender, "course_lsh_index_loaded", True), \
+                 patch.object(recommender, "LSH_MIN_CATALOG_SIZE", 100):
+                recommendations = recommender.recommend_similar_courses(["Course 3"], top_k=3)
+            self.assertEqual(len(recommendations), 3)
+            self.assertNotIn("Course 3", [name for name, _ in recommendations])
+            del loaded
+        
+        # Test 4: Small catalogs, and queries whose buckets hold too few candidates, are scored exactly
+        exact = recommender.nearest_courses(vectors, names, vectors[3], 250, [3])
+        self.assertEqual(recommender.recommend_from_lsh_index(index, ["Course 3"], top_k=250), exact)
+        with patch.object(recommender, "LSH_MIN_CATALOG_SIZE", 100):
+            self.assertEqual(recommender.recommend_from_lsh_index(index, ["Course 3"], top_k=250), exact)
+        
+        # Test 5: A catalog refresh reloads the index on next use
+        with patch.object(recommender, "course_lsh_index_loaded", True):
+            recommender.refresh_catalog_caches()
+            self.assertFalse(recommender.course_lsh_index_loaded)
+        
+        # Test 6: Adding a catalog course changes every vector's weights, so the catalog index is rebuilt
+        from backend.build_course_index import update_catalog_index
+        
+        def catalog_index(index_dir):
+            model = recommender.course_content_model
+            return update_catalog_index(index_dir, model["matrix"], model["courses"], 4, 6, model["terms"], model["idf"])
+        
+        categories = recommender.get_course_categories()
+        extended = {**categories, "Cybersecurity": categories["Cybersecurity"] + ["Quantum Cryptography Basics"]}
+        try:
+            with tempfile.TemporaryDirectory() as index_dir:
+                index, added = catalog_index(index_dir)
+                recommender.save_lsh_index(index, index_dir)
+                old_idf = recommender.course_content_model["idf"]
+                
+                with patch.object(recommender, "get_course_categories", return_value=extended):
+                    recommender.compile_course_content_model()
+                model = recommender.course_content_model
+                self.assertFalse(np.array_equal(model["idf"][:len(old_idf)], old_idf))
+                index, added = catalog_index(index_dir)
+                self.assertEqual(added, len(model["courses"]))
+                np.testing.assert_array_equal(index["vectors"], model["matrix"])
+                self.assertEqual(index["names"], model["courses"])
+                
+                # Saved with its terms and idf, an unchanged catalog is left as is
+                recommender.save_lsh_index(index, index_dir)
+                self.assertEqual(catalog_index(index_dir)[1], 0)
+                self.assertEqual(recommender.load_lsh_index(index_dir)["terms"], model["terms"])
+        finally:
+            recommender.compile_course_content_model()
+
+    def test_next_steps(self):
+        """Test the precomputed next-step list from learning path chapters, quests and ratings"""
+        from backend import ibm_course_recommender as recommender
+        
+        user_state = recommender.initialize_learning_paths_in_user_state(self.user_state)
+        path_name = next(iter(recommender.LEARNING_PATHS))
+        quest_name = next(iter(recommender.QUESTS))
+        recommender.start_learning_path(user_state, path_name)
+        recommender.start_quest(user_state, quest_name)
+        
+        # Test 1: Current chapter and remaining quest courses are ranked, with their reasons
+        ranked = recommender.sync_next_steps(user_state)
+        first_chapter = recommender.LEARNING_PATHS[path_name]["chapters"][0]["courses"]
+        courses = [course for course, _, _ in ranked]
+        self.assertTrue(set(courses) & set(first_chapter))
+        self.assertTrue(set(courses) & set(recommender.QUESTS[quest_name]["courses_required"]))
+        self.assertEqual([score for _, score, _ in ranked], sorted((score for _, score, _ in ranked), reverse=True))
+        
+        # Test 2: A completion only recomputes the path/quest needing that course
+        course = first_chapter[0]
+        with patch.object(recommender, "score_next_step_source", wraps=recommender.score_next_step_source) as mock_score:
+            recommender.process_course_completion(user_state, course)
+        recomputed = {call.args[1] for call in mock_score.call_args_list}
+        expected = {f"path:{path_name}"}
+        if course in recommender.QUESTS[quest_name]["courses_required"]:
+            expected.add(f"quest:{quest_name}")
+        self.assertEqual(recomputed, expected)
+        self.assertNotIn(course, [c for c, _, _ in user_state["next_steps"]["ranked"]])
+        
+        # Test 3: "What should I do next" is answered from the list without recomputing it
+        with patch.object(recommender, "score_next_step_source") as mock_score:
+            result = recommender.detect_command("What should I do next?", user_state)
+            mock_score.assert_not_called()
+        self.assertIn("Your Next Steps", result)
+        self.assertIn(user_state["next_steps"]["ranked"][0][0], result)
+
+    def test_recommendation_cache(self):
+        """Test caching recommendations per user state version, with TTL and size eviction"""
+        from backend import ibm_course_recommender as recommender
+        
+        recommender.clear_recommendation_cache()
+        compute = MagicMock(side_effect=lambda user_state: f"{len(user_state['completed_courses'])} completed")
+        try:
+            # Test 1: Asking again with unchanged progress is served from the cache
+            self.assertEqual(recommender.cached_recommendation(self.user_state, "similar_courses", compute), "0 completed")
+            self.assertEqual(recommender.cached_recommendation(self.user_state, "similar_courses", compute), "0 completed")
+            self.assertEqual(compute.call_count, 1)
+            info = recommender.recommendation_cache_info()
+            self.assertEqual((info["hits"], info["misses"], info["hit_rate"]), (1, 1, 0.5))
+            self.assertGreater(info["bytes"], 0)
+            
+            # Test 2: Completing a course bumps the state version, so the result is recomputed
+            version = recommender.get_state_version(self.user_state)
+            recommender.process_course_completion(self.user_state, "CIA Triad")
+            self.assertGreater(self.user_state["state_version"], version)
+            self.assertEqual(recommender.cached_recommendation(self.user_state, "similar_courses", compute), "1 completed")
+            self.assertEqual(compute.call_count, 2)
+            
+            # Test 3: Entries expire after the TTL and the least recently used go beyond the size limit
+            with patch.object(recommender, "RECOMMENDATION_CACHE_TTL", 0):
+                recommender.cached_recommendation(self.user_state, "next_steps", compute)
+                recommender.cached_recommendation(self.user_state, "next_steps", compute)
+            self.assertEqual(compute.call_count, 4)
+            with patch.object(recommender, "RECOMMENDATION_CACHE_SIZE", 1):
+                recommender.cached_recommendation(self.user_state, "similar_courses", compute)
+                recommender.cached_recommendation(self.user_state, "other", compute)
+            info = recommender.recommendation_cache_info()
+            self.assertEqual(info["size"], 1)
+            self.assertGreaterEqual(info["expired"], 1)
+            self.assertGreaterEqual(info["evicted"], 1)
+            self.assertEqual(info["bytes"], sum(size for _, _, size in recommender.recommendation_cache.values()))
+        finally:
+            recommender.clear_recommendation_cache()
+
+    def test_evaluate_recommenders(self):
+        """Test the offline recommender evaluation harness"""
+        from backend.evaluate_recommenders import (
+            split_histories, evaluate_recommender, evaluate, load_histories, DEFAULT_DATA_PATH
+        )
+        
+        # Test 1: The most recent courses are held out; short histories are skipped
+        histories = [["A", "B", "C", "D"], ["A", "B"], ["C", "B", "A"]]
+        self.assertEqual(split_histories(histories, holdout=0.5), [(["A", "B"], ["C", "D"]), (["C"], ["B", "A"])])
+        
+        # Test 2: Precision, recall and coverage of a recommender that always finds the held-out courses
+        splits = [(["A", "B"], ["C", "D"]), (["C"], ["B"])]
+        held_out = {tuple(train): held for train, held in splits}
+        metrics = evaluate_recommender(lambda completed, k: held_out[tuple(completed)], splits, k=2, catalog_size=10)
+        self.assertAlmostEqual(metrics["precision"], (2 / 2 + 1 / 2) / 2)
+        self.assertAlmostEqual(metrics["recall"], 1.0)
+        self.assertAlmostEqual(metrics["coverage"], 3 / 10)
+        
+        # Test 3: Every recommender is scored and timed on the fixture histories
+        report, num_users = evaluate(load_histories(DEFAULT_DATA_PATH), ["popularity", "content"], repeats=1)
+        self.assertGreater(num_users, 100)
+        for metrics in report.values():
+            self.assertLessEqual(metrics["p50"], metrics["p95"])
+            self.assertLessEqual(metrics["p95"], metrics["p99"])
+            self.assertGreater(metrics["memory_kib"], 0)
+        self.assertGreater(report["content"]["recall"], report["popularity"]["recall"])
+
+    def test_start_quest_with_courses_already_done(self):
+        """A quest started after its courses are done completes on the next check"""
+        from backend.ibm_course_recommender import start_quest, check_quests, pop_changed_facts, QUESTS
+        
+        # Test 1: The started quest is re-checked although no course fact changed
+        quest_name = next(name for name, data in QUESTS.items() if "rule" not in data)
+        self.user_state["completed_courses"] = list(QUESTS[quest_name]["courses_required"])
+        pop_changed_facts(self.user_state)
+        start_quest(self.user_state, quest_name)
+        messages = check_quests(self.user_state, pop_changed_facts(self.user_state))
+        self.assertTrue(self.user_state["active_quests"][quest_name]["completed"])
+        self.assertEqual(len(messages), 1)
+        self.assertIn(quest_name, messages[0])
+        
+        # Test 2: Facts recorded by the learning path check reach the badge check
+        from backend.ibm_course_recommender import process_pending_notifications, record_fact_change
+        self.user_state["pending_notifications"] = {
+            "quest_check_needed": True,
+            "badges_check_needed": True,
+            "level_check_needed": False,
+            "learning_path_check_needed": True
+        }
+        with unittest.mock.patch('backend.ibm_course_recommender.check_learning_path_completion',
+                                 side_effect=lambda state: record_fact_change(state, "path:Test Path") or []), \
+             unittest.mock.patch('backend.ibm_course_recommender.check_skill_badges', return_value=[]) as mock_badges, \
+             unittest.mock.patch('backend.ibm_course_recommender.save_user_state'):
+            list(process_pending_notifications([], self.user_state))
+        self.assertIn("path:Test Path", mock_badges.call_args[0][1])
+        self.assertEqual(pop_changed_facts(self.user_state), set())
+
     def test_extract_after_keyword(self):
         """Test extracting text after a keyword"""
         # Basic extraction
@@ -3721,6 +4593,73 @@ class UnitTests(unittest.TestCase):
             self.assertEqual(result, "Nickname is taken. Please choose another.")    
         
         
+    def test_command_routing_parity(self):
+        """Test the route table against routes recorded from the original detect_command if-chain"""
+        import json
+        from backend.ibm_course_recommender import (
+            resolve_command_route, parse_message, COMMAND_ROUTE_INDEX, LEARNING_PATH_ROUTE_INDEX
+        )
+        
+        corpus_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "routing_corpus.jsonl")
+        with open(corpus_path, encoding="utf-8") as f:
+            corpus = [json.loads(line) for line in f]
+        self.assertGreater(len(corpus), 1000)
+        
+        # Test 1: Every recorded message resolves to the same route and arguments
+        for row in corpus:
+            message = parse_message(row["message"])
+            route = resolve_command_route(COMMAND_ROUTE_INDEX, message, row["pending_action"])
+            self.assertEqual(route and route["name"], row["route"], row)
+            if row["args"] is not None:
+                args = list(route["extract"](message)) if "extract" in route else []
+                self.assertEqual(args, row["args"], row)
+        
+        # Test 2: Messages without command keywords evaluate no routes at all
+        with patch('backend.ibm_course_recommender.route_matches') as mock_matches:
+            self.assertIsNone(resolve_command_route(COMMAND_ROUTE_INDEX, parse_message("what is ai")))
+            mock_matches.assert_not_called()
+        
+        # Test 3: The learning path index only holds learning path routes
+        route = resolve_command_route(LEARNING_PATH_ROUTE_INDEX, parse_message("show my profile"))
+        self.assertIsNone(route)
+
+    def test_route_cache(self):
+        """Test that repeated messages reuse their resolved route but handlers see fresh state"""
+        from backend.ibm_course_recommender import detect_command, clear_route_cache, route_cache, route_cache_info
+        
+        clear_route_cache()
+        
+        # Test 1: A repeat is a cache hit and the handler still reads the current XP
+        self.assertIn("**0**", detect_command("show xp", self.user_state))
+        self.user_state["xp"] = 150
+        self.assertIn("**150**", detect_command("  show   xp ", self.user_state))
+        info = route_cache_info()
+        self.assertEqual((info["hits"], info["misses"], info["size"]), (1, 1, 1))
+        self.assertEqual(info["hit_rate"], 0.5)
+        
+        # Test 2: Unmatched messages are cached too, and the pending action is part of the key
+        self.assertIsNone(detect_command("hello there", self.user_state))
+        self.user_state["pending_action"] = "complete_course"
+        with patch('backend.ibm_course_recommender.process_course_completion', return_value="done") as mock_complete:
+            self.assertEqual(detect_command("hello there", self.user_state), "done")
+            mock_complete.assert_called_once_with(self.user_state, "hello there")
+        self.assertEqual(route_cache_info()["misses"], 3)
+        
+        # Test 3: Arguments come from the message as sent, not the one that filled the cache
+        self.user_state["pending_action"] = "complete_course"
+        with patch('backend.ibm_course_recommender.process_course_completion', return_value="done") as mock_complete:
+            detect_command(" hello  there", self.user_state)
+            mock_complete.assert_called_once_with(self.user_state, "hello  there")
+        self.assertEqual(route_cache_info()["misses"], 3)
+        
+        # Test 4: The least recently used entry is evicted once the cache is full
+        with patch('backend.ibm_course_recommender.ROUTE_CACHE_SIZE', 2):
+            detect_command("show xp", self.user_state)
+            detect_command("show level", self.user_state)
+        self.assertEqual(len(route_cache), 2)
+        self.assertNotIn(("hello there", None), route_cache)
+        clear_route_cache()
+
     def test_detect_command(self):
         """Test the detect_command function for identifying and processing commands"""
         # Import required dependencies
@@ -4177,6 +5116,57 @@ class UnitTests(unittest.TestCase):
             # If it returns None for invalid commands, that's fine too
             pass
     
+    def test_save_and_load_user_state(self):
+        """Test persisting a user state to disk and loading it back"""
+        import tempfile
+        from backend.ibm_course_recommender import save_user_state, load_user_state, iter_persisted_user_states
+        
+        # Test 1: Persistence is disabled without a state directory
+        with patch('backend.ibm_course_recommender.USER_STATE_DIR', None):
+            self.assertIsNone(save_user_state(self.user_state))
+        
+        # Test 2: Round trip through a state directory
+        self.user_state["xp"] = 120
+        self.user_state["completed_courses"] = ["CIA Triad"]
+        with tempfile.TemporaryDirectory() as state_dir:
+            path = save_user_state(self.user_state, state_dir)
+            self.assertTrue(path.endswith("test_user_id.json"))
+            self.assertEqual(load_user_state(path), self.user_state)
+            
+            # Test 3: Streaming all persisted states
+            persisted = list(iter_persisted_user_states(state_dir))
+            self.assertEqual(len(persisted), 1)
+            self.assertEqual(persisted[0][1]["user_id"], "test_user_id")
+    
+    def test_reevaluate_user_state(self):
+        """Test re-running badge, quest, level and path checks after rule changes"""
+        from backend.ibm_course_recommender import reevaluate_user_state
+        
+        # Test 1: Nothing changes for a user who is up to date
+        diff = reevaluate_user_state(self.user_state)
+        self.assertFalse(any(diff.values()))
+        
+        # Test 2: Stale user who finished courses spanning a whole learning path
+        self.user_state["completed_courses"] = ["Python for Everybody", "Intro to Data Science", "Machine Learning Basics"]
+        self.user_state["xp"] = 150
+        self.user_state["active_quests"] = {"Data Science Starter": {"started": True, "completed": False}}
+        self.user_state["learning_paths_progress"] = {
+            "Data Science Fundamentals": {"started": True, "current_chapter": 0, "chapters_completed": [], "completed": False}
+        }
+        
+        diff = reevaluate_user_state(self.user_state)
+        
+        self.assertEqual(diff["chapters"], 2)
+        self.assertEqual(diff["paths"], ["Data Science Fundamentals"])
+        self.assertEqual(diff["quests"], ["Data Science Starter"])
+        self.assertIn("Python Beginner", diff["badges"])
+        self.assertEqual(diff["xp"], 50 * 2 + 100 + 100)
+        self.assertEqual(diff["level"], ("0x1 [Initiate]", "0x2 [Explorer]"))
+        
+        # Test 3: Running again finds nothing new
+        diff = reevaluate_user_state(self.user_state)
+        self.assertFalse(any(diff.values()))
+    
     def test_add_message(self):
         """Test the add_message function for adding user messages to history"""
         # Import the necessary function
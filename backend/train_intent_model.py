@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Offline training of the recommendation intent model used by get_recommendation().
+Fits a TF-IDF + multinomial logistic regression model on labelled messages,
+reports cross-validated accuracy and latency against the keyword rules, and
+saves the model as a compact NumPy .npz file.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Make the backend package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.ibm_course_recommender import (
+    INTENT_MODEL_PATH, RECOMMENDATION_RESPONSES, intent_terms, vectorize_intent_messages,
+    classify_intents, classify_intent_by_keywords
+)
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_messages.jsonl")
+
+
+def load_labelled_messages(path):
+    """Read (text, intent) pairs from a JSON-lines file of {"text", "intent"} objects"""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                example = json.loads(line)
+                texts.append(example["text"])
+                labels.append(example["intent"])
+    return texts, labels
+
+
+def fit_vocabulary(texts, min_count=1):
+    """Build the term vocabulary and smoothed IDF weights from the training texts"""
+    document_counts = {}
+    for text in texts:
+        for term in set(intent_terms(text)):
+            document_counts[term] = document_counts.get(term, 0) + 1
+
+    terms = sorted(term for term, count in document_counts.items() if count >= min_count)
+    counts = np.array([document_counts[term] for term in terms], dtype=np.float32)
+    idf = np.log((1 + len(texts)) / (1 + counts)) + 1
+    return {term: idx for idx, term in enumerate(terms)}, idf.astype(np.float32)
+
+
+def train_softmax(features, targets, num_classes, epochs=800, learning_rate=5.0, l2=1e-4):
+    """Full-batch gradient descent on the L2-regularized softmax cross-entropy"""
+    weights = np.zeros((features.shape[1], num_classes), dtype=np.float32)
+    bias = np.zeros(num_classes, dtype=np.float32)
+    one_hot = np.eye(num_classes, dtype=np.float32)[targets]
+
+    for _ in range(epochs):
+        scores = features @ weights + bias
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        error = (probabilities - one_hot) / len(features)
+        weights -= learning_rate * (features.T @ error + l2 * weights)
+        bias -= learning_rate * error.sum(axis=0)
+
+    return weights, bias
+
+
+def train_intent_model(texts, labels):
+    """Return a model dict in the shape load_intent_model() produces"""
+    intents = list(RECOMMENDATION_RESPONSES)
+    unknown = set(labels) - set(intents)
+    if unknown:
+        raise ValueError(f"Labels without a recommendation response: {', '.join(sorted(unknown))}")
+
+    vocabulary, idf = fit_vocabulary(texts)
+    features = vectorize_intent_messages(vocabulary, idf, texts)
+    targets = np.array([intents.index(label) for label in labels])
+    weights, bias = train_softmax(features, targets, len(intents))
+    return {"intents": intents, "vocabulary": vocabulary, "idf": idf, "weights": weights, "bias": bias}
+
+
+def save_intent_model(model, path):
+    terms = sorted(model["vocabulary"], key=model["vocabulary"].get)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez_compressed(
+        path,
+        intents=np.array(model["intents"]),
+        terms=np.array(terms),
+        idf=model["idf"].astype(np.float32),
+        weights=model["weights"].astype(np.float32),
+        bias=model["bias"].astype(np.float32),
+    )
+
+
+def cross_validate(texts, labels, folds=5):
+    """Accuracy of the model (trained on the other folds) and of the keyword rules on each held-out fold"""
+    model_correct = rules_correct = 0
+    for fold in range(folds):
+        train = [i for i in range(len(texts)) if i % folds != fold]
+        test = [i for i in range(len(texts)) if i % folds == fold]
+        model = train_intent_model([texts[i] for i in train], [labels[i] for i in train])
+        predictions = classify_intents([texts[i] for i in test], model)
+        model_correct += sum(intent == labels[i] for (intent, _), i in zip(predictions, test))
+        rules_correct += sum(classify_intent_by_keywords(texts[i]) == labels[i] for i in test)
+    return model_correct / len(texts), rules_correct / len(texts)
+
+
+def measure_latency(model, texts, repeats=20):
+    """Microseconds per message for the keyword rules, the model one message at a time, and in one batch"""
+    batch = texts * repeats
+
+    start = time.perf_counter()
+    for text in batch:
+        classify_intent_by_keywords(text)
+    rules = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text in batch:
+        classify_intents([text], model)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    classify_intents(batch, model)
+    batched = time.perf_counter() - start
+
+    return tuple(seconds / len(batch) * 1e6 for seconds in (rules, single, batched))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the recommendation intent model")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="Labelled messages (JSON lines of text/intent)")
+    parser.add_argument("--output", default=INTENT_MODEL_PATH, help="Where to save the model (.npz)")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds for the accuracy report")
+    args = parser.parse_args()
+
+    texts, labels = load_labelled_messages(args.data)
+    model_accuracy, rules_accuracy = cross_validate(texts, labels, args.folds)
+
+    model = train_intent_model(texts, labels)
+    save_intent_model(model, args.output)
+    rules_us, single_us, batch_us = measure_latency(model, texts)
+
+    print(f"Trained on {len(texts)} messages, {len(model['vocabulary'])} terms, {len(model['intents'])} intents")
+    print(f"Saved to {args.output} ({os.path.getsize(args.output):,} bytes)")
+    print(f"Accuracy ({args.folds}-fold): model {model_accuracy:.1%}, keyword rules {rules_accuracy:.1%}")
+    print(f"Latency per message: keyword rules {rules_us:.1f} us, model {single_us:.1f} us, "
+          f"model batched {batch_us:.1f} us")